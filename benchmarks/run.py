@@ -0,0 +1,468 @@
+"""
+Microbenchmarks of the hot paths of a tick: rsi, price change detection and
+building the update embeds. Each benchmark reports the time per tick and per
+call, what a tick allocates and the peak memory of the process, and the
+results can be saved as json to compare commits.
+
+Run every benchmark and save the results
+	python benchmarks/run.py --output before.json
+
+Compare against them after a change
+	python benchmarks/run.py --output after.json --compare before.json
+
+Only run the rsi benchmarks, with smaller inputs
+	python benchmarks/run.py --filter rsi --quick
+"""
+import subprocess
+import tracemalloc
+import argparse
+import platform
+import resource
+import logging
+import time
+import json
+import sys
+import os
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.append(os.path.join(ROOT, "helpers"))
+sys.path.append(os.path.join(ROOT, "helpers", "indicators"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+
+TIMEFRAME_MS = 1800000
+PERIOD = 14
+
+
+class Skip(Exception):
+	"""
+	Raised by a benchmark's setup when it can't run here, ie a dependency
+	isn't installed.
+	"""
+
+
+def _import(name: str):
+	try:
+		return __import__(name)
+
+	except Exception as e:
+		raise Skip("can't import {0}: {1}".format(name, e))
+
+
+def bench_calc_rsi(markets: int, candles: int):
+	"""
+	calc_rsi called once per market, the way a tick used to calculate rsi.
+	"""
+	rsi = _import("rsi")
+
+	data = list(synthetic.random_walk_ohlcv(markets, candles, TIMEFRAME_MS).values())
+
+	def tick():
+		for ohlcv in data:
+			rsi.calc_rsi(ohlcv, PERIOD)
+
+	return tick, markets
+
+
+def bench_calc_rsi_batch(markets: int, candles: int):
+	"""
+	calc_rsi_batch calculating every market's rsi in one call.
+	"""
+	rsi = _import("rsi")
+
+	data = synthetic.random_walk_ohlcv(markets, candles, TIMEFRAME_MS)
+	closes = np.array([[c[4] for c in ohlcv] for ohlcv in data.values()])
+	lengths = np.full(markets, candles)
+
+	def tick():
+		rsi.calc_rsi_batch(closes, lengths, PERIOD)
+
+	return tick, 1
+
+
+def bench_rsi_engine_seed(markets: int, candles: int):
+	"""
+	RSIEngine seeding every market from its history, done once at start up.
+	"""
+	rsi_engine = _import("rsi_engine")
+
+	data = synthetic.random_walk_ohlcv(markets, candles, TIMEFRAME_MS)
+	keys = [("bench", symbol, "30m") for symbol in data]
+	closes = [[[c[4] for c in ohlcv]] for ohlcv in data.values()]
+	last_closed = [ohlcv[-1][0] for ohlcv in data.values()]
+
+	def tick():
+		engine = rsi_engine.RSIEngine(PERIOD)
+		engine.seed(keys, closes, last_closed)
+
+	return tick, 1
+
+
+def bench_rsi_engine_push(markets: int, candles: int):
+	"""
+	RSIEngine pushing one new candle per market and reading the rsi, what a
+	tick does once the engine's been seeded.
+	"""
+	rsi_engine = _import("rsi_engine")
+
+	data = synthetic.random_walk_ohlcv(markets, candles + 1, TIMEFRAME_MS)
+	keys = [("bench", symbol, "30m") for symbol in data]
+	history = [[[c[4] for c in ohlcv[:-1]]] for ohlcv in data.values()]
+	new = [[[ohlcv[-1][4]]] for ohlcv in data.values()]
+
+	engine = rsi_engine.RSIEngine(PERIOD)
+	engine.seed(keys, history, [0] * markets)
+
+	def tick():
+		for key, closes in zip(keys, new):
+			engine.push(key, closes, TIMEFRAME_MS)
+			engine.rsi(key)
+
+	return tick, markets
+
+
+def bench_pipeline(markets: int, candles: int):
+	"""
+	Building a candle frame and running every indicator of the pipeline on it.
+	"""
+	rsi_engine = _import("rsi_engine")
+	pipeline = _import("pipeline")
+
+	data = synthetic.random_walk_ohlcv(markets, candles, TIMEFRAME_MS)
+	keys = [("bench", symbol, "30m") for symbol in data]
+	rows = [np.asarray(ohlcv)[:, 1:] for ohlcv in data.values()]
+
+	engine = rsi_engine.RSIEngine(PERIOD)
+	engine.seed(keys, [[row[:, 3]] for row in rows], [0] * markets)
+
+	indicators = pipeline.IndicatorPipeline()
+	indicators.register(pipeline.RSI(engine, 80, 30))
+
+	for indicator in (pipeline.EMA, pipeline.MACD, pipeline.Bollinger, pipeline.ATR):
+		indicators.register(indicator())
+
+	def tick():
+		frame = pipeline.CandleFrame(keys, rows, [None] * markets)
+		indicators.run(frame)
+
+	return tick, 1
+
+
+def bench_percent_change(markets: int):
+	"""
+	ExchangeProcessor.percent_change called once per market.
+	"""
+	processor = _processor()
+
+	snapshots = synthetic.ticker_snapshots(markets, 2)
+	pairs = list(zip(snapshots[1].values(), snapshots[0].values()))
+
+	def tick():
+		for new, old in pairs:
+			processor.percent_change(new, old)
+
+	return tick, markets
+
+
+def bench_price_table(markets: int):
+	"""
+	PriceTable storing a snapshot of every market and finding the significant
+	changes, the detection part of check_exchange_price_updates.
+	"""
+	price_table = _import("price_table")
+
+	snapshots = synthetic.ticker_snapshots(markets, 20)
+	table = price_table.PriceTable(markets)
+	table.update(snapshots[0])
+
+	state = {"tick": 0}
+
+	def tick():
+		state["tick"] += 1
+		snapshot = snapshots[state["tick"] % len(snapshots)]
+
+		table.changes(table.update(snapshot), 5, -5)
+
+	return tick, 1
+
+
+def bench_apply_prices(markets: int):
+	"""
+	ExchangeProcessor.apply_prices, everything check_exchange_price_updates
+	does once the tickers have been fetched.
+	"""
+	processor = _processor()
+
+	snapshots = synthetic.ticker_snapshots(markets, 20)
+	processor.apply_prices("bench", snapshots[0])
+
+	state = {"tick": 0}
+
+	def tick():
+		state["tick"] += 1
+		snapshot = snapshots[state["tick"] % len(snapshots)]
+
+		processor.apply_prices("bench", snapshot)
+
+	return tick, 1
+
+
+def _processor():
+	"""
+	Makes an ExchangeProcessor without a config, with the thresholds the
+	default config uses.
+	"""
+	exchange_processor = _import("exchange_processor")
+
+	processor = exchange_processor.ExchangeProcessor(logger=logging.getLogger("bench"))
+	processor._mooning = 5
+	processor._free_fall = -5
+
+	return processor
+
+
+def bench_price_embeds(markets: int):
+	"""
+	Building the price update embeds of a tick where every market moved.
+	"""
+	og = _import("output_generator")
+
+	snapshot = synthetic.ticker_snapshots(markets, 1)[0]
+	changes = {symbol: round((i % 40) - 20.5, 2) for i, symbol in enumerate(snapshot)}
+
+	def tick():
+		og.create_price_update_embeds(changes)
+
+	return tick, 1
+
+
+def bench_indicator_embeds(markets: int):
+	"""
+	Building the indicator update embeds of a tick where every market signalled.
+	"""
+	og = _import("output_generator")
+
+	lines = ["[{0}] RSI [{1}]".format(s, i % 100)
+		for i, s in enumerate(synthetic.symbols(markets))]
+
+	def tick():
+		og.create_indicator_update_embeds("RSI", lines)
+
+	return tick, 1
+
+
+def bench_cmc_embeds():
+	"""
+	Building the $price and $cap embeds.
+	"""
+	og = _import("output_generator")
+
+	ticker = synthetic.cmc_ticker()
+	cap = {
+		"total_market_cap_usd": 412345678901.0,
+		"total_24h_volume_usd": 12345678901.0,
+		"bitcoin_percentage_of_market_cap": 38.5,
+		"active_currencies": 1500,
+	}
+
+	def tick():
+		og.create_cmc_price_embed(ticker)
+		og.create_cmc_cap_embed(cap)
+
+	return tick, 2
+
+
+def benchmarks(quick: bool) -> list:
+	"""
+	Lists every benchmark as (name, setup, args).
+	"""
+	markets = [100, 1000] if quick else [100, 1000, 10000]
+	rsi_markets = [100] if quick else [100, 500]
+	candles = 200 if quick else 500
+
+	cases = []
+
+	for n in rsi_markets:
+		size = (n, candles)
+		tag = "{0}x{1}".format(n, candles)
+
+		cases += [
+			("rsi.calc_rsi[{0}]".format(tag), bench_calc_rsi, size),
+			("rsi.calc_rsi_batch[{0}]".format(tag), bench_calc_rsi_batch, size),
+			("rsi.engine_seed[{0}]".format(tag), bench_rsi_engine_seed, size),
+			("rsi.engine_push[{0}]".format(tag), bench_rsi_engine_push, size),
+			("indicators.pipeline[{0}]".format(tag), bench_pipeline, size),
+		]
+
+	for n in markets:
+		cases += [
+			("price.percent_change[{0}]".format(n), bench_percent_change, (n,)),
+			("price.price_table[{0}]".format(n), bench_price_table, (n,)),
+			("price.apply_prices[{0}]".format(n), bench_apply_prices, (n,)),
+			("output.price_embeds[{0}]".format(n), bench_price_embeds, (n,)),
+			("output.indicator_embeds[{0}]".format(n), bench_indicator_embeds, (n,)),
+		]
+
+	cases.append(("output.cmc_embeds", bench_cmc_embeds, ()))
+
+	return cases
+
+
+def measure(tick, calls: int, min_time: float, repeat: int) -> dict:
+	"""
+	Times a tick, then runs it once more under tracemalloc to see what it
+	allocates.
+
+	Args:
+		tick: function running one tick of the benchmark
+		calls: calls of the benchmarked function in a tick
+		min_time: least seconds each timing round runs for
+		repeat: timing rounds, the fastest is reported
+
+	Returns:
+		dict of the measurements
+
+	"""
+	tick()
+
+	# enough ticks per round that the timer's resolution doesn't matter
+	number = 1
+	while True:
+		start = time.perf_counter()
+		for _ in range(number):
+			tick()
+		elapsed = time.perf_counter() - start
+
+		if elapsed >= min_time:
+			break
+
+		number *= 2
+
+	rounds = [elapsed / number]
+
+	for _ in range(repeat - 1):
+		start = time.perf_counter()
+		for _ in range(number):
+			tick()
+		rounds.append((time.perf_counter() - start) / number)
+
+	tracemalloc.start()
+	before, _ = tracemalloc.get_traced_memory()
+	blocks = sys.getallocatedblocks()
+
+	tick()
+
+	after, peak = tracemalloc.get_traced_memory()
+	blocks = sys.getallocatedblocks() - blocks
+	tracemalloc.stop()
+
+	per_tick = min(rounds)
+
+	return {
+		"per_tick": per_tick,
+		"per_tick_median": sorted(rounds)[len(rounds) // 2],
+		"per_call": per_tick / calls,
+		"calls_per_tick": calls,
+		"ticks_timed": number * repeat,
+		"alloc_peak_bytes": peak - before,
+		"alloc_retained_bytes": after - before,
+		"alloc_blocks_retained": blocks,
+		"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+	}
+
+
+def commit() -> str:
+	try:
+		return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT,
+			stderr=subprocess.DEVNULL).decode().strip()
+
+	except Exception:
+		return None
+
+
+def compare(results: dict, baseline: dict) -> None:
+	"""
+	Prints how each benchmark's time per tick and peak allocation changed
+	from the baseline.
+	"""
+	old = baseline["results"]
+
+	print("\n{0:<42} {1:>12} {2:>12} {3:>8} {4:>8}".format(
+		"benchmark", "before", "after", "time", "alloc"))
+
+	for name, result in results.items():
+		if "per_tick" not in result or "per_tick" not in old.get(name, {}):
+			continue
+
+		before = old[name]
+		time_ratio = result["per_tick"] / before["per_tick"]
+		alloc_ratio = (result["alloc_peak_bytes"] / before["alloc_peak_bytes"]
+			if before["alloc_peak_bytes"] else float("nan"))
+
+		print("{0:<42} {1:>11.3f}ms {2:>11.3f}ms {3:>7.2f}x {4:>7.2f}x".format(
+			name, before["per_tick"] * 1000, result["per_tick"] * 1000,
+			time_ratio, alloc_ratio))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__,
+		formatter_class=argparse.RawDescriptionHelpFormatter)
+
+	parser.add_argument("--output", help="file the results are saved to as json")
+	parser.add_argument("--compare", help="results of an earlier run to compare to")
+	parser.add_argument("--filter", default="", help="only run benchmarks containing this")
+	parser.add_argument("--quick", action="store_true", help="smaller inputs")
+	parser.add_argument("--min-time", type=float, default=0.2,
+		help="least seconds each timing round runs for")
+	parser.add_argument("--repeat", type=int, default=5, help="timing rounds")
+
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.WARNING)
+
+	results = {}
+
+	for name, setup, size in benchmarks(args.quick):
+		if args.filter not in name:
+			continue
+
+		try:
+			tick, calls = setup(*size)
+
+		except Skip as e:
+			results[name] = {"skipped": str(e)}
+			print("{0:<42} skipped, {1}".format(name, e))
+			continue
+
+		result = measure(tick, calls, args.min_time, args.repeat)
+		results[name] = result
+
+		print("{0:<42} {1:>10.3f}ms/tick {2:>10.2f}us/call {3:>10.1f}KiB peak".format(
+			name, result["per_tick"] * 1000, result["per_call"] * 1e6,
+			result["alloc_peak_bytes"] / 1024))
+
+	report = {
+		"commit": commit(),
+		"time": time.time(),
+		"python": platform.python_version(),
+		"numpy": np.__version__,
+		"platform": platform.platform(),
+		"quick": args.quick,
+		"results": results,
+	}
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(report, f, indent="\t")
+
+	if args.compare:
+		with open(args.compare, "r") as f:
+			compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,114 @@
+"""
+Synthetic market data for the benchmarks. Everything is generated from a seed
+so runs on different commits see the same data.
+"""
+import numpy as np
+
+
+def symbols(count: int, quote: str = "BTC") -> list:
+	"""
+	Makes up count market symbols, ie AAA0/BTC.
+	"""
+	return ["S{0:05d}/{1}".format(i, quote) for i in range(count)]
+
+
+def random_walk_ohlcv(count: int, candles: int, timeframe_ms: int = 1800000,
+		seed: int = 0) -> dict:
+
+	"""
+	Generates ccxt style candles for count markets following a random walk.
+
+	Args:
+		count: number of markets
+		candles: candles per market
+		timeframe_ms: length of a candle in milliseconds
+		seed: seed of the random walk
+
+	Returns:
+		dict of symbols and their candles, [timestamp, open, high, low, close,
+		volume] oldest first
+
+	"""
+	rng = np.random.RandomState(seed)
+
+	start = rng.uniform(0.00001, 0.1, size=(count, 1))
+	steps = rng.normal(0, 0.01, size=(count, candles))
+	close = start * np.exp(np.cumsum(steps, axis=1))
+
+	open_ = np.empty_like(close)
+	open_[:, 0] = start[:, 0]
+	open_[:, 1:] = close[:, :-1]
+
+	spread = np.abs(rng.normal(0, 0.005, size=(count, candles)))
+	high = np.maximum(open_, close) * (1 + spread)
+	low = np.minimum(open_, close) * (1 - spread)
+	volume = rng.uniform(1, 1000, size=(count, candles))
+
+	timestamps = np.arange(candles, dtype=np.int64) * timeframe_ms
+
+	data = {}
+
+	for i, symbol in enumerate(symbols(count)):
+		data[symbol] = np.column_stack(
+			[timestamps, open_[i], high[i], low[i], close[i], volume[i]]).tolist()
+
+	return data
+
+
+def ticker_snapshots(count: int, ticks: int, volatility: float = 0.02,
+		seed: int = 0) -> list:
+
+	"""
+	Generates consecutive ticker snapshots of count markets, each one a random
+	step away from the last so some markets cross the mooning/free fall
+	thresholds.
+
+	Args:
+		count: number of markets
+		ticks: number of snapshots
+		volatility: standard deviation of each step
+		seed: seed of the steps
+
+	Returns:
+		list of dicts of symbols and their last price
+
+	"""
+	rng = np.random.RandomState(seed)
+	names = symbols(count)
+
+	prices = rng.uniform(0.00001, 0.1, size=count)
+	snapshots = []
+
+	for _ in range(ticks):
+		prices = prices * np.exp(rng.normal(0, volatility, size=count))
+		snapshots.append(dict(zip(names, prices.tolist())))
+
+	return snapshots
+
+
+def tickers(snapshot: dict) -> dict:
+	"""
+	Wraps a snapshot into ccxt style tickers.
+	"""
+	return {
+			symbol: {"symbol": symbol, "last": price}
+			for symbol, price in snapshot.items()
+		}
+
+
+def cmc_ticker(rank: int = 1) -> dict:
+	"""
+	Makes up a coinmarketcap ticker the way the v1 api returns it.
+	"""
+	return {
+		"id": "coin-{0}".format(rank),
+		"name": "Coin {0}".format(rank),
+		"symbol": "C{0}".format(rank),
+		"rank": str(rank),
+		"price_usd": "1234.5678",
+		"price_btc": "0.1234",
+		"market_cap_usd": "123456789012.0",
+		"percent_change_1h": "0.5",
+		"percent_change_24h": "-2.3",
+		"percent_change_7d": "10.1",
+	}
@@ -2,7 +2,6 @@
 import traceback
 import logging
 import asyncio
-import locale
 import random
 import yaml
 import json
@@ -15,7 +14,10 @@ import aiohttp
 sys.path.append("helpers/")
 
 import output_generator as og
-from exchange_processor import ExchangeProcessor
+from exchange_processor import ExchangeProcessor, DEFAULT_SIGNALS
+from market_data_hub import MarketDataHub
+from subscription_registry import SubscriptionRegistry
+from send_queue import SendQueue
 from database import ServerDatabase
 
 class Hasami:
@@ -30,6 +32,9 @@ class Hasami:
 		_logger: Logger to be used when logging.
 		_db: database used to get and store servre data.
 		_interval: Time to wait between each analysis of the markets.
+		_subscriptions: Servers wanting signals kept in memory.
+		_hub: Hub polling the exchanges and publishing their updates.
+		_sender: Queue delivering the signals to discord.
 		_prefix: Default prefix used to specify commands.
 
 	"""
@@ -44,7 +49,30 @@ class Hasami:
 		self._interval = config["update_interval"]
 		self._prefix = config["prefix"]
 
-		self.exchange_processor = ExchangeProcessor(self._logger, config, self._db)
+		# everything is timed on the loop's clock
+		clock = self._client.loop.time
+
+		self.exchange_processor = ExchangeProcessor(
+			self._logger, config, self._db, clock=clock)
+		self._subscriptions = SubscriptionRegistry(
+			self._logger, self._db,
+			reconcile=config.get("subscription_reconcile", 5) * 60
+			)
+		self._hub = MarketDataHub(
+			self._logger, self.exchange_processor, self._subscriptions, self._interval,
+			streaming=config.get("price_stream", False),
+			stream_urls=config.get("stream_urls"),
+			stream_timeout=config.get("stream_timeout", 30),
+			clock=clock
+			)
+
+		self._sender = SendQueue(
+			self._logger, self._client,
+			rate=config.get("send_rate", 45),
+			retries=config.get("send_retries", 5),
+			workers=config.get("send_workers", 20),
+			clock=clock
+			)
 
 		self._client.loop.create_task(self._set_playing_status())
 
@@ -52,12 +80,50 @@ class Hasami:
 	async def start(self):
 		"""
 		Starts the bot by loading the exchange data for any exchanges to be checked
-		and then starts sending price/rsi signals.
+		and then starts sending price/indicator signals.
 		"""
 
 		await self._initialize_checker()
-		self._client.loop.create_task(self.send_server_price_update_signals())
-		self._client.loop.create_task(self.send_server_rsi_update_signals())
+
+		# subscribe before the hub starts so no updates are missed
+		price_updates = self._hub.subscribe()
+		indicator_updates = self._hub.subscribe()
+
+		self._client.loop.create_task(self._hub.run())
+		self._client.loop.create_task(self.send_server_price_update_signals(price_updates))
+		self._client.loop.create_task(
+			self.send_server_indicator_update_signals(indicator_updates))
+
+
+	def register_metrics(self, metrics) -> None:
+		"""
+		Registers the metrics of the exchanges, ticks and deliveries.
+
+		Args:
+			metrics: MetricsRegistry the metrics are registered in
+
+		"""
+		self.exchange_processor.register_metrics(metrics)
+		self._hub.register_metrics(metrics)
+		self._sender.register_metrics(metrics)
+
+
+	async def join(self) -> None:
+		"""
+		Waits until every signal that's been queued has been sent.
+		"""
+		await self._sender.join()
+
+
+	async def close(self) -> None:
+		"""
+		Closes any connections the bot has opened to the exchanges.
+		"""
+
+		await self._hub.close()
+		await self._subscriptions.close()
+		await self._sender.close()
+		await self.exchange_processor.close()
 
 
 	async def _set_playing_status(self):
@@ -66,15 +132,13 @@ class Hasami:
 		cryptocurrencies as a whole.
 		"""
 
-		locale.setlocale(locale.LC_ALL, "")
-
 		while True:
 			await self._client.wait_until_ready()
 
 			data = await self.exchange_processor.get_crypto_mcap()
 
 			mc = int(data["total_market_cap_usd"])
-			mc = locale.currency(mc, grouping=True)
+			mc = og.format_usd(mc)
 
 			self._logger.info("Setting market cap {0}".format(mc))
 
@@ -88,9 +152,10 @@ class Hasami:
 			exchanges: list) -> None:
 
 		"""
-		Swets the output channel and exchanges that the sever wants toget signals for
-		and adds it to the database if it already isn't. Uses bittrex as the default
-		exchange if none are specified.
+		Subscribes the message's channel to the signals of exchanges and adds the
+		server to the database if it already isn't. Other channels keep their
+		subscriptions, so exchanges can be sent to different channels. Uses bittrex
+		as the default exchange if none are specified.
 
 		Args:
 			message: message used to ask for signals
@@ -109,13 +174,13 @@ class Hasami:
 		server_name = message.server.name
 		
 		if not await self._db.server_exists(server_id):
-			await self._db.add_server(server_id, server_name, self._base_prefix)
+			await self._db.add_server(server_id, server_name, self._prefix)
 
 		# load markets
 		await self.exchange_processor.load_exchanges(exchanges)
 
-		await self._db.update_output_channel(server_id, message.channel.id)
-		await self._db.add_exchanges(server_id, exchanges)
+		signals = await self._db.get_signals(server_id) or DEFAULT_SIGNALS
+		await self._db.subscribe(server_id, message.channel.id, exchanges, signals)
 
 		text = "Added {0.server.name}-{0.channel} to rsi/update outputs and checking {1}"
 		self._logger.info(text.format(message, exchanges))
@@ -125,74 +190,81 @@ class Hasami:
 		"""
 		Loads the exchange data for servers that want signals. This allows for the
 		bot to continously get signals without asking again even if bot goes down.
+		Servers missing from the database are added and the subscriptions are
+		loaded in the same query.
 		"""
 
-		for server in self._client.servers:
-			if not await self._db.server_exists(server.id):
-				await self._db.add_server(server.id, server.name, self._prefix)
+		servers = [(server.id, server.name) for server in self._client.servers]
+		subscriptions = await self._db.reconcile_servers(servers, self._prefix)
 
-			elif await self._db.get_output_channel(server.id):
-				exchanges = await self._db.get_exchanges(server.id)
+		exchanges = sorted({row["exchange"] for row in subscriptions})
 
-				if not exchanges == None:
-					self._logger.info("Loading exchanges {0}".format(exchanges))
+		if exchanges:
+			await self.exchange_processor.load_exchanges(exchanges)
 
-					await self.exchange_processor.load_exchanges(exchanges)
+		await self._subscriptions.start(subscriptions)
 
 
-	async def send_server_price_update_signals(self) -> None:
+	async def send_server_price_update_signals(self, updates: asyncio.Queue) -> None:
 		"""
-		Goes through all servers that wants price update signals in database 
-		and sends them for the exchanges specified.
+		Queues the price updates the market data hub publishes to be sent to every
+		server subscribed to the exchange that wants price signals.
+
+		Args:
+			updates: queue the hub publishes exchange updates to
+
 		"""
 
 		while True:
-			servers = await self._db.servers_wanting_signals()
+			update = await updates.get()
 
-			if not servers:
-				await asyncio.sleep(int(self._interval * 60))
+			if not update.prices:
 				continue
 
-			try: 
-				data = self.exchange_processor.yield_exchange_price_updates(servers)
-				async for channel, embed in data:
-					await self._client.wait_until_ready()
-					channel = discord.Object(channel)
-					await self._client.send_message(channel, embed=embed)
+			try:
+				# rendered once and shared by every subscriber
+				embeds = og.create_price_update_embeds(update.prices)
+
+				for subscriber in update.subscribers:
+					if "price" in subscriber.signals:
+						for embed in embeds:
+							self._sender.send(subscriber.channel, embed)
 
 			except Exception as e:
-				self._logger.debug(traceback.print_exc())
+				self._logger.debug(traceback.format_exc())
 				self._logger.warning(e)
 
-			await asyncio.sleep(int(self._interval * 60))
-
 
-	async def send_server_rsi_update_signals(self) -> None:
+	async def send_server_indicator_update_signals(self, updates: asyncio.Queue) -> None:
 		"""
-		Goes through all servers that wants rsi update signals in database 
-		and sends them for the exchanges specified.
+		Queues the indicator updates the market data hub publishes to be sent to
+		every server subscribed to the exchange that wants the indicator's signals.
+
+		Args:
+			updates: queue the hub publishes exchange updates to
+
 		"""
 
 		while True:
-			servers = await self._db.servers_wanting_signals()
+			update = await updates.get()
 
-			if not servers: 
-				await asyncio.sleep(int(self._interval * 60))
+			if not update.indicators:
 				continue
 
 			try:
-				data = self.exchange_processor.yield_exchange_rsi_updates(servers)
-				async for channel, embed in data:
-					await self._client.wait_until_ready()
-					channel = discord.Object(channel)
-					await self._client.send_message(channel, embed=embed)
+				# rendered once and shared by every subscriber
+				embeds = self.exchange_processor.create_indicator_embeds(update.indicators)
+
+				for subscriber in update.subscribers:
+					for name, indicator_embeds in embeds.items():
+						if name in subscriber.signals:
+							for embed in indicator_embeds:
+								self._sender.send(subscriber.channel, embed)
 
 			except Exception as e:
-				self._logger.debug(traceback.print_exc())
+				self._logger.debug(traceback.format_exc())
 				self._logger.warning(e)
 
-			await asyncio.sleep(int(self._interval * 60))
-
 
 	async def stop_sending_signals(self, message: discord.Message, exchanges: list) -> None:
 		"""
@@ -213,26 +285,54 @@ class Hasami:
 			message.channel, "Stopping {0.author.mention} !".format(message))
 
 		server_id = message.server.id
-		await self._db.update_output_channel(server_id, None)
 		
 		if len(exchanges) == 0:
 			text = "Removing {0.server.name}-{1} from update channels"\
 				.format(message, chan)
 
-			await self._db.update_exchanges(server_id, None)
+			await self._db.unsubscribe(server_id, chan.id)
 
 		else:
 			text = "Removing exchanges {2} from {0.server.name}-{1}"\
 				.format(message, chan, exchanges)
 
-			await self._db.remove_exchanges(server_id, exchanges)
+			await self._db.unsubscribe(server_id, chan.id, exchanges)
 
 		self._logger.info(text)
 
 
+	async def set_signals(self, message: discord.Message, signals: list) -> None:
+		"""
+		Sets the signal types the message's server wants sent, ie price, rsi, macd.
+		Goes back to the default signals if none are specified.
+
+		Args:
+			message: message used to ask for the signals
+			signals: signal types the server wants
+
+		"""
+
+		known = ["price"] + list(self.exchange_processor.indicators)
+		unknown = [s for s in signals if s not in known]
+
+		if unknown:
+			text = "Unknown signals {0}, choose from {1}".format(
+				", ".join(unknown), ", ".join(known))
+			await self._client.send_message(message.channel, text)
+			return
+
+		await self._db.update_signals(
+			message.server.id, signals or None, signals or DEFAULT_SIGNALS)
+
+		text = "Sending {0} signals {1.author.mention} !".format(
+			", ".join(signals) if signals else "default", message)
+		await self._client.send_message(message.channel, text)
+
+
 	async def price(self, message: discord.Message, markets: list) -> None:
 		"""
-		Sends price for markets given from cmc in a pretty embed.
+		Sends price for markets given from cmc in a pretty embed. Every market
+		is looked up and queried at the same time.
 
 		Args:
 			message: message used to ask for price, sends to message channel
@@ -240,16 +340,18 @@ class Hasami:
 
 		"""
 
-		for market in markets:
-
-			market = await self.exchange_processor.find_cmc_ticker(market)
+		found = await asyncio.gather(*[
+				self.exchange_processor.find_cmc_ticker(market) for market in markets
+			])
+		found = [market for market in found if market]
 
-			if not market:
-				continue
+		infos = await self.exchange_processor.cmc_market_queries(found)
 
-			info = await self.exchange_processor.cmc_market_query(market)
-			await self._client.send_message(
-				message.channel, embed=og.create_cmc_price_embed(info[0]))
+		# sent in the order they were asked for
+		for market in found:
+			if market in infos:
+				await self._client.send_message(
+					message.channel, embed=og.create_cmc_price_embed(infos[market]))
 
 
 	async def crypto_cap(self, message: discord.Message) -> None:
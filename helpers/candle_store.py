@@ -0,0 +1,488 @@
+import struct
+import mmap
+import os
+
+
+# magic, timeframe, capacity, oldest and newest timestamp stored, symbol
+HEADER = struct.Struct("<8sqqqq48s")
+MAGIC = b"HSMCNDL2"
+
+# timestamp, open, high, low, close, volume
+RECORD = struct.Struct("<6d")
+FIELDS = 6
+RECORD_SIZE = RECORD.size
+
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(FIELDS)
+
+
+class CandleFile:
+	"""
+	Memory mapped file holding the candles of every market of one exchange and
+	timeframe, one fixed size slot per market. Each slot starts with a header
+	naming its market so the file can be reopened without an index. Keeping
+	every market in one file means an exchange only ever holds one file
+	descriptor however many markets it has.
+
+	Attributes:
+		timeframe: length of a candle in milliseconds
+		capacity: how many candles each slot keeps
+		slot_size: bytes each slot takes
+		map: memory map of the file
+		values: float64 view over the whole map
+		_path: path of the file
+		_slots: symbol mapped to the index of its slot
+		_free: indexes of slots that aren't used
+		_count: number of slots in the file
+	"""
+
+	def __init__(self, path: str, timeframe: int, capacity: int, slots: int = 64):
+		self.timeframe = timeframe
+		self.capacity = capacity
+		self.slot_size = HEADER.size + RECORD_SIZE * capacity
+
+		self._path = path
+		self._slots = {}
+		self._free = []
+
+		size = os.path.getsize(path) if os.path.exists(path) else 0
+
+		# slots from another retention or timeframe can't be read
+		if size and (size % self.slot_size or not self._compatible(path, size)):
+			size = 0
+
+		self._count = size // self.slot_size or slots
+		self.map = None
+		self.values = None
+
+		self._remap(fresh=size == 0)
+
+		for index in range(self._count):
+			magic, _, _, _, _, symbol = HEADER.unpack_from(self.map, index * self.slot_size)
+
+			if magic == MAGIC:
+				self._slots[symbol.rstrip(b"\0").decode("utf-8")] = index
+			else:
+				self._free.append(index)
+
+		self._free.reverse()
+
+
+	def _compatible(self, path: str, size: int) -> bool:
+		"""
+		Checks if the slots of an existing file were written with this
+		timeframe and capacity.
+		"""
+		with open(path, "rb") as f:
+			while f.tell() < size:
+				header = f.read(HEADER.size)
+				magic, timeframe, capacity, _, _, _ = HEADER.unpack(header)
+
+				if magic == MAGIC:
+					return timeframe == self.timeframe and capacity == self.capacity
+
+				f.seek(self.slot_size - HEADER.size, os.SEEK_CUR)
+
+		return True
+
+
+	def _remap(self, fresh: bool = False) -> None:
+		"""
+		Maps the file at its current slot count. The descriptor is closed once
+		it's mapped. The old map is left to be closed once nothing uses it.
+		"""
+		size = self._count * self.slot_size
+
+		with open(self._path, "w+b" if fresh else "r+b") as f:
+			if fresh or os.path.getsize(self._path) < size:
+				f.truncate(size)
+
+			self.map = mmap.mmap(f.fileno(), size)
+
+		self.values = memoryview(self.map).cast("d")
+
+
+	def offset(self, symbol: str) -> int:
+		"""
+		Gets the byte offset of symbol's slot, giving it a slot the first time.
+		"""
+		index = self._slots.get(symbol)
+
+		if index is None:
+			# checked before a slot is claimed so a failed symbol doesn't keep one
+			name = symbol.encode("utf-8")
+			if len(name) > 48:
+				raise ValueError("Symbol {0} is too long to be stored".format(symbol))
+
+			if not self._free:
+				self._grow()
+
+			index = self._slots[symbol] = self._free.pop()
+
+			offset = index * self.slot_size
+			self.map[offset:offset + self.slot_size] = bytes(self.slot_size)
+			HEADER.pack_into(self.map, offset, MAGIC, self.timeframe, self.capacity,
+				0, 0, name)
+
+		return index * self.slot_size
+
+
+	def _grow(self) -> None:
+		"""
+		Doubles the number of slots.
+		"""
+		old = self._count
+		self._count *= 2
+
+		self.map.flush()
+		self._remap()
+
+		self._free.extend(reversed(range(old, self._count)))
+
+
+	def remove(self, symbol: str) -> bool:
+		"""
+		Frees the slot of symbol.
+
+		Returns:
+			True if symbol had a slot
+
+		"""
+		index = self._slots.pop(symbol, None)
+
+		if index is None:
+			return False
+
+		self.map[index * self.slot_size:index * self.slot_size + HEADER.size] = \
+			bytes(HEADER.size)
+		self._free.append(index)
+
+		return True
+
+
+	def close(self) -> None:
+		"""
+		Flushes the candles to disk and unmaps the file.
+		"""
+		self.values.release()
+		self.map.flush()
+
+		try:
+			self.map.close()
+
+		except BufferError:
+			# views from column are still alive, the map is closed once they're gone
+			pass
+
+
+class CandleSeries:
+	"""
+	Closed OHLCV candles of one market stored in a fixed size ring buffer of
+	float64 records inside its slot of a CandleFile. Each candle has its own
+	slot worked out from its timestamp, so candles can be written in any order
+	and missing ones show up as slots holding the wrong timestamp.
+
+	Attributes:
+		symbol: symbol of the market
+		timeframe: length of a candle in milliseconds
+		capacity: how many candles are kept, older ones are overwritten
+		gaps: (start, end) timestamps of candles missing between stored ones
+		_file: file the candles are stored in
+	"""
+
+	def __init__(self, candle_file: CandleFile, symbol: str):
+		self.symbol = symbol
+		self.timeframe = candle_file.timeframe
+		self.capacity = candle_file.capacity
+		self.gaps = []
+
+		self._file = candle_file
+
+		if self.last is not None:
+			self._find_gaps()
+
+
+	@property
+	def _offset(self) -> int:
+		# looked up every time since slots move when the file grows
+		return self._file.offset(self.symbol)
+
+
+	def _header(self) -> tuple:
+		offset = self._offset
+		return HEADER.unpack_from(self._file.map, offset)
+
+
+	def _index(self, timestamp: int) -> int:
+		"""
+		Gets the index in the file's values of the first value of timestamp's
+		record.
+		"""
+		return (self._offset + HEADER.size) // 8 + self._slot(timestamp)
+
+
+	@property
+	def last(self) -> int:
+		"""
+		Timestamp of the newest candle stored, None if there aren't any.
+		"""
+		last = self._header()[4]
+
+		return last if last else None
+
+
+	@property
+	def first(self) -> int:
+		"""
+		Timestamp of the oldest candle stored that hasn't been overwritten.
+		"""
+		oldest, last = self._header()[3:5]
+
+		return max(oldest, last - (self.capacity - 1) * self.timeframe)
+
+
+	def _write(self, timestamp: int, *values) -> None:
+		"""
+		Writes a candle into its slot.
+		"""
+		index = self._index(timestamp)
+		RECORD.pack_into(self._file.map, index * 8, timestamp, *values)
+
+
+	def _slot(self, timestamp: int) -> int:
+		"""
+		Gets the index of the first value of timestamp's record in the ring.
+		"""
+		return (timestamp // self.timeframe) % self.capacity * FIELDS
+
+
+	def _has(self, timestamp: int) -> bool:
+		"""
+		Checks if the candle for timestamp is stored.
+		"""
+		index = self._index(timestamp)
+		return self._file.values[index + TIMESTAMP] == timestamp
+
+
+	def _find_gaps(self) -> None:
+		"""
+		Finds the candles missing from the stored window, used when a series is
+		opened from disk.
+		"""
+		self.gaps = []
+		start = None
+
+		for timestamp in range(self.first, self.last + 1, self.timeframe):
+			if not self._has(timestamp):
+				start = timestamp if start is None else start
+
+			elif start is not None:
+				self.gaps.append((start, timestamp - self.timeframe))
+				start = None
+
+
+	def since(self, now: int, history: int) -> int:
+		"""
+		Gets the timestamp candles have to be fetched from to bring the series up
+		to date.
+
+		Args:
+			now: current time in milliseconds
+			history: how many candles to start an empty series with
+
+		Returns:
+			timestamp in milliseconds of the first candle needed
+
+		"""
+		last = self.last
+		start = now - now % self.timeframe - history * self.timeframe
+
+		# nothing stored is recent enough to be kept
+		if last is None or last < now - self.capacity * self.timeframe:
+			return start
+
+		return last + self.timeframe
+
+
+	def extend(self, candles: list, now: int) -> None:
+		"""
+		Writes the closed candles into the series, ignoring the candle that's
+		still open and any older than the series keeps. Records a gap when the
+		candles don't continue on from the newest one stored.
+
+		Args:
+			candles: ohlcv candles from ccxt
+			now: current time in milliseconds
+
+		"""
+		magic, _, _, oldest, last, name = self._header()
+		last = last or None
+
+		for candle in candles:
+			timestamp = int(candle[0])
+
+			if timestamp + self.timeframe > now:
+				continue
+
+			if last is not None:
+				if timestamp <= last - self.capacity * self.timeframe:
+					continue
+
+				# everything stored has fallen out of the window
+				if timestamp - self.capacity * self.timeframe >= last:
+					oldest = timestamp
+					self.gaps = []
+
+				elif timestamp > last + self.timeframe:
+					self.gaps.append((last + self.timeframe, timestamp - self.timeframe))
+
+			self._write(timestamp, *(v or 0 for v in candle[1:FIELDS]))
+
+			if last is None or timestamp > last:
+				last = timestamp
+
+			if not oldest or timestamp < oldest:
+				oldest = timestamp
+
+		if last is not None:
+			offset = self._offset
+			HEADER.pack_into(self._file.map, offset, magic, self.timeframe,
+				self.capacity, oldest, last, name)
+
+
+	def settle(self) -> None:
+		"""
+		Fills whatever candles are still missing after backfilling with a flat
+		candle at the previous close, markets with no trades don't get candles on
+		some exchanges, and forgets the gaps.
+		"""
+		for start, end in self.gaps:
+			for timestamp in range(max(start, self.first), end + 1, self.timeframe):
+				if self._has(timestamp):
+					continue
+
+				previous = self._index(timestamp - self.timeframe)
+				close = self._file.values[previous + CLOSE]
+
+				self._write(timestamp, close, close, close, close, 0)
+
+		self.gaps = []
+
+
+	def column(self, field: int, since: int) -> list:
+		"""
+		Gets a field of the candles from since up to the newest one without
+		copying them, as views over the mapped file. The ring can wrap so the
+		values come back as up to two views, oldest first. The views are only
+		valid until the next candles are stored.
+
+		Args:
+			field: index of the field in the record, ie CLOSE
+			since: timestamp of the first candle wanted
+
+		Returns:
+			list of memoryviews of the values
+
+		"""
+		last = self.last
+
+		if last is None or since > last:
+			return []
+
+		since = max(since, self.first)
+
+		base = (self._offset + HEADER.size) // 8
+		values = self._file.values
+
+		start = base + self._slot(since)
+		end = base + self._slot(last)
+
+		if start <= end:
+			return [values[start + field:end + field + 1:FIELDS]]
+
+		return [
+				values[start + field:base + self.capacity * FIELDS:FIELDS],
+				values[base + field:end + field + 1:FIELDS]
+			]
+
+
+class CandleStore:
+	"""
+	Local store of the OHLCV candles of every market the bot has seen, so candle
+	history survives restarts and only the candles missing from the end have to
+	be downloaded. Each exchange and timeframe is kept in one CandleFile.
+
+	Attributes:
+		_path: directory the candle files are kept in
+		_retention: how many candles are kept per market
+		_files: (exchange, timeframe) mapped to its CandleFile
+		_series: (exchange, symbol, timeframe) mapped to its CandleSeries
+	"""
+
+	def __init__(self, path: str, retention: int = 1000):
+		self._path = path
+		self._retention = retention
+		self._files = {}
+		self._series = {}
+
+
+	def series(self, exchange_id: str, symbol: str, timeframe: str,
+			timeframe_ms: int) -> CandleSeries:
+		"""
+		Gets the series of a market, opening its exchange's file the first time.
+
+		Args:
+			exchange_id: ccxt id of the exchange
+			symbol: symbol of the market
+			timeframe: ccxt timeframe of the candles
+			timeframe_ms: length of the timeframe in milliseconds
+
+		Returns:
+			the market's CandleSeries
+
+		"""
+		key = (exchange_id, symbol, timeframe)
+
+		if key not in self._series:
+			candle_file = self._files.get((exchange_id, timeframe))
+
+			if candle_file is None:
+				directory = os.path.join(self._path, exchange_id)
+				os.makedirs(directory, exist_ok=True)
+
+				candle_file = self._files[(exchange_id, timeframe)] = CandleFile(
+					os.path.join(directory, "{0}.candles".format(timeframe)),
+					timeframe_ms, self._retention)
+
+			self._series[key] = CandleSeries(candle_file, symbol)
+
+		return self._series[key]
+
+
+	def remove(self, exchange_id: str, symbols: list) -> None:
+		"""
+		Drops the candles of markets that are gone, ie delisted, from every
+		timeframe of the exchange.
+
+		Args:
+			exchange_id: ccxt id of the exchange
+			symbols: symbols of the markets
+
+		"""
+		for (exchange, timeframe), candle_file in self._files.items():
+			if exchange != exchange_id:
+				continue
+
+			for symbol in symbols:
+				self._series.pop((exchange_id, symbol, timeframe), None)
+				candle_file.remove(symbol)
+
+
+	def close(self) -> None:
+		"""
+		Closes every file that's been opened.
+		"""
+		for candle_file in self._files.values():
+			candle_file.close()
+
+		self._files.clear()
+		self._series.clear()
@@ -0,0 +1,202 @@
+from collections import OrderedDict
+import asyncio
+
+
+class _TrieNode:
+	"""
+	Node of a character trie remembering the first id inserted through it, so
+	the best match of a prefix is found by walking the prefix alone.
+	"""
+	__slots__ = ("children", "first")
+
+	def __init__(self):
+		self.children = {}
+		self.first = None
+
+
+class _Trie:
+	"""
+	Character trie of ids, ids inserted first win ties.
+	"""
+
+	def __init__(self):
+		self._root = _TrieNode()
+
+
+	def insert(self, key: str, value: str) -> None:
+		node = self._root
+
+		for char in key:
+			child = node.children.get(char)
+
+			if child is None:
+				child = node.children[char] = _TrieNode()
+
+			node = child
+
+			if node.first is None:
+				node.first = value
+
+
+	def first(self, prefix: str) -> str:
+		"""
+		Gets the first id inserted with a key starting with prefix.
+		"""
+		node = self._root
+
+		for char in prefix:
+			node = node.children.get(char)
+
+			if node is None:
+				return None
+
+		return node.first
+
+
+class CMCIndex:
+	"""
+	Every coinmarketcap ticker indexed in memory so tickers can be looked up
+	without touching the network. Lookups match, in order of preference, the
+	symbol, id or name exactly, then the start of the name, then anywhere else
+	in the name. Ties go to the higher ranked coin like cmc's own ordering.
+
+	The index is loaded on first use and rebuilt in the background once per ttl.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_fetch: coroutine function getting every cmc ticker.
+		_ttl: seconds between each rebuild.
+		_negative_size: most missed lookups remembered.
+		_exact: lowercase symbols, ids and names mapped to their id.
+		_prefixes: trie of lowercase names.
+		_substrings: trie of every lowercase name's suffixes after the first
+			character, a prefix of a suffix being a substring of the name.
+		_misses: lookups that found nothing since the last rebuild.
+		_loaded: future resolved once the index has been loaded.
+		_refresher: task rebuilding the index in the background.
+	"""
+
+	def __init__(self, logger, fetch, ttl: float = 3600, negative_size: int = 10000):
+		self._logger = logger
+		self._fetch = fetch
+		self._ttl = ttl
+		self._negative_size = negative_size
+
+		self._exact = {}
+		self._prefixes = _Trie()
+		self._substrings = _Trie()
+		self._misses = OrderedDict()
+
+		self._loaded = None
+		self._refresher = None
+
+
+	def __len__(self) -> int:
+		return len(self._exact)
+
+
+	def build(self, tickers: list) -> None:
+		"""
+		Rebuilds the index from cmc's tickers, which are ordered by rank.
+
+		Args:
+			tickers: every ticker from cmc
+
+		"""
+		exact = {}
+		prefixes = _Trie()
+		substrings = _Trie()
+
+		for t in tickers:
+			cmc_id = t["id"]
+			name = t["name"].lower()
+
+			for key in (t["symbol"].lower(), cmc_id.lower(), name):
+				exact.setdefault(key, cmc_id)
+
+			prefixes.insert(name, cmc_id)
+
+			for i in range(1, len(name)):
+				substrings.insert(name[i:], cmc_id)
+
+		# swapped in at once so lookups never see a half built index
+		self._exact = exact
+		self._prefixes = prefixes
+		self._substrings = substrings
+		self._misses = OrderedDict()
+
+		self._logger.info("Indexed {0} cmc tickers".format(len(tickers)))
+
+
+	def find(self, ticker: str) -> str:
+		"""
+		Finds the cmc id of a ticker.
+
+		Args:
+			ticker: symbol, id or name of the coin
+
+		Returns:
+			the coin's cmc id, None if nothing matches
+
+		"""
+		ticker = ticker.lower()
+
+		if not ticker or ticker in self._misses:
+			return None
+
+		cmc_id = self._exact.get(ticker) or \
+			self._prefixes.first(ticker) or \
+			self._substrings.first(ticker)
+
+		if cmc_id is None:
+			self._misses[ticker] = None
+
+			if len(self._misses) > self._negative_size:
+				self._misses.popitem(last=False)
+
+		return cmc_id
+
+
+	async def _refresh(self) -> None:
+		"""
+		Loads the index then rebuilds it once per ttl. Keeps the old index and
+		tries again sooner if cmc can't be reached.
+		"""
+		while True:
+			delay = self._ttl
+
+			try:
+				self.build(await self._fetch())
+
+			except asyncio.CancelledError:
+				raise
+
+			except Exception as e:
+				self._logger.warning("Couldn't index cmc tickers: {0}".format(e))
+				delay = min(self._ttl, 60)
+
+			if not self._loaded.done():
+				self._loaded.set_result(None)
+
+			await asyncio.sleep(delay)
+
+
+	async def ready(self) -> None:
+		"""
+		Starts the index if it hasn't been and waits for its first load.
+		"""
+		if self._refresher is None:
+			self._loaded = asyncio.get_event_loop().create_future()
+			self._refresher = asyncio.ensure_future(self._refresh())
+
+		await asyncio.shield(self._loaded)
+
+
+	async def close(self) -> None:
+		"""
+		Stops rebuilding the index.
+		"""
+		if self._refresher:
+			self._refresher.cancel()
+			await asyncio.gather(self._refresher, return_exceptions=True)
+			self._refresher = None
@@ -1,8 +1,11 @@
 
 import asyncio
 import asyncpg
+import time
 import re
 
+from metrics import Histogram, HistogramVec
+
 class ServerDatabase:
 	"""
 	Database used to store server information and preferences. This is used to allow
@@ -16,14 +19,35 @@ class ServerDatabase:
 		_user: postgresql user to connect to
 		_host: host postgresql is using
 		_passsword: password for the user
+		_pool_options: min_size, max_size, statement_cache_size and
+			max_cached_statement_lifetime of the pool
+		_default_signals: signal types of servers that haven't chosen any, used
+			when moving old subscriptions over
+		_listener: connection kept open to listen for notifications
+		query_latency: name of each query mapped to a histogram of how long it
+			took in seconds
 	"""
-	def __init__(self, database, user, host, logger, password=None):
+	def __init__(self, database, user, host, logger, password=None,
+			pool_min: int = 2, pool_max: int = 10, statement_cache: int = 100,
+			statement_lifetime: float = 300, default_signals: list = ()):
+
 		self._database = database
 		self._user = user
 		self._host = host
 		self._logger = logger
 		self._password = password
 
+		self._pool_options = {
+			"min_size": pool_min,
+			"max_size": pool_max,
+			"statement_cache_size": statement_cache,
+			"max_cached_statement_lifetime": statement_lifetime,
+		}
+
+		self._default_signals = default_signals
+		self._listener = None
+		self.query_latency = {}
+
 		loop = asyncio.get_event_loop()
 		loop.run_until_complete(self._create_db())
 
@@ -45,8 +69,92 @@ class ServerDatabase:
 				name TEXT,
 				prefix TEXT,
 				output_channel TEXT, 
-				exchanges TEXT ARRAY
+				exchanges TEXT ARRAY,
+				signals TEXT ARRAY
+			)
+			"""
+		)
+
+		# servers tables made before signals could be chosen
+		await conn.execute(
+			"ALTER TABLE servers ADD COLUMN IF NOT EXISTS signals TEXT ARRAY")
+
+		# the table is only created along with the migration, otherwise a failed
+		# migration would be skipped by every later startup
+		async with conn.transaction():
+			# every channel's subscription to an exchange's signals, one row each
+			migrate = await conn.fetchval("SELECT to_regclass('subscriptions') IS NULL")
+
+			await conn.execute(
+				"""
+				CREATE TABLE IF NOT EXISTS subscriptions (
+					guild TEXT NOT NULL REFERENCES servers (id) ON DELETE CASCADE,
+					channel TEXT NOT NULL,
+					exchange TEXT NOT NULL,
+					signal_type TEXT NOT NULL,
+					PRIMARY KEY (guild, channel, exchange, signal_type)
+				)
+				"""
+			)
+
+			await conn.execute(
+				"""
+				CREATE INDEX IF NOT EXISTS subscriptions_exchange
+				ON subscriptions (exchange, signal_type)
+				"""
 			)
+			await conn.execute(
+				"CREATE INDEX IF NOT EXISTS subscriptions_channel ON subscriptions (channel)")
+
+			# servers used to keep one output_channel and an array of exchanges, they're
+			# left in place but only read here to move them into subscriptions
+			if migrate:
+				await conn.execute(
+					"""
+					INSERT INTO subscriptions (guild, channel, exchange, signal_type)
+					SELECT DISTINCT s.id, s.output_channel, e.exchange, t.signal_type
+					FROM servers s,
+						unnest(s.exchanges) AS e (exchange),
+						unnest(COALESCE(s.signals, $1::TEXT[])) AS t (signal_type)
+					WHERE s.output_channel IS NOT NULL
+					""",
+					list(self._default_signals)
+				)
+
+		if migrate:
+			self._logger.info("Moved subscriptions out of the servers table")
+
+		# tells listeners about every change to a subscription
+		await conn.execute("DROP TRIGGER IF EXISTS servers_notify ON servers")
+		await conn.execute("DROP FUNCTION IF EXISTS notify_servers()")
+
+		await conn.execute(
+			"""
+			CREATE OR REPLACE FUNCTION notify_subscriptions() RETURNS trigger AS $$
+			BEGIN
+				IF TG_OP = 'INSERT' THEN
+					PERFORM pg_notify('subscriptions_changed', json_build_object(
+						'op', TG_OP, 'old', NULL, 'new', row_to_json(NEW))::text);
+				ELSIF TG_OP = 'DELETE' THEN
+					PERFORM pg_notify('subscriptions_changed', json_build_object(
+						'op', TG_OP, 'old', row_to_json(OLD), 'new', NULL)::text);
+				ELSE
+					PERFORM pg_notify('subscriptions_changed', json_build_object(
+						'op', TG_OP, 'old', row_to_json(OLD), 'new', row_to_json(NEW))::text);
+				END IF;
+
+				RETURN NULL;
+			END;
+			$$ LANGUAGE plpgsql
+			"""
+		)
+
+		await conn.execute("DROP TRIGGER IF EXISTS subscriptions_notify ON subscriptions")
+		await conn.execute(
+			"""
+			CREATE TRIGGER subscriptions_notify
+			AFTER INSERT OR UPDATE OR DELETE ON subscriptions
+			FOR EACH ROW EXECUTE PROCEDURE notify_subscriptions()
 			"""
 		)
 
@@ -54,12 +162,99 @@ class ServerDatabase:
 
 		self.pool = await asyncpg.create_pool(
 			database=self._database, user=self._user, 
-			host=self._host, password=self._password
+			host=self._host, password=self._password,
+			**self._pool_options
 			)
 
 		self._logger.info("Set up database")
 
 
+	async def _run(self, method: str, name: str, query: str, *args):
+		"""
+		Runs a query on a pooled connection and records how long it took. Queries
+		are single statements so they run without an explicit transaction, and
+		each connection keeps its statements prepared in its statement cache so
+		a query is only parsed and planned the first time a connection runs it.
+
+		Args:
+			method: pool method to run the query with, ie fetch, fetchval
+			name: name the query's latency is recorded under
+			query: sql of the query
+			*args: arguments of the query
+
+		Returns:
+			what the pool method returns
+
+		"""
+		start = time.perf_counter()
+
+		try:
+			return await getattr(self.pool, method)(query, *args)
+
+		finally:
+			self._observe(name, time.perf_counter() - start)
+
+
+	async def _run_transaction(self, name: str, statements: list) -> None:
+		"""
+		Runs several statements in one transaction and records how long they
+		took together.
+
+		Args:
+			name: name the latency is recorded under
+			statements: list of (query, args) to execute in order
+
+		"""
+		start = time.perf_counter()
+
+		try:
+			async with self.pool.acquire() as conn:
+				async with conn.transaction():
+					for query, args in statements:
+						await conn.execute(query, *args)
+
+		finally:
+			self._observe(name, time.perf_counter() - start)
+
+
+	def _observe(self, name: str, seconds: float) -> None:
+		latency = self.query_latency.get(name)
+
+		if latency is None:
+			latency = self.query_latency[name] = Histogram()
+
+		latency.observe(seconds)
+
+
+	def register_metrics(self, metrics) -> None:
+		"""
+		Registers the latency of each query.
+
+		Args:
+			metrics: MetricsRegistry the metrics are registered in
+
+		"""
+		metrics.register("hasami_db_query_seconds", "Seconds each database query took.",
+			HistogramVec(("query",), histograms=self.query_latency))
+
+
+	def slowest_queries(self, count: int = 5) -> list:
+		"""
+		Gets the queries with the highest p95 latency.
+
+		Args:
+			count: how many queries to get
+
+		Returns:
+			list of (name, summary of its latency), slowest first
+
+		"""
+		summaries = [(name, h.summary()) for name, h in self.query_latency.items()]
+		summaries.sort(key=lambda s: s[1]["p95"], reverse=True)
+
+		return summaries[:count]
+
+
 	async def get_server(self, server_id: str) -> list:
 		"""
 		Returns server information:
@@ -68,6 +263,7 @@ class ServerDatabase:
 			prefix
 			output_channel
 			exchanges
+			signals
 
 		Args:
 			server_id: server whose information is to be selected
@@ -75,9 +271,7 @@ class ServerDatabase:
 		query = "SELECT * FROM servers WHERE id = $1"
 		self._logger.debug("Getting server {0}".format(server_id))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				return await conn.fetchrow(query, server_id)
+		return await self._run("fetchrow", "get_server", query, server_id)
 
 
 	async def server_exists(self, server_id: str) -> bool:
@@ -98,7 +292,7 @@ class ServerDatabase:
 
 	async def add_server(self, server_id: str, name: str, prefix: str) -> None:
 		"""
-		Adds server to database, output_channel and exchanges are null by default
+		Adds server to database, it has no subscriptions by default
 
 		Args:
 			server_id: server whose information is to be selected
@@ -106,12 +300,10 @@ class ServerDatabase:
 			prefix: prefix to be used for commands in the server
 
 		"""
-		query = "INSERT INTO servers VALUES ($1, $2, $3, $4, $5)"
+		query = "INSERT INTO servers (id, name, prefix) VALUES ($1, $2, $3)"
 		self._logger.debug("Adding server {0}".format(server_id))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				await conn.execute(query, server_id, name, prefix, None, None)
+		await self._run("execute", "add_server", query, server_id, name, prefix)
 
 
 	async def get_exchanges(self, server_id: str) -> list:
@@ -122,38 +314,31 @@ class ServerDatabase:
 			server_id: server whose information is to be selected
 
 		Returns:
-			list of exchanges that the server wants signals for
+			list of exchanges that the server wants signals for, None if it
+			isn't subscribed to any
 
 		"""
-		query = "SELECT exchanges FROM servers WHERE id = $1"
+		query = "SELECT array_agg(DISTINCT exchange) FROM subscriptions WHERE guild = $1"
 		self._logger.debug("Getting exchanges from server {0}".format(server_id))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				res = await conn.fetchval(query, server_id)
-
-				return res
+		return await self._run("fetchval", "get_exchanges", query, server_id)
 
 
-	async def get_output_channel(self, server_id: str) -> str:
+	async def get_signals(self, server_id: str) -> list:
 		"""
-		Gets the output_channel the server wants signals sent to.
+		Gets the signal types the server wants, ie price, rsi, macd.
 
 		Args:
 			server_id: server whose information is to be selected
 
 		Returns:
-			str of the output_channel's id
+			list of signal types, None if the server hasn't chosen any
 
 		"""
-		query = "SELECT output_channel FROM servers WHERE id = $1"
-		self._logger.debug("Getting out_channel from server {0}".format(server_id))
+		query = "SELECT signals FROM servers WHERE id = $1"
+		self._logger.debug("Getting signals from server {0}".format(server_id))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				res = await conn.fetchval(query, server_id)
-				
-				return res
+		return await self._run("fetchval", "get_signals", query, server_id)
 
 
 	async def get_prefix(self, server_id: str) -> str:
@@ -170,20 +355,29 @@ class ServerDatabase:
 		query = "SELECT prefix FROM servers WHERE id = $1"
 		self._logger.debug("Getting prefix from server {0}".format(server_id))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				res = await conn.fetchval(query, server_id)
+		return await self._run("fetchval", "get_prefix", query, server_id)
+
+
+	async def get_prefixes(self) -> dict:
+		"""
+		Gets the prefix of every server in one query.
+
+		Returns:
+			dict of server ids and their prefix, None if they haven't got one
+
+		"""
+		query = "SELECT id, prefix FROM servers"
+		self._logger.debug("Getting all prefixes")
 
-				return res
+		res = await self._run("fetch", "get_prefixes", query)
+
+		return {r["id"]: r["prefix"] for r in res}
 
 
 	async def get_servers(self) -> list:
 		"""
 		Gets every server's id & name (Will be deprecated)
 
-		Args:
-			server_id: server whose information is to be selected
-
 		Returns:
 			list of all server's information
 
@@ -191,11 +385,7 @@ class ServerDatabase:
 		query = "SELECT id, name FROM servers"
 		self._logger.debug("Getting all servers")
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				res = await conn.fetchval(query, server_id)
-
-				return res
+		return await self._run("fetch", "get_servers", query)
 
 
 	async def update_prefix(self, server_id: str, prefix: str) -> None:
@@ -211,87 +401,124 @@ class ServerDatabase:
 		self._logger.debug("Updating prefix to {0} for server {1}"\
 			.format(prefix, server_id))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				await conn.execute(query, prefix, server_id)
+		await self._run("execute", "update_prefix", query, prefix, server_id)
 
 
-	async def update_output_channel(self, server_id: str, output_channel: str) -> None:
+	async def update_signals(self, server_id: str, signals: list, signal_types: list) -> None:
 		"""
-		Sets the output_channel to the one the server wants signals to be sent to.
+		Sets the signal types to the ones the server wants and changes every one
+		of its subscriptions over to them.
 
 		Args:
-			server_id: server whose prefix is to be changed
-			output_channel: what the curr output_channel is to be changed to
+			server_id: server whose signals are to be changed
+			signals: signal types the server chose, None for the defaults
+			signal_types: signal types its subscriptions are to have, ie the
+				defaults if it didn't choose any
 
 		"""
-		query = "UPDATE servers SET output_channel = $1 WHERE id = $2"
-		self._logger.debug("Updating out_channel to {0} for server {1}"\
-			.format(output_channel, server_id))
-
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				await conn.execute(query, output_channel, server_id)
+		self._logger.debug("Updating signals to {0} for server {1}"\
+			.format(signals, server_id))
+
+		# added before the old ones are removed so the channels and exchanges
+		# subscribed to aren't lost
+		await self._run_transaction("update_signals", [
+			("UPDATE servers SET signals = $1 WHERE id = $2", (signals, server_id)),
+			(
+				"""
+				INSERT INTO subscriptions (guild, channel, exchange, signal_type)
+				SELECT DISTINCT s.guild, s.channel, s.exchange, t.signal_type
+				FROM subscriptions s, unnest($2::TEXT[]) AS t (signal_type)
+				WHERE s.guild = $1
+				ON CONFLICT DO NOTHING
+				""",
+				(server_id, signal_types)
+			),
+			(
+				"""
+				DELETE FROM subscriptions
+				WHERE guild = $1 AND signal_type <> ALL($2::TEXT[])
+				""",
+				(server_id, signal_types)
+			),
+		])
+
+
+	async def subscribe(self, server_id: str, channel: str, exchanges: list,
+			signal_types: list) -> None:
 
-
-	async def update_exchanges(self, server_id: str, exchanges: list) -> None:
 		"""
-		Sets the exchanges to the ones the server wants
+		Subscribes a channel of the server to the signals of exchanges.
 
 		Args:
-			server_id: server whose prefix is to be changed
-			exchanges: what the curr exchanges are to be to changed to
+			server_id: server the channel is in
+			channel: channel the signals are to be sent to
+			exchanges: exchanges to be subscribed to
+			signal_types: signal types to be sent from each exchange
 
 		"""
-		query = "UPDATE servers SET exchanges = $1 WHERE id = $2"
-		self._logger.debug("Updating exchanges to {0} for server {1}"\
-			.format(exchanges, server_id))
+		query = """
+			INSERT INTO subscriptions (guild, channel, exchange, signal_type)
+			SELECT $1, $2, e.exchange, t.signal_type
+			FROM unnest($3::TEXT[]) AS e (exchange), unnest($4::TEXT[]) AS t (signal_type)
+			ON CONFLICT DO NOTHING
+			"""
+		self._logger.debug("Subscribing {0}-{1} to {2} {3}".format(
+			server_id, channel, exchanges, signal_types))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				await conn.execute(query, exchanges, server_id)
+		await self._run("execute", "subscribe", query,
+			server_id, channel, exchanges, signal_types)
 
 
-	async def add_exchanges(self, server_id: str, new_exchanges: list) -> None:
+	async def unsubscribe(self, server_id: str, channel: str, exchanges: list = None) -> None:
 		"""
-		Adds exchanges to current exchanges the server is using.
+		Unsubscribes a channel of the server from exchanges.
 
 		Args:
-			server_id: server whose prefix is to be changed
-			new_exchanges: exchanges to be added
+			server_id: server the channel is in
+			channel: channel to be unsubscribed
+			exchanges: exchanges to be unsubscribed from, None for every exchange
 
 		"""
-		self._logger.debug("Adding exchanges {0} for server {1}"\
-			.format(new_exchanges, server_id))
-		exchanges = await self.get_exchanges(server_id)
-
-		if exchanges:
-			exchanges.extend(new_exchanges)
-		else:
-			exchanges = new_exchanges
-
-		# remove duplicates
-		exchanges = list(set(exchanges))
+		query = """
+			DELETE FROM subscriptions
+			WHERE guild = $1 AND channel = $2
+				AND ($3::TEXT[] IS NULL OR exchange = ANY($3::TEXT[]))
+			"""
+		self._logger.debug("Unsubscribing {0}-{1} from {2}".format(
+			server_id, channel, exchanges))
 
-		await self.update_exchanges(server_id, exchanges)
+		await self._run("execute", "unsubscribe", query, server_id, channel, exchanges)
 
 
-	async def remove_exchanges(self, server_id: str, removed_exchanges: list) -> None:
+	async def reconcile_servers(self, servers: list, prefix: str) -> list:
 		"""
-		Removes exchanges from the current exchanges the server is using.
+		Adds every server that isn't in the database yet and gets every
+		subscription, all in one round trip.
 
 		Args:
-			server_id: server whose prefix is to be changed
-			new_exchanges: exchanges to be added
+			servers: (id, name) of every server the bot is in
+			prefix: prefix given to the servers that are added
+
+		Returns:
+			list of each subscription's guild, channel, exchange and signal_type
 
 		"""
-		self._logger.debug("Removing exchanges {0} for server {1}"\
-			.format(removed_exchanges, server_id))
-		exchanges = await self.get_exchanges(server_id)
+		query = """
+			WITH guilds AS (
+				SELECT * FROM unnest($1::TEXT[], $2::TEXT[]) AS g(id, name)
+			), added AS (
+				INSERT INTO servers (id, name, prefix)
+				SELECT id, name, $3 FROM guilds
+				ON CONFLICT (id) DO NOTHING
+			)
+			SELECT guild, channel, exchange, signal_type FROM subscriptions
+			"""
+		self._logger.debug("Reconciling {0} servers".format(len(servers)))
+
+		ids = [server[0] for server in servers]
+		names = [server[1] for server in servers]
 
-		if exchanges:
-			exchanges = [ex for ex in exchanges if ex not in removed_exchanges]
-			await self.update_exchanges(server_id, exchanges)
+		return await self._run("fetch", "reconcile_servers", query, ids, names, prefix)
 
 
 	async def number_update_servers(self) -> int:
@@ -303,31 +530,53 @@ class ServerDatabase:
 
 		"""
 		self._logger.debug("Getting number update servers")
-		query = "SELECT Count(*) FROM servers WHERE output_channel IS NOT NULL"
+		query = "SELECT count(DISTINCT guild) FROM subscriptions"
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				res = await conn.fetchval(query)
+		return await self._run("fetchval", "number_update_servers", query)
 
-				return res
 
-
-	async def servers_wanting_signals(self) -> list:
+	async def get_subscriptions(self) -> list:
 		"""
-		Gets the information of all the servers wanting signals.
+		Gets every subscription.
 
 		Returns:
-			a list of all the servers wanting information
+			list of each subscription's guild, channel, exchange and signal_type
 
 		"""
-		self._logger.debug("Getting data for servers that want signals")
-		query = """
-			SELECT id, name, output_channel, exchanges 
-			FROM servers WHERE output_channel IS NOT NULL
-			"""
+		self._logger.debug("Getting every subscription")
+		query = "SELECT guild, channel, exchange, signal_type FROM subscriptions"
+
+		return await self._run("fetch", "get_subscriptions", query)
+
+
+	async def listen(self, channel: str, callback) -> None:
+		"""
+		Listens for notifications on channel with a connection of its own, so
+		it isn't taken from the pool. Reconnects if the connection was lost.
+
+		Args:
+			channel: channel to listen on, ie servers_changed
+			callback: called with (connection, pid, channel, payload)
+
+		"""
+		if self._listener is None or self._listener.is_closed():
+			self._listener = await asyncpg.connect(
+				database=self._database, user=self._user,
+				password=self._password, host=self._host
+				)
+
+		await self._listener.add_listener(channel, callback)
+
+
+	async def close(self) -> None:
+		"""
+		Closes the listening connection and the pool.
+		"""
+		for name, summary in self.slowest_queries():
+			self._logger.info("Query {0}: {1}".format(name, summary))
 
-		async with self.pool.acquire() as conn:
-			async with conn.transaction():
-				res = await conn.fetch(query)
+		if self._listener is not None:
+			await self._listener.close()
+			self._listener = None
 
-				return res
+		await self.pool.close()
@@ -1,21 +1,53 @@
 
-from datetime import datetime, timedelta
+from collections import OrderedDict
+import inspect
 import asyncio
+import time
 import sys
 
 import ccxt.async as ccxt
+import numpy as np
 import tenacity
 import aiohttp
 
 import output_generator as og
+from exchange_registry import ExchangeRegistry
+from candle_store import CandleStore, OPEN, VOLUME, CLOSE
+from price_table import PriceTable
+from cmc_index import CMCIndex
+from response_cache import ResponseCache
+from request_scheduler import PRIORITY_NORMAL, PRIORITY_LOW
+from metrics import Counter, Gauge
 
 sys.path.append("helpers/indicators/")
 
-from rsi import calc_rsi
+from rsi_engine import RSIEngine, timeframe_to_ms
+from pipeline import IndicatorPipeline, CandleFrame, RSI, EMA, MACD, Bollinger, ATR
+
+
+INDICATORS = {
+	"ema": EMA,
+	"macd": MACD,
+	"bollinger": Bollinger,
+	"atr": ATR,
+}
+
+CMC_URL = "https://api.coinmarketcap.com/v1/"
+
+# errors requests are retried for
+RETRYABLE = (
+	ccxt.DDoSProtection,
+	ccxt.RequestTimeout,
+	aiohttp.ServerDisconnectedError,
+	asyncio.TimeoutError
+	)
+
+# signal types servers get if they haven't chosen any
+DEFAULT_SIGNALS = ["price", "rsi"]
 
 
 class ExchangeProcessor:
-	def __init__(self, logger=None, config=None, db=None):
+	def __init__(self, logger=None, config=None, db=None, clock=time.monotonic):
 		self._logger = logger
 
 		if config:
@@ -27,48 +59,273 @@ class ExchangeProcessor:
 			self._over_sold = config["over_sold"]
 			self._mooning = config["mooning"]
 
+			self._rsi_history = config.get("rsi_history", 500)
+			self._rsi_engine = RSIEngine(
+				self._rsi_period, live=config.get("rsi_live", False))
+
+			self._pipeline = IndicatorPipeline()
+
+			for name in config.get("indicators", ["rsi"]):
+				if name == "rsi":
+					indicator = RSI(self._rsi_engine, self._over_bought, self._over_sold)
+				else:
+					indicator = INDICATORS[name]()
+
+				self._pipeline.register(indicator)
+
+			history = max(self._rsi_history, self._pipeline.window)
+
+			self._candle_store = CandleStore(
+				config.get("candle_store_path", "candles"),
+				retention=max(config.get("candle_retention", 1000), history)
+				)
+
+		self._ticker_chunk_size = config.get("ticker_chunk_size", 0) if config else 0
+		markets_ttl = config.get("markets_ttl", 60) if config else 60
+		workers = config.get("exchange_workers", 8) if config else 8
+		cmc_index_ttl = config.get("cmc_index_ttl", 60) if config else 60
+
+		self._http_connections = config.get("http_connections", 100) if config else 100
+		self._http_timeout = config.get("http_timeout", 10) if config else 10
+		self._session = None
+
+		self._cmc_url = config.get("cmc_url", CMC_URL) if config else CMC_URL
+		self._cmc_ticker_ttl = config.get("cmc_ticker_ttl", 60) if config else 60
+		self._cmc_global_ttl = config.get("cmc_global_ttl", 300) if config else 300
+		self._cmc_bulk_limit = config.get("cmc_bulk_limit", 100) if config else 100
+		self._cmc_concurrency = config.get("cmc_concurrency", 5) if config else 5
+		self._cmc_cache = ResponseCache(
+			self._logger,
+			maxsize=config.get("cmc_cache_size", 256) if config else 256,
+			stale=config.get("cmc_cache_stale", 300) if config else 300,
+			clock=clock
+			)
+
 		self._db = db
 
 		self._exchange_market_prices = {}
 		self._significant_markets = set()
 
+		self.retries = Counter(("exception",))
+
+		# retries of exchange requests go back through the exchange's scheduler
 		self._aretry = tenacity.AsyncRetrying(
 			wait=tenacity.wait_random(0, 3),
-			retry=(
-				tenacity.retry_if_exception(ccxt.DDoSProtection) | 
-				tenacity.retry_if_exception(ccxt.RequestTimeout) |
-				tenacity.retry_if_exception(aiohttp.ServerDisconnectedError)
-				)
+			stop=tenacity.stop_after_attempt(5),
+			reraise=True,
+			retry=tenacity.retry_if_exception(self._retryable)
+			)
+
+		self._registry = ExchangeRegistry(
+			self._logger, markets_ttl=markets_ttl * 60, retry=self._aretry,
+			workers=workers, clock=clock
 			)
 
+		self._cmc_index = CMCIndex(
+			self._logger, self.get_cmc_tickers, ttl=cmc_index_ttl * 60)
 
-	def _get_exchange(self, exchange: str) -> ccxt.Exchange:
+
+	def _retryable(self, e: Exception) -> bool:
 		"""
-		Gets exchange from ccxt if ccxt accepts it, else returns none.
+		Checks if a request failing with e is to be retried, counting it if so.
+		The last attempt is counted too even though it isn't retried.
 		"""
-		if exchange in ccxt.exchanges:
-			return getattr(ccxt, exchange)()
+		if isinstance(e, RETRYABLE):
+			self.retries.inc(type(e).__name__)
+			return True
 
-		return None
+		return False
 
 
-	async def _fetch_all_tickers(self, exchange: ccxt.Exchange) -> list:
+	def register_metrics(self, metrics) -> None:
 		"""
-		Asynchronously fetches all tickers from exchange and returns them.
+		Registers the exchange request, retry and coinmarketcap cache metrics.
+
+		Args:
+			metrics: MetricsRegistry the metrics are registered in
+
+		"""
+		cache = self._cmc_cache
+
+		def ratio():
+			total = cache.hits + cache.stale_hits + cache.misses
+			return (cache.hits + cache.stale_hits) / total if total else 0.0
+
+		metrics.register("hasami_exchange_request_seconds",
+			"Seconds each request to an exchange took.", self._registry.request_latency)
+		metrics.register("hasami_exchange_request_errors_total",
+			"Requests to an exchange that failed.", self._registry.request_errors)
+		metrics.register("hasami_exchange_retries_total",
+			"Requests that failed with an error they're retried for.", self.retries)
+
+		metrics.register("hasami_cmc_cache_requests_total",
+			"Coinmarketcap lookups by whether the cache had them.",
+			Counter(("result",), func=lambda: {
+				("hit",): cache.hits,
+				("stale",): cache.stale_hits,
+				("miss",): cache.misses,
+			}))
+		metrics.register("hasami_cmc_cache_hit_ratio",
+			"Share of coinmarketcap lookups served from the cache.", Gauge(func=ratio))
+
+
+	def get_exchange(self, exchange: str) -> ccxt.Exchange:
+		"""
+		Gets exchange from the registry if ccxt accepts it, else returns none.
+		"""
+		return self._registry.get(exchange)
+
+
+	def add_exchange(self, exchange: ccxt.Exchange) -> ccxt.Exchange:
+		"""
+		Uses exchange for its exchange id instead of the one ccxt would create,
+		to be called before the exchange id is first used.
+
+		Raises:
+			ValueError: if a different exchange is already used for the id
+		"""
+		return self._registry.add(exchange)
+
+
+	@property
+	def indicators(self) -> list:
+		"""
+		Names of the indicators that are being calculated.
+		"""
+		return list(self._pipeline.indicators)
+
+
+	async def close(self) -> None:
+		"""
+		Closes the sessions of every exchange that's been used, the candle store,
+		the http session and stops refreshing the cmc index.
+		"""
+		await self._cmc_index.close()
+		await self._registry.close()
+
+		if self._session:
+			closing = self._session.close()
+
+			# close is only a coroutine from aiohttp 2 on
+			if inspect.isawaitable(closing):
+				await closing
+
+			self._session = None
+
+		if hasattr(self, "_candle_store"):
+			self._candle_store.close()
+
+
+	async def _fetch_tickers_bulk(self, exchange: ccxt.Exchange) -> list:
+		"""
+		Fetches tickers with fetchTickers, splitting the symbols into chunks
+		when the exchange limits how many symbols can be asked for per call.
+		The symbols of a chunk that fails are fetched one at a time instead.
+
+		Args:
+			exchange: exchange whose tickers are to be fetched
+
+		Returns:
+			a list of the tickers received
+
 		"""
-		await self._aretry.call(exchange.load_markets)
+		if not self._ticker_chunk_size:
+			tickers = await self._registry.request(
+				exchange, PRIORITY_NORMAL, exchange.fetch_tickers)
+			return list(tickers.values())
+
+		symbols = exchange.symbols
+		size = self._ticker_chunk_size
+
+		chunks = [symbols[i:i + size] for i in range(0, len(symbols), size)]
 
 		tasks = [
-				self._aretry.call(exchange.fetch_ticker, symbol)
-				for symbol in exchange.symbols
+				self._registry.request(
+					exchange, PRIORITY_NORMAL, exchange.fetch_tickers, chunk)
+				for chunk in chunks
 			]
 
-		# gathers tickers in parallel 
-		tickers = await asyncio.gather(*tasks, return_exceptions=True)
+		tickers = []
+		failed = []
+
+		results = await asyncio.gather(*tasks, return_exceptions=True)
+
+		for chunk, result in zip(chunks, results):
+			if isinstance(result, Exception):
+				self._logger.warning("Ticker chunk fetch failed on {0}: {1}".format(
+					exchange.id, result))
+				failed.extend(chunk)
+
+			else:
+				tickers.extend(result.values())
+
+		if failed:
+			tickers.extend(await self._fetch_tickers_each(exchange, failed))
 
 		return tickers
 
 
+	async def _fetch_tickers_each(self, exchange: ccxt.Exchange, symbols: list = None) -> list:
+		"""
+		Fetches tickers one symbol at a time, used when the exchange doesn't
+		support fetchTickers.
+
+		Args:
+			exchange: exchange whose tickers are to be fetched
+			symbols: symbols to be fetched, every symbol of the exchange if None
+
+		Returns:
+			a list of the tickers received, failed symbols are left out
+
+		"""
+		tasks = [
+				self._registry.request(
+					exchange, PRIORITY_NORMAL, exchange.fetch_ticker, symbol)
+				for symbol in (exchange.symbols if symbols is None else symbols)
+			]
+
+		# gathers tickers in parallel
+		tickers = await asyncio.gather(*tasks, return_exceptions=True)
+
+		return [t for t in tickers if not isinstance(t, Exception)]
+
+
+	async def _fetch_all_tickers(self, exchange: ccxt.Exchange) -> dict:
+		"""
+		Asynchronously fetches all tickers from exchange and returns them.
+		Uses a bulk fetchTickers call if the exchange has it and only falls back
+		to fetching each symbol if it doesn't or the bulk call fails.
+
+		Args:
+			exchange: exchange whose tickers are to be fetched
+
+		Returns:
+			a dict of symbols and their corresponding tickers
+
+		"""
+		await self._registry.load_markets(exchange)
+
+		tickers = None
+
+		if exchange.has.get("fetchTickers"):
+			try:
+				tickers = await self._fetch_tickers_bulk(exchange)
+
+			except (ccxt.NotSupported, ccxt.ExchangeError) as e:
+				self._logger.warning("Bulk ticker fetch failed on {0}: {1}".format(
+					exchange.id, e))
+
+		if tickers is None:
+			tickers = await self._fetch_tickers_each(exchange)
+
+		symbols = set(exchange.symbols)
+
+		return {
+				ticker["symbol"]: ticker for ticker in tickers
+				if ticker["symbol"] in symbols and ticker.get("last")
+			}
+
+
 	async def load_exchanges(self, exchanges: list) -> None:
 		"""
 		Asynchronously loads the markets from bittrex and binance markets.
@@ -84,19 +341,17 @@ class ExchangeProcessor:
 		self._logger.info("Loading exchanges {0}".format(exchanges))
 
 		for exchange in exchanges:
-			exchange = self._get_exchange(exchange)
+			exchange = self.get_exchange(exchange)
 
 			# ensure it hasn't been loaded yet
 			if exchange and exchange.id not in self._exchange_market_prices:
 				tickers = await self._fetch_all_tickers(exchange)
 
-				# puts the prices for each exchange in data
-				prices = {}
-				for ticker in tickers:
-					symbol = ticker["symbol"]
-					prices[symbol] = ticker["last"]
+				# puts the prices for each exchange in its table
+				table = PriceTable(len(tickers) or 64)
+				table.update({s: t["last"] for s, t in tickers.items()})
 
-					self._exchange_market_prices[exchange.id] = prices
+				self._exchange_market_prices[exchange.id] = table
 
 
 	def percent_change(self, new_price: int, old_price: int) -> float:
@@ -114,6 +369,31 @@ class ExchangeProcessor:
 		return round(((new_price - old_price) / old_price) * 100, 2)
 
 
+	def apply_prices(self, exchange_id: str, prices: dict) -> dict:
+		"""
+		Compares new prices to the stored ones to see if there has been a
+		significant change. Used by both polling and streaming.
+
+		Args:
+			exchange_id: ccxt id of the exchange the prices are from
+			prices: symbols mapped to their last price
+
+		Returns:
+			a dict of all the updates and their corresponding symbols
+
+		"""
+		# exchanges that haven't been loaded get their prices stored on first check
+		table = self._exchange_market_prices.get(exchange_id)
+
+		if table is None:
+			table = self._exchange_market_prices[exchange_id] = PriceTable(len(prices) or 64)
+
+		# new symbols aren't checked since their price hasn't changed yet
+		slots = table.update(prices)
+
+		return table.changes(slots, self._mooning, self._free_fall)
+
+
 	async def check_exchange_price_updates(self, exchange: ccxt.Exchange) -> dict:
 		"""
 		Checks exchange tickers to see if there has been a significant change.
@@ -128,207 +408,259 @@ class ExchangeProcessor:
 		"""
 		tickers = await self._fetch_all_tickers(exchange)
 
-		old_prices = self._exchange_market_prices[exchange.id]
-		price_updates = {}
+		prices = {symbol: ticker["last"] for symbol, ticker in tickers.items()}
+		updates = self.apply_prices(exchange.id, prices)
 
-		for ticker in tickers:
-			
-			symbol = ticker["symbol"]
-			
-			if symbol not in old_prices:
-				old_prices[symbol] = ticker["last"]
+		evicted = self._exchange_market_prices[exchange.id].evict(exchange.symbols)
 
-				self._exchange_market_prices[exchange.id] = old_prices
-				continue # price hasn't changed since we just got it
+		if evicted:
+			self._logger.info("Delisted on {0}: {1}".format(exchange.id, evicted))
 
-			new_price = ticker["last"]
-			old_price = old_prices[symbol]
+			if hasattr(self, "_candle_store"):
+				self._candle_store.remove(exchange.id, evicted)
 
-			change = self.percent_change(new_price, old_price)
+		return updates
 
-			if change >= self._mooning or change <= self._free_fall:
-				price_updates[symbol] = change
-				old_prices[symbol] = new_price
 
-		return price_updates
+	async def _fetch_ohlcv(self, exchange, symbol, since, limit=None) -> list:
+		"""
+		Fetches the candles of symbol from since on.
+		"""
+		return await self._registry.request(
+			exchange, PRIORITY_LOW, exchange.fetch_ohlcv, symbol,
+			self._rsi_timeframe, since, limit
+			)
 
 
-	async def _acalc_rsi(self, exchange, symbol, since) -> tuple:
+	async def _aupdate_candles(self, exchange, symbol, now) -> tuple:
 		"""
-		Astnchronously downloads the data to calculate the rsi and then calculates it.
+		Astnchronously downloads the candles missing from the local candle store.
 		This allows the whole process to be wrapped into a future to be used with
 		asyncio.gather
 
 		Args:
 			exchange: exchange from which the data is to be retrieved from
-			symbol: symbol the rsi is to be calculated of
-			since: from when the rsi is to be calculated
+			symbol: symbol whose candles are to be updated
+			now: current time in milliseconds
 
 		Returns:
-			A tuple of the symbol and corresponding rsi value.
+			A tuple of the symbol and the price of its open candle, None if no
+			candle is open.
 
 		"""
-		data = await self._aretry.call(
-			exchange.fetch_ohlcv, symbol, self._rsi_timeframe, since
-			)
+		timeframe = timeframe_to_ms(self._rsi_timeframe)
+
+		series = self._candle_store.series(
+			exchange.id, symbol, self._rsi_timeframe, timeframe)
+
+		data = await self._fetch_ohlcv(
+			exchange, symbol, series.since(now, self._rsi_history))
+		series.extend(data, now)
+
+		# backfill candles missing between the ones stored
+		for start, end in list(series.gaps):
+			limit = (end - start) // timeframe + 1
+			series.extend(await self._fetch_ohlcv(exchange, symbol, start, limit), now)
+
+		series.settle()
 
-		return (symbol, calc_rsi(data, self._rsi_period))
+		open_close = None
+		if data and data[-1][0] + timeframe > now:
+			open_close = data[-1][4]
 
+		return (symbol, open_close)
 
-	async def check_exchange_rsi_updates(self, exchange: ccxt.Exchange) -> dict:
+
+	def _update_rsi(self, exchange, open_closes: dict) -> None:
 		"""
-		Checks exchange tickers to see if there has been a significant rsi.
-		If there has been it adds it to a dict to be returned.
+		Updates the rsi of the symbols with the candles closed since they were
+		last updated. Symbols without any rsi state yet are all warmed up from
+		their stored history together in one vectorized pass.
 
 		Args:
-			exchange: exchange to be checked
-
-		Returns:
-			a dict of all the updates and their corresponding symbols
+			exchange: exchange the symbols are on
+			open_closes: symbols mapped to the price of their open candle
 
 		"""
-		if not exchange.has['fetchOHLCV']: return {}
+		timeframe = timeframe_to_ms(self._rsi_timeframe)
 
-		rsi_updates = {}
+		cold_keys = []
+		cold_closes = []
+		cold_last = []
 
-		await self._aretry.call(exchange.load_markets)
+		for symbol in open_closes:
+			key = (exchange.id, symbol, self._rsi_timeframe)
+			series = self._candle_store.series(
+				exchange.id, symbol, self._rsi_timeframe, timeframe)
 
-		since = datetime.now() - timedelta(minutes=30*500)
-		since = since.timestamp() * 1000
+			if series.last is None:
+				continue
 
-		tasks = [
-				self._acalc_rsi(exchange, symbol, since) 
-				for symbol in exchange.symbols
-			]
+			last_closed = self._rsi_engine.last_closed(key)
 
-		rsi_data = await asyncio.gather(*tasks, return_exceptions=True)
+			if last_closed is None:
+				since = series.last - (self._rsi_history - 1) * timeframe
 
-		for data in rsi_data:
-			symbol, rsi = data
-			if rsi <= self._over_sold or rsi >= self._over_bought:
-				if symbol not in self._significant_markets:
-					rsi_updates[symbol] = rsi
-					self._significant_markets.add(symbol)
+				cold_keys.append(key)
+				cold_closes.append(series.column(CLOSE, since))
+				cold_last.append(series.last)
 
-			elif rsi in self._significant_markets:
-				self._significant_markets.remove(symbol)
+			else:
+				since = last_closed + timeframe
+				self._rsi_engine.push(key, series.column(CLOSE, since), series.last)
 
-		return rsi_updates
+		self._rsi_engine.seed(cold_keys, cold_closes, cold_last)
 
-	
-	async def yield_exchange_price_updates(self, servers) -> None:
+
+	def _build_frame(self, exchange, open_closes: dict) -> CandleFrame:
 		"""
-		Checks for price updates in all of the exchanges the server wants checked.
-		Then wraps the updates into an embed for output.
+		Lines up the stored candles of the symbols into a frame the indicator
+		pipeline can process.
 
 		Args:
-			server: server that wants exchange signals
+			exchange: exchange the symbols are on
+			open_closes: symbols mapped to the price of their open candle
 
 		Returns:
-			a tuple of channel and embed
+			frame of the last candles each indicator needs
 
 		"""
-		processed_exchanges = {}
-
-		self._logger.debug("Yielding exchange rsi updates for servers {0}".format(servers))
-		for server in servers:
-
-			server_id = server["id"]
-			server_name = server["name"]
+		timeframe = timeframe_to_ms(self._rsi_timeframe)
+		window = self._pipeline.window
 
-			channel = server["output_channel"]
-			exchanges = server["exchanges"]
+		keys = []
+		rows = []
+		opens = []
 
-			if exchanges == None: continue
+		for symbol, open_close in open_closes.items():
+			series = self._candle_store.series(
+				exchange.id, symbol, self._rsi_timeframe, timeframe)
 
-			outputs = []
+			if series.last is None:
+				continue
 
-			self._logger.info("Checking exchanges {0} price updates for server {1} ({2})".format(
-				exchanges, server_id, server_name))
+			since = series.last - (window - 1) * timeframe
 
-			for exchange in exchanges:
-				# if exchange has already been procesed, use processed data
-				if exchange in processed_exchanges:
-					outputs.append(processed_exchanges[exchange])
+			row = [
+					np.concatenate([np.asarray(v) for v in series.column(field, since)])
+					for field in range(OPEN, VOLUME + 1)
+				]
 
-				# else generate it and store it as processed
-				elif self._get_exchange(exchange):
-					ccxt_exchange = self._get_exchange(exchange)
-					if ccxt_exchange:
-						updates = await self.check_exchange_price_updates(
-							ccxt_exchange)
+			keys.append((exchange.id, symbol, self._rsi_timeframe))
+			rows.append(np.column_stack(row))
+			opens.append(open_close)
 
-						self._logger.debug("Price Updates: {0}".format(updates))
-						if updates:
-							embed = og.create_price_update_embed(updates)
+		return CandleFrame(keys, rows, opens)
 
-							processed_exchanges[exchange] = embed
-							outputs.append(embed)
-						
-			self._logger.debug(outputs)
 
-			# prob can re write this and keep it inside exchange filtering loop
-			for embed in outputs:
-				yield [channel, embed]
-
-
-	async def yield_exchange_rsi_updates(self, servers) -> None:
+	async def check_exchange_indicator_updates(self, exchange: ccxt.Exchange) -> dict:
 		"""
-		Checks for significant rsi values in all of the exchanges the server wants checked.
-		Then wraps the updates into an embed for output.
+		Checks exchange candles to see if there have been any significant indicator
+		values. Every indicator is calculated from the same candles, which are only
+		fetched once for all of them.
 
 		Args:
-			server: server that wants exchange signals
+			exchange: exchange to be checked
 
 		Returns:
-			a tuple of channel and embed
+			a dict of indicator names and their updates and corresponding symbols
 
 		"""
-		processed_exchanges = {}
+		if not exchange.has['fetchOHLCV']: return {}
+
+		await self._registry.load_markets(exchange)
+
+		now = exchange.milliseconds()
+
+		# only fetch markets that had a candle close since they were last updated
+		tasks = [
+				self._aupdate_candles(exchange, symbol, now)
+				for symbol in exchange.symbols
+				if self._rsi_engine.due((exchange.id, symbol, self._rsi_timeframe), now)
+			]
+
+		open_closes = {}
+		failed = []
+
+		for data in await asyncio.gather(*tasks, return_exceptions=True):
+			if isinstance(data, Exception):
+				failed.append(data)
+				continue
+
+			symbol, open_close = data
+			open_closes[symbol] = open_close
+
+		if failed:
+			self._logger.warning("Couldn't update candles of {0} markets on {1}: {2}".format(
+				len(failed), exchange.id, failed[0]))
 
-		self._logger.debug("Yielding exchange rsi updates for servers {0}".format(servers))
+		self._update_rsi(exchange, open_closes)
 
-		for server in servers:
+		frame = self._build_frame(exchange, open_closes)
+		signals = self._pipeline.run(frame)
 
-			server_id = server["id"]
-			server_name = server["name"]
+		indicator_updates = {}
 
-			channel = server["output_channel"]
-			exchanges = server["exchanges"]
+		for name, flagged in signals.items():
+			updates = {}
 
-			if exchanges == None: continue
+			for symbol in frame.symbols:
+				market = (name, exchange.id, symbol)
 
-			outputs = []
+				if symbol in flagged:
+					if market not in self._significant_markets:
+						updates[symbol] = flagged[symbol]
+						self._significant_markets.add(market)
 
-			self._logger.info("Checking exchanges {0} rsi updates for server {1} ({2})".format(
-				exchanges, server_id, server_name))
+				elif market in self._significant_markets:
+					self._significant_markets.remove(market)
 
-			for exchange in exchanges:
-				# if exchange has already been procesed, use processed data
-				if exchange in processed_exchanges:
-					outputs.append(processed_exchanges[exchange])
+			if updates:
+				indicator_updates[name] = updates
 
-				# else generate it and store it as processed
-				elif self._get_exchange(exchange):
-					ccxt_exchange = self._get_exchange(exchange)
-					if ccxt_exchange:
+		return indicator_updates
 
-						updates = await self.check_exchange_rsi_updates(ccxt_exchange)
+	
+	def create_indicator_embeds(self, updates: dict) -> dict:
+		"""
+		Wraps indicator updates into embeds for each indicator.
+
+		Args:
+			updates: indicator names mapped to their updates and symbols
+
+		Returns:
+			a dict of indicator names and their embeds, split to fit discord's
+			limits
 
-						self._logger.debug("RSI Updates: {0}".format(updates))
+		"""
+		embeds = {}
+
+		for name, data in updates.items():
+			indicator = self._pipeline.indicators[name]
+			lines = [indicator.describe(s, v) for s, v in data.items()]
+
+			embeds[name] = og.create_indicator_update_embeds(indicator.title, lines)
 
-						if updates:
-							embed = og.create_rsi_update_embed(updates)
+		return embeds
 
-							processed_exchanges[exchange] = embed
-							outputs.append(embed)
-						
-			self._logger.debug(outputs)
 
-			# prob can re write this and keep it inside exchange filtering loop
-			for embed in outputs:
-				yield [channel, embed]
+	def _http(self) -> aiohttp.ClientSession:
+		"""
+		Gets the http session shared by every request that doesn't go through
+		ccxt, creating it the first time. Its connections are pooled and kept
+		alive so requests to the same host skip the dns lookup, tcp and tls
+		setup.
+		"""
+		if self._session is None or self._session.closed:
+			connector = aiohttp.TCPConnector(
+				limit=self._http_connections,
+				use_dns_cache=True,
+				keepalive_timeout=60
+				)
 
+			self._session = aiohttp.ClientSession(connector=connector)
+
+		return self._session
 
 
 	async def _fetch_data(self, url: str) -> dict:
@@ -337,17 +669,18 @@ class ExchangeProcessor:
 
 		Args:
 			url: The url of the server to get data from.
-			depth: The current try at getting data
 
 		Returns:
 			A json dict from the server specified by url if sucessful, else empty dict.
 
 		"""
 
-		async with aiohttp.ClientSession() as sess:
-			async with sess.get(url) as resp:
+		async def get():
+			async with self._http().get(url) as resp:
 				return await resp.json()
-				
+
+		return await asyncio.wait_for(get(), self._http_timeout)
+
 
 	async def cmc_market_query(self, market: str) -> list:
 		"""
@@ -361,10 +694,73 @@ class ExchangeProcessor:
 
 		"""
 
-		url = "https://api.coinmarketcap.com/v1/ticker/{}/".format(market)
+		url = "{0}ticker/{1}/".format(self._cmc_url, market)
 
 		self._logger.debug("Getting cmc market tickers")
-		return await self._aretry.call(self._fetch_data, url)
+		return await self._cmc_cache.get(("ticker", market), self._cmc_ticker_ttl,
+			self._aretry.call, self._fetch_data, url)
+
+
+	async def cmc_top_tickers(self) -> list:
+		"""
+		Gets the tickers of the highest ranked coins in one request.
+
+		Returns:
+			tickers of the top cmc_bulk_limit coins
+
+		"""
+		url = "{0}ticker/?limit={1}".format(
+			self._cmc_url, self._cmc_bulk_limit)
+
+		self._logger.debug("Getting top cmc tickers")
+		return await self._cmc_cache.get(("ticker", "top", self._cmc_bulk_limit),
+			self._cmc_ticker_ttl, self._aretry.call, self._fetch_data, url)
+
+
+	async def cmc_market_queries(self, markets: list) -> dict:
+		"""
+		Gets current market information of several markets at once. Markets in
+		the top tickers are served from one bulk request, the rest are queried
+		concurrently, at most cmc_concurrency at a time.
+
+		Args:
+			markets: cmc ids of the markets
+
+		Returns:
+			dict of cmc ids and their market information, markets that couldn't
+			be queried are left out
+
+		"""
+		wanted = list(OrderedDict.fromkeys(markets))
+		found = {}
+
+		if len(wanted) > 1:
+			try:
+				found = {
+						t["id"]: t for t in await self.cmc_top_tickers()
+						if t["id"] in wanted
+					}
+
+			except Exception as e:
+				self._logger.warning("Couldn't get top cmc tickers: {0}".format(e))
+
+		semaphore = asyncio.Semaphore(self._cmc_concurrency)
+
+		async def query(market):
+			async with semaphore:
+				return (await self.cmc_market_query(market))[0]
+
+		missing = [m for m in wanted if m not in found]
+		results = await asyncio.gather(*[query(m) for m in missing],
+			return_exceptions=True)
+
+		for market, result in zip(missing, results):
+			if isinstance(result, Exception):
+				self._logger.warning("Couldn't query {0}: {1}".format(market, result))
+			else:
+				found[market] = result
+
+		return found
 
 
 	async def get_crypto_mcap(self) -> dict:
@@ -375,11 +771,12 @@ class ExchangeProcessor:
 			Current market information
 
 		"""
-		url = "https://api.coinmarketcap.com/v1/global/"
+		url = self._cmc_url + "global/"
 
 
 		self._logger.debug("Getting crypto marketcap ticker")
-		return await self._aretry.call(self._fetch_data, url)
+		return await self._cmc_cache.get(("global",), self._cmc_global_ttl,
+			self._aretry.call, self._fetch_data, url)
 
 
 	async def get_cmc_tickers(self) -> list:
@@ -390,7 +787,7 @@ class ExchangeProcessor:
 			a list of all the tickers
 
 		"""
-		url = "https://api.coinmarketcap.com/v1/ticker/?limit=0"
+		url = self._cmc_url + "ticker/?limit=0"
 
 		self._logger.debug("Getting cmc tickers")
 
@@ -399,7 +796,8 @@ class ExchangeProcessor:
 
 	async def find_cmc_ticker(self, ticker) -> str:
 		"""
-		Finds if ticker passed in is found in cmc's tickers
+		Finds if ticker passed in is found in cmc's tickers. Only waits on the
+		network the first time, after that the in memory index is used.
 
 		Args:
 			ticker: the ticker to be checked against cmc's tickers
@@ -408,25 +806,8 @@ class ExchangeProcessor:
 			the current ticker for cmc queries
 
 		"""
-		tickers = await self.get_cmc_tickers()
-
-		ticker = ticker.lower()
+		await self._cmc_index.ready()
 
 		self._logger.debug("Finding cmc ticker for {0}".format(ticker))
 
-		for t in tickers:
-			if t["symbol"].lower() == ticker or \
-				t["id"].lower() == ticker or \
-				t["name"] == ticker:
-
-				return t["id"]
-
-		for t in tickers:
-			if t["name"].lower().startswith(ticker):
-				return t["id"]
-
-		for t in tickers:
-			if t["name"].lower().find(ticker) > 0:
-				return t["id"]
-
-		return None
+		return self._cmc_index.find(ticker)
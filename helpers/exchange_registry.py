@@ -0,0 +1,251 @@
+import asyncio
+import time
+
+import ccxt.async as ccxt
+
+from request_scheduler import RequestScheduler, PRIORITY_HIGH
+from metrics import HistogramVec, Counter
+
+
+class ExchangeRegistry:
+	"""
+	Keeps one long lived ccxt exchange per exchange id so that exchange objects,
+	their http sessions and market metadata are reused between ticks instead of
+	being rebuilt on every check.
+
+	Market metadata is cached for markets_ttl seconds and refreshed in the
+	background so load_markets never has to hit the exchange on the hot path.
+
+	Each exchange also gets its own RequestScheduler which every request to the
+	exchange goes through.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_markets_ttl: seconds market metadata is considered fresh for.
+		_retry: tenacity retrying object used to retry requests.
+		_workers: max requests in flight per exchange.
+		_exchanges: exchange id mapped to its ccxt exchange.
+		_schedulers: exchange id mapped to the scheduler for its requests.
+		_loaded_at: exchange id mapped to when its markets were last loaded.
+		_locks: exchange id mapped to a lock so markets are only loaded once at a time.
+		_refresher: background task refreshing market metadata.
+		request_latency: seconds each request to an exchange took, by exchange
+			and method.
+		request_errors: requests to an exchange that failed, by exchange, method
+			and error.
+		_clock: function giving the current time in seconds.
+	"""
+
+	def __init__(self, logger, markets_ttl: float = 3600, retry=None, workers: int = 8,
+			clock=time.monotonic):
+
+		self._logger = logger
+		self._markets_ttl = markets_ttl
+		self._retry = retry
+		self._workers = workers
+		self._clock = clock
+
+		self._exchanges = {}
+		self._schedulers = {}
+		self._loaded_at = {}
+		self._locks = {}
+
+		self._refresher = None
+
+		self.request_latency = HistogramVec(("exchange", "method"))
+		self.request_errors = Counter(("exchange", "method", "error"))
+
+
+	def get(self, exchange_id: str) -> ccxt.Exchange:
+		"""
+		Gets the exchange for exchange_id, creating it the first time it's asked
+		for.
+
+		Args:
+			exchange_id: ccxt id of the exchange
+
+		Returns:
+			the exchange if ccxt accepts it, else None
+
+		"""
+		if exchange_id in self._exchanges:
+			return self._exchanges[exchange_id]
+
+		if exchange_id not in ccxt.exchanges:
+			return None
+
+		return self.add(getattr(ccxt, exchange_id)())
+
+
+	def add(self, exchange: ccxt.Exchange) -> ccxt.Exchange:
+		"""
+		Registers an exchange that's already been created, ie one configured
+		differently from ccxt's defaults or a stand in for one. It has to be
+		registered before anything asks for its id, an exchange that's already
+		registered isn't replaced since its requests and session are in use.
+
+		Args:
+			exchange: exchange to be registered
+
+		Returns:
+			the exchange
+
+		Raises:
+			ValueError: if a different exchange is registered under the same id
+
+		"""
+		registered = self._exchanges.get(exchange.id)
+
+		if registered is exchange:
+			return exchange
+
+		if registered is not None:
+			raise ValueError("Exchange {0} is already registered".format(exchange.id))
+
+		self._exchanges[exchange.id] = exchange
+		self._locks[exchange.id] = asyncio.Lock()
+
+		self._schedulers[exchange.id] = RequestScheduler(
+			self._logger, exchange.rateLimit, workers=self._workers,
+			throttle_exceptions=(ccxt.DDoSProtection,), clock=self._clock
+			)
+
+		if self._refresher is None:
+			self._refresher = asyncio.ensure_future(self._refresh_markets())
+
+		return exchange
+
+
+	def scheduler(self, exchange: ccxt.Exchange) -> RequestScheduler:
+		"""
+		Gets the scheduler requests to exchange are to go through.
+		"""
+		return self._schedulers[exchange.id]
+
+
+	async def request(self, exchange: ccxt.Exchange, priority: int, func, *args):
+		"""
+		Makes a request to the exchange through its scheduler, retrying it if
+		the registry was given a retrying object.
+
+		Args:
+			exchange: exchange the request is made to
+			priority: priority of the request, lower runs first
+			func: exchange method making the request
+			*args: arguments to call func with
+
+		Returns:
+			what func returns
+
+		"""
+		submit = self._schedulers[exchange.id].submit
+		timed = self._timed(exchange, func)
+
+		if self._retry:
+			return await self._retry.call(submit, priority, timed, *args)
+
+		return await submit(priority, timed, *args)
+
+
+	def _timed(self, exchange: ccxt.Exchange, func):
+		"""
+		Wraps func so every call of it is timed and its errors are counted. The
+		scheduler only calls it once the request's been given a token, so the
+		time spent waiting in the queue isn't counted.
+		"""
+		method = getattr(func, "__name__", str(func))
+
+		async def timed(*args):
+			start = self._clock()
+
+			try:
+				return await func(*args)
+
+			except Exception as e:
+				self.request_errors.inc(exchange.id, method, type(e).__name__)
+				raise
+
+			finally:
+				self.request_latency.observe(self._clock() - start, exchange.id, method)
+
+		return timed
+
+
+	def _markets_fresh(self, exchange: ccxt.Exchange) -> bool:
+		"""
+		Checks if the exchange's markets were loaded within the ttl.
+		"""
+		loaded_at = self._loaded_at.get(exchange.id)
+
+		if loaded_at is None or not exchange.markets:
+			return False
+
+		return self._clock() - loaded_at < self._markets_ttl
+
+
+	async def load_markets(self, exchange: ccxt.Exchange, reload: bool = False) -> dict:
+		"""
+		Loads the exchange's markets if the cached ones have expired.
+
+		Args:
+			exchange: exchange whose markets are to be loaded
+			reload: whether to reload even if the cached markets are fresh
+
+		Returns:
+			the exchange's markets
+
+		"""
+		if not reload and self._markets_fresh(exchange):
+			return exchange.markets
+
+		async with self._locks[exchange.id]:
+			# another call may have loaded them while we waited
+			if not reload and self._markets_fresh(exchange):
+				return exchange.markets
+
+			markets = await self.request(
+				exchange, PRIORITY_HIGH, exchange.load_markets, True)
+
+			self._loaded_at[exchange.id] = self._clock()
+
+		return markets
+
+
+	async def _refresh_markets(self) -> None:
+		"""
+		Reloads the markets of every exchange once per ttl in the background.
+		"""
+		while True:
+			await asyncio.sleep(self._markets_ttl)
+
+			for exchange in list(self._exchanges.values()):
+				try:
+					await self.load_markets(exchange, reload=True)
+
+				except Exception as e:
+					self._logger.warning("Couldn't refresh {0} markets: {1}".format(
+						exchange.id, e))
+
+
+	async def close(self) -> None:
+		"""
+		Stops refreshing markets and closes the session of every exchange.
+		"""
+		if self._refresher:
+			self._refresher.cancel()
+			self._refresher = None
+
+		for scheduler in self._schedulers.values():
+			await scheduler.close()
+
+		for exchange in self._exchanges.values():
+			try:
+				await exchange.close()
+
+			except Exception as e:
+				self._logger.warning("Couldn't close {0}: {1}".format(exchange.id, e))
+
+		self._exchanges.clear()
+		self._schedulers.clear()
+		self._loaded_at.clear()
+		self._locks.clear()
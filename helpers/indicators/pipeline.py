@@ -0,0 +1,443 @@
+import abc
+
+import numpy as np
+
+
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+
+class CandleFrame:
+	"""
+	Candles of many markets lined up in right aligned markets x candles
+	matrices, so every indicator can be calculated for all of them at once.
+
+	Attributes:
+		keys: (exchange, symbol, timeframe) of each market
+		symbols: symbol of each market
+		values: 3D array of the candles, field x markets x candles
+		lengths: how many candles each market has
+		open_close: price of each market's open candle, nan if none is open
+	"""
+
+	def __init__(self, keys: list, rows: list, open_close: list):
+		"""
+		Args:
+			keys: (exchange, symbol, timeframe) of each market
+			rows: 2D array of each market's candles, candles x (o, h, l, c, v)
+			open_close: price of each market's open candle or None
+		"""
+		self.keys = keys
+		self.symbols = [key[1] for key in keys]
+		self.lengths = np.array([len(row) for row in rows], dtype=int)
+
+		cols = max(self.lengths.max(), 1) if len(rows) else 1
+		self.values = np.zeros((5, len(rows), cols))
+
+		for i, row in enumerate(rows):
+			if len(row):
+				self.values[:, i, cols - len(row):] = np.asarray(row).T
+
+		self.open_close = np.array(
+			[np.nan if v is None else v for v in open_close], dtype=np.float64)
+
+
+	@property
+	def close(self) -> np.ndarray:
+		return self.values[CLOSE]
+
+
+	@property
+	def high(self) -> np.ndarray:
+		return self.values[HIGH]
+
+
+	@property
+	def low(self) -> np.ndarray:
+		return self.values[LOW]
+
+
+class IndicatorContext:
+	"""
+	Frame being processed plus whatever has been calculated from it so far.
+	Intermediates such as emas, price changes and true ranges are calculated the
+	first time an indicator asks for them and shared with every indicator after.
+
+	Attributes:
+		frame: candles being processed
+		_cache: name of the intermediate mapped to its value
+	"""
+
+	def __init__(self, frame: CandleFrame):
+		self.frame = frame
+		self._cache = {}
+
+
+	def _memo(self, key, func):
+		if key not in self._cache:
+			self._cache[key] = func()
+
+		return self._cache[key]
+
+
+	def valid(self) -> np.ndarray:
+		"""
+		Mask of which cells of the frame hold a candle.
+		"""
+		def calc():
+			cols = self.frame.values.shape[2]
+			return np.arange(cols)[None, :] >= (cols - self.frame.lengths)[:, None]
+
+		return self._memo("valid", calc)
+
+
+	def changes(self) -> np.ndarray:
+		"""
+		Change in closing price from the previous candle, 0 for the first.
+		"""
+		def calc():
+			changes = np.zeros_like(self.frame.close)
+			changes[:, 1:] = np.diff(self.frame.close, axis=1)
+
+			return np.where(self.valid() & np.roll(self.valid(), 1, axis=1), changes, 0)
+
+		return self._memo("changes", calc)
+
+
+	def ema(self, span: int) -> np.ndarray:
+		"""
+		Exponential moving average of the closing prices.
+		"""
+		return self._memo(("ema", span),
+			lambda: ema_matrix(self.frame.close, self.valid(), span))
+
+
+	def true_range(self) -> np.ndarray:
+		"""
+		True range of each candle, the high - low extended to the previous close.
+		"""
+		def calc():
+			frame = self.frame
+			previous = frame.close - self.changes()
+
+			return np.maximum(frame.high, previous) - np.minimum(frame.low, previous)
+
+		return self._memo("true_range", calc)
+
+
+def ema_matrix(values: np.ndarray, valid: np.ndarray, span: int) -> np.ndarray:
+	"""
+	Calculates the exponential moving average of every row, starting each row
+	at its first valid value.
+
+	Args:
+		values: 2D array, markets x candles
+		valid: mask of which cells hold a value
+		span: span of the average
+
+	Returns:
+		2D array of the averages, invalid cells hold 0
+
+	"""
+	alpha = 2 / (span + 1)
+	ema = np.zeros_like(values)
+
+	current = np.zeros(values.shape[0])
+	started = np.zeros(values.shape[0], dtype=bool)
+
+	for col in range(values.shape[1]):
+		value = values[:, col]
+		current = np.where(started, alpha * value + (1 - alpha) * current, value)
+		current = np.where(valid[:, col], current, 0)
+		started = started | valid[:, col]
+
+		ema[:, col] = current
+
+	return ema
+
+
+def wilder_matrix(values: np.ndarray, valid: np.ndarray, period: int) -> np.ndarray:
+	"""
+	Calculates the Wilder smoothed average of the last value of every row,
+	seeded with the mean of its first period values.
+
+	Args:
+		values: 2D array, markets x candles
+		valid: mask of which cells hold a value
+		period: period of the average
+
+	Returns:
+		array of each row's average, nan for rows shorter than period
+
+	"""
+	count = np.zeros(values.shape[0], dtype=int)
+	total = np.zeros(values.shape[0])
+	average = np.full(values.shape[0], np.nan)
+
+	for col in range(values.shape[1]):
+		value = values[:, col]
+		mask = valid[:, col]
+
+		count = count + mask
+		total = np.where(mask & (count <= period), total + value, total)
+
+		average = np.where(mask & (count == period), total / period, average)
+		average = np.where(mask & (count > period),
+			(average * (period - 1) + value) / period, average)
+
+	return average
+
+
+class Indicator(abc.ABC):
+	"""
+	Indicator calculated for every market of a frame at once.
+
+	Attributes:
+		name: name servers use to ask for the indicator's signals
+		title: title of the indicator's updates
+		window: how many candles the indicator needs
+	"""
+	name = None
+	title = None
+	window = 1
+
+	@abc.abstractmethod
+	def signals(self, ctx: IndicatorContext) -> dict:
+		"""
+		Finds the markets whose indicator values are significant.
+
+		Args:
+			ctx: context of the frame being processed
+
+		Returns:
+			dict of symbols and their significant values
+
+		"""
+
+
+	def describe(self, symbol: str, value) -> str:
+		"""
+		Formats a significant value into a line of the indicator's update.
+		"""
+		return "[{0}] {1} [{2}]".format(symbol, self.title, value)
+
+
+def _flagged(frame: CandleFrame, mask: np.ndarray, values) -> dict:
+	"""
+	Maps the symbols of the frame flagged by mask to their values.
+	"""
+	values = np.asarray(values).tolist()
+
+	return {frame.symbols[i]: values[i] for i in np.flatnonzero(mask)}
+
+
+class RSI(Indicator):
+	"""
+	RSI taken from the incremental RSI engine, flagged when it's over bought or
+	over sold.
+	"""
+	name = "rsi"
+	title = "RSI"
+
+	def __init__(self, engine, over_bought: float, over_sold: float):
+		self._engine = engine
+		self._over_bought = over_bought
+		self._over_sold = over_sold
+
+
+	def signals(self, ctx: IndicatorContext) -> dict:
+		frame = ctx.frame
+
+		rsi = [
+				self._engine.rsi(key, None if np.isnan(open_close) else open_close)
+				for key, open_close in zip(frame.keys, frame.open_close)
+			]
+
+		mask = np.array([r <= self._over_sold or r >= self._over_bought for r in rsi],
+			dtype=bool)
+
+		return _flagged(frame, mask, rsi)
+
+
+class EMA(Indicator):
+	"""
+	Exponential moving average of the closing price, flagged when the price
+	crosses it.
+	"""
+	name = "ema"
+	title = "EMA"
+
+	def __init__(self, span: int = 50):
+		self._span = span
+		self.window = span * 3
+		self.title = "EMA{0}".format(span)
+
+
+	def signals(self, ctx: IndicatorContext) -> dict:
+		close = ctx.frame.close
+		if close.shape[1] < 2:
+			return {}
+
+		ema = ctx.ema(self._span)
+
+		above = close > ema
+		crossed = (above[:, -1] != above[:, -2]) & (ctx.frame.lengths > self._span)
+
+		direction = np.where(above[:, -1], "crossed above", "crossed below")
+
+		return _flagged(ctx.frame, crossed, direction)
+
+
+	def describe(self, symbol: str, value) -> str:
+		return "[{0}] {1} {2}".format(symbol, value, self.title)
+
+
+class MACD(Indicator):
+	"""
+	Moving average convergence divergence, flagged when the macd line crosses
+	its signal line. Shares its emas with the EMA indicator.
+	"""
+	name = "macd"
+	title = "MACD"
+
+	def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+		self._fast = fast
+		self._slow = slow
+		self._signal = signal
+		self.window = slow * 3 + signal
+
+
+	def signals(self, ctx: IndicatorContext) -> dict:
+		if ctx.frame.close.shape[1] < 2:
+			return {}
+
+		macd = ctx.ema(self._fast) - ctx.ema(self._slow)
+		signal = ema_matrix(macd, ctx.valid(), self._signal)
+
+		histogram = macd - signal
+		bullish = histogram > 0
+
+		crossed = (bullish[:, -1] != bullish[:, -2]) & \
+			(ctx.frame.lengths > self._slow + self._signal)
+
+		direction = np.where(bullish[:, -1], "bullish", "bearish")
+
+		return _flagged(ctx.frame, crossed, direction)
+
+
+	def describe(self, symbol: str, value) -> str:
+		return "[{0}] MACD {1} cross".format(symbol, value)
+
+
+class Bollinger(Indicator):
+	"""
+	Bollinger bands around the closing price, flagged when the price closes
+	outside of them.
+	"""
+	name = "bollinger"
+	title = "Bollinger"
+
+	def __init__(self, window: int = 20, deviations: float = 2):
+		self._period = window
+		self._deviations = deviations
+		self.window = window
+
+
+	def signals(self, ctx: IndicatorContext) -> dict:
+		recent = ctx.frame.close[:, -self._period:]
+
+		mean = recent.mean(axis=1)
+		width = recent.std(axis=1) * self._deviations
+
+		close = recent[:, -1]
+		enough = ctx.frame.lengths >= self._period
+
+		upper = enough & (close > mean + width)
+		lower = enough & (close < mean - width)
+
+		side = np.where(upper, "above upper band", "below lower band")
+
+		return _flagged(ctx.frame, upper | lower, side)
+
+
+	def describe(self, symbol: str, value) -> str:
+		return "[{0}] closed {1}".format(symbol, value)
+
+
+class ATR(Indicator):
+	"""
+	Average true range, flagged when the last candle's range is a multiple of
+	the average.
+	"""
+	name = "atr"
+	title = "ATR"
+
+	def __init__(self, period: int = 14, multiple: float = 3):
+		self._period = period
+		self._multiple = multiple
+		self.window = period * 3
+
+
+	def signals(self, ctx: IndicatorContext) -> dict:
+		true_range = ctx.true_range()
+
+		# average before the last candle so the spike doesn't raise its own bar
+		atr = wilder_matrix(true_range[:, :-1], ctx.valid()[:, :-1], self._period)
+		last = true_range[:, -1]
+
+		with np.errstate(invalid="ignore", divide="ignore"):
+			spike = ~np.isnan(atr) & (atr > 0) & (last >= atr * self._multiple)
+			ratio = np.round(last / atr, 1)
+
+		return _flagged(ctx.frame, spike, ratio)
+
+
+	def describe(self, symbol: str, value) -> str:
+		return "[{0}] range {1}x ATR".format(symbol, value)
+
+
+class IndicatorPipeline:
+	"""
+	Indicators registered against one shared candle frame. Each frame is built
+	from one candle fetch per market and every indicator is calculated from it in
+	one pass, sharing intermediates between them.
+
+	Attributes:
+		indicators: indicator name mapped to the registered indicator
+	"""
+
+	def __init__(self):
+		self.indicators = {}
+
+
+	def register(self, indicator: Indicator) -> None:
+		"""
+		Adds an indicator to the pipeline.
+		"""
+		self.indicators[indicator.name] = indicator
+
+
+	@property
+	def window(self) -> int:
+		"""
+		How many candles the frame needs for every indicator.
+		"""
+		return max([i.window for i in self.indicators.values()] + [1])
+
+
+	def run(self, frame: CandleFrame) -> dict:
+		"""
+		Calculates every indicator for the frame.
+
+		Args:
+			frame: candles of the markets to be checked
+
+		Returns:
+			dict of indicator names and their significant symbols and values
+
+		"""
+		ctx = IndicatorContext(frame)
+
+		return {
+				name: indicator.signals(ctx)
+				for name, indicator in self.indicators.items()
+			}
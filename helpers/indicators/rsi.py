@@ -1,3 +1,5 @@
+import numpy as np
+
 
 def calc_rsi(data: list, period: int) -> int:
 	"""
@@ -58,6 +60,21 @@ def calc_rsi(data: list, period: int) -> int:
 		avg_gain = (avg_gain * (period - 1) + gain) / period
 		avg_loss = (avg_loss * (period - 1) + loss) / period
 
+	return rsi_from_averages(avg_gain, avg_loss)
+
+
+def rsi_from_averages(avg_gain: float, avg_loss: float) -> int:
+	"""
+	Calculates the RSI from the average gains and losses.
+
+	Args:
+		avg_gain: smoothed average gain
+		avg_loss: smoothed average loss
+
+	Returns:
+		The RSI of the averages given.
+
+	"""
 	if avg_gain == 0:
 		return 0
 	elif avg_loss == 0:
@@ -67,3 +84,115 @@ def calc_rsi(data: list, period: int) -> int:
 	RSI = 100 - ( 100 / (1 + RS))
 
 	return int(RSI)
+
+
+def wilder_averages_batch(closes: np.ndarray, lengths: np.ndarray, period: int) -> tuple:
+	"""
+	Calculates the Wilder smoothed average gains and losses of every row of
+	closes in one pass, the same way calc_rsi does for a single market.
+
+	Rows can have different lengths, each row's prices are right aligned so
+	its last price is in the last column and anything before its length is
+	masked out.
+
+	Args:
+		closes: 2D array of closing prices, markets x candles
+		lengths: how many prices each row has
+		period: period used to calculate rsi
+
+	Returns:
+		A tuple of arrays of the sums of the seed gains and losses and the
+		average gains and losses of each row.
+
+	"""
+	closes = np.asarray(closes, dtype=np.float64)
+	rows, cols = closes.shape
+	lengths = np.asarray(lengths)
+
+	start = cols - lengths
+
+	changes = np.diff(closes, axis=1)
+
+	# position of each change in its row, the same i calc_rsi uses
+	i = np.arange(1, cols) - start[:, None]
+
+	# the seed sums are added left to right like calc_rsi's sum, zeros added
+	# for the changes outside the seed don't change them
+	seed = (i >= 1) & (i < period)
+	sum_gain = np.cumsum(np.where(seed & (changes > 0), changes, 0.0), axis=1)
+	sum_loss = np.cumsum(np.where(seed & (changes < 0), -changes, 0.0), axis=1)
+
+	sum_gain = sum_gain[:, -1] if cols > 1 else np.zeros(rows)
+	sum_loss = sum_loss[:, -1] if cols > 1 else np.zeros(rows)
+
+	# rows shorter than the period never get past the seed
+	averages = np.stack([sum_gain, sum_loss]) / period
+
+	# rows sorted by where they start so the rows being smoothed at any column
+	# are always the first ones, letting each step update them in place
+	order = np.argsort(start, kind="stable")
+	begins = np.sort(start) + period
+
+	smoothed = averages[:, order]
+	steps = np.stack([
+			np.where(changes > 0, changes, 0.0),
+			np.where(changes < 0, -changes, 0.0)
+		])[:, order].transpose(2, 0, 1).copy()
+
+	first = int(begins[0]) if rows else cols
+
+	for col in range(max(first, 1), cols):
+		active = smoothed[:, :np.searchsorted(begins, col, side="right")]
+
+		active *= period - 1
+		active += steps[col - 1, :, :active.shape[1]]
+		active /= period
+
+	averages[:, order] = smoothed
+	avg_gain, avg_loss = averages
+
+	return sum_gain, sum_loss, avg_gain, avg_loss
+
+
+def rsi_from_averages_batch(avg_gain: np.ndarray, avg_loss: np.ndarray,
+		lengths: np.ndarray) -> np.ndarray:
+	"""
+	Calculates the RSI of every row from its average gains and losses with the
+	same edge cases as rsi_from_averages. Rows with no prices get 50.
+
+	Args:
+		avg_gain: smoothed average gains
+		avg_loss: smoothed average losses
+		lengths: how many prices each row had
+
+	Returns:
+		array of the RSI of each row
+
+	"""
+	with np.errstate(divide="ignore", invalid="ignore"):
+		RSI = 100 - (100 / (1 + avg_gain / avg_loss))
+
+	RSI = np.where(avg_loss == 0, 100, np.trunc(RSI))
+	RSI = np.where(avg_gain == 0, 0, RSI)
+	RSI = np.where(np.asarray(lengths) == 0, 50, RSI)
+
+	return RSI.astype(int)
+
+
+def calc_rsi_batch(closes: np.ndarray, lengths: np.ndarray, period: int) -> np.ndarray:
+	"""
+	Calculates the RSI of every row of closes in one vectorized pass, giving the
+	same values calc_rsi gives for each market on its own.
+
+	Args:
+		closes: 2D array of closing prices, markets x candles, right aligned
+		lengths: how many prices each row has
+		period: period used to calculate rsi
+
+	Returns:
+		array of the RSI of each row
+
+	"""
+	_, _, avg_gain, avg_loss = wilder_averages_batch(closes, lengths, period)
+
+	return rsi_from_averages_batch(avg_gain, avg_loss, lengths)
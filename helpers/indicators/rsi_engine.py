@@ -0,0 +1,262 @@
+import copy
+
+import numpy as np
+
+from rsi import rsi_from_averages, wilder_averages_batch
+
+
+TIMEFRAME_SECONDS = {
+	"m": 60,
+	"h": 60 * 60,
+	"d": 24 * 60 * 60,
+	"w": 7 * 24 * 60 * 60,
+	"M": 30 * 24 * 60 * 60,
+}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+	"""
+	Converts a ccxt timeframe into milliseconds, ie 30m -> 1800000
+
+	Args:
+		timeframe: timeframe to convert
+
+	Returns:
+		length of the timeframe in milliseconds
+
+	"""
+	amount, unit = timeframe[:-1], timeframe[-1]
+
+	return int(amount) * TIMEFRAME_SECONDS[unit] * 1000
+
+
+class WilderState:
+	"""
+	Wilder smoothed average gain and loss of a market, updated one closing price
+	at a time. Fed the same closing prices it gives the same RSI as calc_rsi.
+
+	Attributes:
+		period: period used to calculate rsi
+		count: how many closing prices have been pushed
+		last_close: last closing price pushed
+		sum_gain: sum of the gains of the first period prices
+		sum_loss: sum of the losses of the first period prices
+		avg_gain: smoothed average gain once period prices have been pushed
+		avg_loss: smoothed average loss once period prices have been pushed
+	"""
+	__slots__ = ("period", "count", "last_close", "sum_gain", "sum_loss",
+		"avg_gain", "avg_loss")
+
+	def __init__(self, period: int):
+		self.period = period
+		self.count = 0
+		self.last_close = None
+
+		self.sum_gain = 0
+		self.sum_loss = 0
+
+		self.avg_gain = 0
+		self.avg_loss = 0
+
+
+	def push(self, close: float) -> None:
+		"""
+		Updates the averages with the next closing price.
+
+		Args:
+			close: closing price of the next candle
+
+		"""
+		if self.count == 0:
+			self.last_close = close
+			self.count = 1
+			return
+
+		change = close - self.last_close
+
+		loss = abs(change) if change < 0 else 0
+		gain = change if change > 0 else 0
+
+		if self.count < self.period:
+			self.sum_gain += gain
+			self.sum_loss += loss
+
+			if self.count + 1 == self.period:
+				self.avg_gain = self.sum_gain / self.period
+				self.avg_loss = self.sum_loss / self.period
+
+		else:
+			period = self.period
+			self.avg_gain = (self.avg_gain * (period - 1) + gain) / period
+			self.avg_loss = (self.avg_loss * (period - 1) + loss) / period
+
+		self.last_close = close
+		self.count += 1
+
+
+	def rsi(self) -> int:
+		"""
+		Calculates the RSI from the current averages.
+		"""
+		if self.count == 0:
+			return 50
+
+		if self.count < self.period:
+			return rsi_from_averages(
+				self.sum_gain / self.period, self.sum_loss / self.period)
+
+		return rsi_from_averages(self.avg_gain, self.avg_loss)
+
+
+	def peek(self, close: float) -> int:
+		"""
+		Calculates what the RSI would be if close was pushed without pushing it.
+		Used for the provisional RSI of a candle that hasn't closed yet.
+
+		Args:
+			close: current price of the open candle
+
+		Returns:
+			the provisional RSI
+
+		"""
+		state = copy.copy(self)
+		state.push(close)
+
+		return state.rsi()
+
+
+class RSIEngine:
+	"""
+	Keeps the Wilder state of every (exchange, symbol, timeframe) so RSI is only
+	updated with candles that closed since the last update instead of being
+	recalculated from the full history every tick.
+
+	Attributes:
+		_period: period used to calculate rsi
+		_live: whether to give a provisional rsi using the open candle
+		_states: key mapped to the market's WilderState
+		_last_closed: key mapped to the timestamp of the last candle pushed
+	"""
+
+	def __init__(self, period: int, live: bool = False):
+		self._period = period
+		self._live = live
+
+		self._states = {}
+		self._last_closed = {}
+
+
+	def due(self, key: tuple, now: int) -> bool:
+		"""
+		Checks if key has to be fetched, either because a candle closed since it
+		was last updated or because the rsi is live.
+
+		Args:
+			key: (exchange, symbol, timeframe) of the market
+			now: current time in milliseconds
+
+		Returns:
+			True if the market needs new candles, else false
+
+		"""
+		if self._live or key not in self._last_closed:
+			return True
+
+		# the candle after the last one pushed has closed
+		return self._last_closed[key] + 2 * timeframe_to_ms(key[2]) <= now
+
+
+	def last_closed(self, key: tuple) -> int:
+		"""
+		Gets the timestamp of the last candle pushed for key, None if there
+		hasn't been one.
+		"""
+		return self._last_closed.get(key)
+
+
+	def seed(self, keys: list, closes: list, last_closed: list) -> None:
+		"""
+		Builds the state of many markets from their history at once using the
+		vectorized wilder averages.
+
+		Args:
+			keys: (exchange, symbol, timeframe) of each market
+			closes: sequences of closing prices of each market, oldest first
+			last_closed: timestamp of the newest candle of each market
+
+		"""
+		if not keys:
+			return
+
+		rows = [np.concatenate([np.asarray(v) for v in values]) if values
+			else np.zeros(0) for values in closes]
+		lengths = np.array([len(row) for row in rows])
+
+		# right align every market's history in one matrix
+		matrix = np.zeros((len(rows), max(lengths.max(), 1)))
+		for i, row in enumerate(rows):
+			if len(row):
+				matrix[i, matrix.shape[1] - len(row):] = row
+
+		sum_gain, sum_loss, avg_gain, avg_loss = wilder_averages_batch(
+			matrix, lengths, self._period)
+
+		for i, key in enumerate(keys):
+			state = WilderState(self._period)
+
+			state.count = int(lengths[i])
+			state.last_close = float(rows[i][-1]) if lengths[i] else None
+			state.sum_gain = float(sum_gain[i])
+			state.sum_loss = float(sum_loss[i])
+			state.avg_gain = float(avg_gain[i])
+			state.avg_loss = float(avg_loss[i])
+
+			self._states[key] = state
+			self._last_closed[key] = last_closed[i]
+
+
+	def push(self, key: tuple, closes: list, last_closed: int) -> None:
+		"""
+		Pushes the closing prices of the candles that closed since key was last
+		updated.
+
+		Args:
+			key: (exchange, symbol, timeframe) of the market
+			closes: sequences of closing prices, oldest first
+			last_closed: timestamp of the newest candle in closes
+
+		"""
+		if key not in self._states:
+			self._states[key] = WilderState(self._period)
+
+		state = self._states[key]
+
+		for values in closes:
+			for close in values:
+				state.push(close)
+
+		self._last_closed[key] = last_closed
+
+
+	def rsi(self, key: tuple, open_close: float = None) -> int:
+		"""
+		Gets the rsi of key.
+
+		Args:
+			key: (exchange, symbol, timeframe) of the market
+			open_close: current price of the candle that's still open
+
+		Returns:
+			the rsi, provisional if the engine is live and open_close is given
+
+		"""
+		state = self._states.get(key)
+
+		if state is None:
+			return 50
+
+		if self._live and open_close is not None:
+			return state.peek(open_close)
+
+		return state.rsi()
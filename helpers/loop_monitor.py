@@ -0,0 +1,190 @@
+import traceback
+import threading
+import asyncio
+import time
+import sys
+
+from metrics import Histogram, RollingHistogram, Counter, Gauge
+
+# asyncio.current_task only exists from python 3.7 on
+_current_task = getattr(asyncio, "current_task", None) or asyncio.Task.current_task
+
+
+def _describe(task, frame) -> str:
+	"""
+	Names what's running on the loop, the coroutine of the task if a task is
+	running, else the function of the innermost frame.
+	"""
+	if task is not None:
+		coro = getattr(task, "_coro", None)
+		return getattr(coro, "__qualname__", None) or repr(task)
+
+	if frame is not None:
+		return "{0} ({1}:{2})".format(
+			frame.f_code.co_name, frame.f_code.co_filename, frame.f_lineno)
+
+	return "unknown"
+
+
+class LoopMonitor:
+	"""
+	Watches the event loop's health from a thread of its own. Every interval
+	the thread schedules a ping on the loop, and how long the ping waits to
+	run is how far behind the loop is. If a ping hasn't run after threshold
+	seconds something is blocking the loop, so the coroutine or callback
+	running on it is logged with its stack while it's still blocking.
+
+	Steps blocking the loop for longer than threshold plus interval are always
+	caught, shorter ones are caught if a ping is waiting while they run.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_loop: loop being watched.
+		_interval: seconds between each ping.
+		_threshold: seconds a ping can wait before the loop counts as blocked.
+		_loop_thread: id of the thread the loop runs on.
+		_thread: thread pinging the loop.
+		_stop: set when the monitor is to stop.
+		lag: seconds each ping waited to run.
+		recent_lag: seconds each ping waited to run, over the last window seconds.
+		blocked: times the loop was blocked for longer than threshold, by what
+			was running.
+	"""
+
+	def __init__(self, logger, loop=None, interval: float = 0.1, threshold: float = 0.25,
+			window: float = 300):
+
+		self._logger = logger
+		self._loop = loop or asyncio.get_event_loop()
+		self._interval = interval
+		self._threshold = threshold
+
+		self._loop_thread = None
+		self._thread = None
+		self._stop = threading.Event()
+
+		self.lag = Histogram()
+		self.recent_lag = RollingHistogram(window)
+		self.blocked = Counter(("coroutine",))
+
+
+	def register_metrics(self, metrics) -> None:
+		"""
+		Registers the loop's lag and how often it was blocked.
+
+		Args:
+			metrics: MetricsRegistry the metrics are registered in
+
+		"""
+		def recent():
+			summary = self.recent_lag.summary()
+
+			return {
+					("0.5",): summary["p50"],
+					("0.95",): summary["p95"],
+					("0.99",): summary["p99"],
+				}
+
+		metrics.register("hasami_loop_lag_seconds",
+			"Seconds callbacks waited for the event loop.", self.lag)
+		metrics.register("hasami_loop_lag_recent_seconds",
+			"Quantiles of the event loop's lag over the last few minutes.",
+			Gauge(("quantile",), func=recent))
+		metrics.register("hasami_loop_blocked_total",
+			"Times the event loop was blocked for longer than the threshold.",
+			self.blocked)
+
+
+	def start(self) -> None:
+		"""
+		Starts watching the loop, to be called from a task running on the loop.
+		Pings can't run while the loop isn't running, so the monitor is to be
+		closed before the loop stops.
+		"""
+		if self._thread:
+			return
+
+		self._loop_thread = threading.get_ident()
+		self._stop.clear()
+
+		self._thread = threading.Thread(
+			target=self._watch, name="loop-monitor", daemon=True)
+		self._thread.start()
+
+
+	def _pong(self, posted: float, done: threading.Event) -> None:
+		"""
+		Runs on the loop, records how long the ping waited.
+		"""
+		lag = time.monotonic() - posted
+
+		self.lag.observe(lag)
+		self.recent_lag.observe(lag)
+
+		done.set()
+
+
+	def _watch(self) -> None:
+		while not self._stop.is_set():
+			posted = time.monotonic()
+			done = threading.Event()
+
+			try:
+				self._loop.call_soon_threadsafe(self._pong, posted, done)
+
+			except RuntimeError:
+				# the loop's been closed
+				return
+
+			blocker = None
+
+			while not done.wait(self._threshold if blocker is None else self._interval):
+				if self._stop.is_set():
+					return
+
+				if blocker is None:
+					blocker = self._report()
+
+			if blocker is not None:
+				self._logger.warning("Event loop was blocked for {0:.3f}s by {1}".format(
+					time.monotonic() - posted, blocker))
+
+			self._stop.wait(self._interval)
+
+
+	def _report(self) -> str:
+		"""
+		Logs what's blocking the loop along with its stack.
+
+		Returns:
+			name of what's blocking the loop
+
+		"""
+		frame = sys._current_frames().get(self._loop_thread)
+
+		try:
+			task = _current_task(self._loop)
+
+		except RuntimeError:
+			task = None
+
+		name = _describe(task, frame)
+		stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+
+		self.blocked.inc(name)
+
+		self._logger.warning("Event loop blocked for over {0}s by {1}\n{2}".format(
+			self._threshold, name, stack))
+
+		return name
+
+
+	def close(self) -> None:
+		"""
+		Stops watching the loop.
+		"""
+		self._stop.set()
+
+		if self._thread:
+			self._thread.join(self._threshold + self._interval)
+			self._thread = None
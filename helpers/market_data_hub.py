@@ -0,0 +1,364 @@
+from collections import namedtuple
+from types import MappingProxyType
+import traceback
+import asyncio
+import time
+
+from ticker_stream import TickerStream, ADAPTERS
+from metrics import Histogram, HistogramVec, DURATION_BUCKETS
+
+# immutable snapshot of one exchange's updates for a tick
+ExchangeUpdate = namedtuple("ExchangeUpdate", [
+	"exchange",    # ccxt id of the exchange
+	"tick",        # number of the tick the update was made in
+	"time",        # unix time the exchange was polled
+	"prices",      # symbols mapped to their significant price change
+	"indicators",  # indicator names mapped to symbols and significant values
+	"subscribers", # Subscribers of the exchange when it was polled
+	])
+
+
+class MarketDataHub:
+	"""
+	Polls every exchange servers want signals for exactly once per tick, all
+	exchanges at the same time, and publishes immutable ExchangeUpdates of each
+	exchange's prices and indicators to its subscribers as soon as each is
+	checked. The cost of a tick grows with the number of
+	exchanges instead of the number of servers times exchanges.
+
+	When streaming, exchanges with a WebSocket ticker stream get their prices
+	from it as they change instead of each tick, and price updates are
+	published as soon as they're detected.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_processor: ExchangeProcessor used to check the exchanges.
+		_subscriptions: registry of the channels subscribed to each exchange.
+		_interval: time to wait between each tick in minutes.
+		_streaming: whether to stream prices from exchanges that can be.
+		_stream_urls: exchange id mapped to a url to stream from instead of the
+			exchange's own.
+		_stream_timeout: seconds a stream can go quiet before it's reconnected.
+		_streams: exchange id mapped to its TickerStream.
+		_exchange_subscribers: exchange id mapped to its subscribers last tick.
+		_indicator_checks: exchange id mapped to the task checking its indicators.
+		_subscribers: queues the updates are published to.
+		_tick: number of the current tick.
+		tick_duration: seconds each tick's price checks took.
+		check_duration: seconds each check of an exchange took, by exchange and
+			check, ie price or indicators.
+		_clock: function giving the current time in seconds, durations are
+			timed with it.
+	"""
+
+	def __init__(self, logger, processor, subscriptions, interval: float, streaming: bool = False,
+			stream_urls: dict = None, stream_timeout: float = 30, clock=time.monotonic):
+
+		self._logger = logger
+		self._processor = processor
+		self._subscriptions = subscriptions
+		self._interval = interval
+		self._clock = clock
+
+		self._streaming = streaming
+		self._stream_urls = stream_urls or {}
+		self._stream_timeout = stream_timeout
+		self._streams = {}
+		self._exchange_subscribers = {}
+		self._indicator_checks = {}
+
+		self._subscribers = []
+		self._tick = 0
+
+		self.tick_duration = Histogram(DURATION_BUCKETS)
+		self.check_duration = HistogramVec(("exchange", "check"), DURATION_BUCKETS)
+
+
+	def register_metrics(self, metrics) -> None:
+		"""
+		Registers the tick and check durations.
+
+		Args:
+			metrics: MetricsRegistry the metrics are registered in
+
+		"""
+		metrics.register("hasami_tick_seconds",
+			"Seconds the price checks of every exchange took each tick.", self.tick_duration)
+		metrics.register("hasami_check_seconds",
+			"Seconds each price or indicator check of an exchange took.",
+			self.check_duration)
+
+
+	def subscribe(self, maxsize: int = 100) -> asyncio.Queue:
+		"""
+		Subscribes to the updates of every exchange. If the queue fills up the
+		oldest updates are dropped.
+
+		Args:
+			maxsize: most updates kept waiting in the queue
+
+		Returns:
+			queue the updates are put in
+
+		"""
+		queue = asyncio.Queue(maxsize=maxsize)
+		self._subscribers.append(queue)
+
+		return queue
+
+
+	def _publish(self, update: ExchangeUpdate) -> None:
+		"""
+		Puts an update in every subscriber's queue.
+		"""
+		for queue in self._subscribers:
+			if queue.full():
+				dropped = queue.get_nowait()
+				self._logger.warning("Dropping {0} update from tick {1}".format(
+					dropped.exchange, dropped.tick))
+
+			queue.put_nowait(update)
+
+
+	def _publish_prices(self, exchange_id: str, prices: dict) -> None:
+		"""
+		Publishes price updates detected outside of a tick.
+		"""
+		if not prices:
+			return
+
+		self._logger.debug("Streamed Price Updates: {0}".format(prices))
+
+		self._publish(self._update(
+			exchange_id, self._tick, time.time(), tuple(self._exchange_subscribers.get(exchange_id, ())),
+			prices=prices))
+
+
+	def _on_stream_prices(self, exchange_id: str, prices: dict) -> None:
+		"""
+		Checks prices from a stream for significant changes as they arrive.
+		"""
+		self._publish_prices(exchange_id, self._processor.apply_prices(exchange_id, prices))
+
+
+	async def _resync(self, exchange) -> None:
+		"""
+		Catches a stream's prices up over REST.
+		"""
+		self._publish_prices(
+			exchange.id, await self._processor.check_exchange_price_updates(exchange))
+
+
+	def _stream(self, exchange) -> bool:
+		"""
+		Starts streaming the exchange's tickers if it can be streamed.
+
+		Args:
+			exchange: ccxt exchange to be streamed
+
+		Returns:
+			True if the exchange's prices come from a stream, else false
+
+		"""
+		if not self._streaming or exchange.id not in ADAPTERS:
+			return False
+
+		if exchange.id not in self._streams:
+			stream = TickerStream(
+				self._logger, exchange, ADAPTERS[exchange.id](), self._on_stream_prices,
+				self._resync, url=self._stream_urls.get(exchange.id),
+				timeout=self._stream_timeout
+				)
+
+			stream.start()
+			self._streams[exchange.id] = stream
+
+		return True
+
+
+	async def _timed(self, exchange_id: str, check: str, coro):
+		"""
+		Awaits a check of an exchange, recording how long it took.
+		"""
+		start = self._clock()
+
+		try:
+			return await coro
+
+		finally:
+			self.check_duration.observe(self._clock() - start, exchange_id, check)
+
+
+	def _update(self, exchange_id: str, tick: int, polled: float, subscribers: tuple, prices: dict = None,
+			indicators: dict = None) -> ExchangeUpdate:
+		"""
+		Freezes the results of a check into an update.
+		"""
+		indicators = {
+				name: MappingProxyType(updates)
+				for name, updates in (indicators or {}).items()
+			}
+
+		return ExchangeUpdate(
+			exchange_id, tick, polled, MappingProxyType(prices or {}),
+			MappingProxyType(indicators), subscribers
+			)
+
+
+	async def _check_prices(self, exchange, subscribers: tuple) -> ExchangeUpdate:
+		"""
+		Checks an exchange's price updates and publishes them as soon as they're
+		found.
+
+		Args:
+			exchange: ccxt exchange to be checked
+			subscribers: servers subscribed to the exchange
+
+		Returns:
+			the exchange's price update
+
+		"""
+		polled = time.time()
+
+		prices = await self._timed(exchange.id, "price",
+			self._processor.check_exchange_price_updates(exchange))
+
+		self._logger.debug("Price Updates: {0}".format(prices))
+
+		update = self._update(exchange.id, self._tick, polled, subscribers, prices=prices)
+		self._publish(update)
+
+		return update
+
+
+	async def _check_indicators(self, exchange, subscribers: tuple) -> None:
+		"""
+		Checks an exchange's indicator updates and publishes them as soon as
+		they're found. Runs apart from the tick, fetching every market's candles
+		when they close can take minutes.
+
+		Args:
+			exchange: ccxt exchange to be checked
+			subscribers: servers subscribed to the exchange
+
+		"""
+		tick = self._tick
+		polled = time.time()
+
+		try:
+			indicators = await self._timed(exchange.id, "indicators",
+				self._processor.check_exchange_indicator_updates(exchange))
+
+		except asyncio.CancelledError:
+			raise
+
+		except Exception as e:
+			self._logger.debug(traceback.format_exc())
+			self._logger.warning("Couldn't check {0} indicators: {1}".format(exchange.id, e))
+			return
+
+		self._logger.debug("Indicator Updates: {0}".format(indicators))
+
+		self._publish(self._update(
+			exchange.id, tick, polled, subscribers, indicators=indicators))
+
+
+	async def tick(self, exchange_subscribers: dict) -> list:
+		"""
+		Checks every exchange with subscribers once. Each exchange's prices and
+		indicators are checked apart and published as soon as they're found, so
+		price updates never wait on candles. Prices aren't checked if they're
+		being streamed, and an exchange's indicators aren't checked again while
+		its last check is still running.
+
+		Args:
+			exchange_subscribers: exchange ids mapped to a tuple of their
+				Subscribers
+
+		Returns:
+			the price updates published
+
+		"""
+		self._tick += 1
+
+		self._logger.info("Tick {0} checking exchanges {1}".format(
+			self._tick, list(exchange_subscribers)))
+
+		self._exchange_subscribers = exchange_subscribers
+
+		# nobody wants these streams anymore
+		for exchange in list(self._streams):
+			if exchange not in exchange_subscribers:
+				await self._streams.pop(exchange).stop()
+
+		exchanges = []
+		checks = []
+
+		for exchange_id, subscribers in exchange_subscribers.items():
+			exchange = self._processor.get_exchange(exchange_id)
+
+			if not exchange:
+				continue
+
+			running = self._indicator_checks.get(exchange_id)
+
+			if running and not running.done():
+				self._logger.debug("Still checking {0} indicators".format(exchange_id))
+
+			else:
+				self._indicator_checks[exchange_id] = asyncio.ensure_future(
+					self._check_indicators(exchange, subscribers))
+
+			if not self._stream(exchange):
+				exchanges.append(exchange_id)
+				checks.append(self._check_prices(exchange, subscribers))
+
+		start = self._clock()
+
+		results = await asyncio.gather(*checks, return_exceptions=True)
+
+		self.tick_duration.observe(self._clock() - start)
+
+		updates = []
+
+		for exchange, result in zip(exchanges, results):
+			if isinstance(result, Exception):
+				self._logger.warning("Couldn't check {0} prices: {1}".format(exchange, result))
+				continue
+
+			updates.append(result)
+
+		return updates
+
+
+	async def run(self) -> None:
+		"""
+		Ticks every interval for as long as the bot is running.
+		"""
+		while True:
+			try:
+				exchange_subscribers = self._subscriptions.subscribers()
+
+				if exchange_subscribers:
+					await self.tick(exchange_subscribers)
+
+			except Exception as e:
+				self._logger.debug(traceback.format_exc())
+				self._logger.warning(e)
+
+			await asyncio.sleep(int(self._interval * 60))
+
+
+	async def close(self) -> None:
+		"""
+		Stops every ticker stream and indicator check.
+		"""
+		for check in self._indicator_checks.values():
+			check.cancel()
+
+		self._indicator_checks.clear()
+
+		for stream in self._streams.values():
+			await stream.stop()
+
+		self._streams.clear()
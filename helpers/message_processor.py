@@ -3,8 +3,6 @@ import discord
 import ccxt
 import re
 
-from exchange_processor import ExchangeProcessor
-
 class MessageProcessor:
 	"""
 	Class to process messages and repsond to basic ones that don't require
@@ -15,6 +13,8 @@ class MessageProcessor:
 		_logger: logger used to log events
 		_bot: bot used to process commands
 		_db: db used to get server preferences for commands 
+		_prefixes: server ids mapped to their prefix, kept in memory so messages
+			that aren't commands never wait on the db
 	"""
 	def __init__(self, client, bot, base_prefix, logger, db):
 		self.base_prefix = base_prefix
@@ -23,7 +23,25 @@ class MessageProcessor:
 		self._bot = bot
 		self._db = db
 
-		self._ep = ExchangeProcessor(logger=self._logger)
+		# shares the bot's cmc index instead of building its own
+		self._ep = bot.exchange_processor
+
+		self._prefixes = {}
+
+
+	async def load_prefixes(self) -> None:
+		"""
+		Loads every server's prefix into the cache, servers without one use the
+		base prefix.
+		"""
+		prefixes = await self._db.get_prefixes()
+
+		self._prefixes.update(
+			(server_id, prefix or self.base_prefix)
+			for server_id, prefix in prefixes.items()
+			)
+
+		self._logger.info("Loaded prefixes of {0} servers".format(len(prefixes)))
 
 
 	def is_admin(self, message: discord.Message) -> bool:
@@ -54,6 +72,7 @@ class MessageProcessor:
 		| `$start <exchanges>`  | Starts checking the exchanges for price/rsi updates in the channel the message was sent. *Uses bittrex by default*| 
 		| `$stop <exchanges>`   | Stops checking the exchanges for price/rsi updates in the channel the message was sent.  *Uses bittrex by default*| 
 		| `$prefix <prefix>`    | Sets the prefix for the current server to the prefix specified. *Only works for users with admin privileges*      |
+		| `$signals <types>`    | Sets the signals sent for the server, any of price, rsi, ema, macd, bollinger, atr. *Uses price and rsi by default* |
 		| `$price`  | Gets market data for currency specified after, ie `$price eth` |
 		| `$cap`    | Gets the marketcap of cryptocurrencies as a whole.             |
 		| `$help`   | Private messages user bot commands and github .                |
@@ -69,11 +88,12 @@ class MessageProcessor:
 		content = message.content
 
 		server_id = message.server.id
-		prefix = await self._db.get_prefix(server_id)
 
-		if prefix == None:
-			prefix = self.base_prefix
-			await self._db.update_prefix(server_id, prefix)
+		# servers the cache doesn't know yet haven't changed from the base prefix
+		prefix = self._prefixes.get(server_id)
+
+		if prefix is None:
+			prefix = self._prefixes[server_id] = self.base_prefix
 
 		if content.startswith(prefix):
 			content = content.replace(prefix, "", 1)
@@ -97,6 +117,7 @@ class MessageProcessor:
 					| `$start <exchanges>`  | Starts checking the exchanges for price/rsi updates in the channel the message was sent. *Uses bittrex by default*| 
 					| `$stop <exchanges>`   | Stops checking the exchanges for price/rsi updates in the channel the message was sent.  *Uses bittrex by default*| 
 					| `$prefix <prefix>`    | Sets the prefix for the current server to the prefix specified. *Only works for users with admin privileges*      |
+					| `$signals <types>`    | Sets the signals sent for the server, any of price, rsi, ema, macd, bollinger, atr. *Uses price and rsi by default* |
 					| `$price`  | Gets market data for currency specified after, ie `$price eth` |
 					| `$cap`    | Gets the marketcap of cryptocurrencies as a whole.             |
 					| `$help`   | Private messages user bot commands and github .                |
@@ -120,6 +141,12 @@ class MessageProcessor:
 
 				await self._bot.stop_sending_signals(message, params)
 
+			elif cmd == "signals":
+				text = "{0.author} asked for signals {1}".format(message, params)
+				self._logger.info(text)
+
+				await self._bot.set_signals(message, params)
+
 			elif cmd == "price" or cmd == "p":
 				text = "{0.author} asked for the price of markets {1}".format(message, params)
 				self._logger.info(text)
@@ -140,6 +167,9 @@ class MessageProcessor:
 				if self.is_admin(message) and len(params) > 0:
 					await self._bot.change_prefix(message, params[0])
 
+					# written through once the db has it
+					self._prefixes[server_id] = params[0]
+
 			elif cmd in ccxt.exchanges:
 				text = "{0.author} asked to start checking exchange {1}"
 				text = text.format(message, cmd)
@@ -0,0 +1,355 @@
+from collections import OrderedDict, deque
+import bisect
+import math
+import time
+
+
+# upper bounds of latency buckets in seconds
+LATENCY_BUCKETS = (
+	0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+	)
+
+# upper bounds of buckets for things taking seconds to minutes, ie ticks
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class Histogram:
+	"""
+	Counts of observed values in fixed buckets, cheap enough to record every
+	query or request with.
+
+	Attributes:
+		buckets: upper bound of each bucket, values above the last go in an
+			extra overflow bucket
+		counts: number of values in each bucket
+		count: number of values observed
+		sum: sum of the values observed
+	"""
+
+	def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+		self.buckets = tuple(sorted(buckets))
+		self.counts = [0] * (len(self.buckets) + 1)
+		self.count = 0
+		self.sum = 0.0
+
+
+	def observe(self, value: float) -> None:
+		"""
+		Records a value.
+		"""
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.count += 1
+		self.sum += value
+
+
+	def quantile(self, q: float) -> float:
+		"""
+		Estimates a quantile as the upper bound of the bucket it falls in.
+
+		Args:
+			q: quantile between 0 and 1, ie 0.99
+
+		Returns:
+			the estimate, inf if it's in the overflow bucket, 0 if nothing has
+			been observed
+
+		"""
+		if not self.count:
+			return 0.0
+
+		rank = q * self.count
+		seen = 0
+
+		for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+			seen += count
+
+			if seen >= rank:
+				return bound
+
+		return float("inf")
+
+
+	def summary(self) -> dict:
+		"""
+		Gets the count, mean and estimated p50/p95/p99 of the values.
+		"""
+		return {
+			"count": self.count,
+			"mean": self.sum / self.count if self.count else 0.0,
+			"p50": self.quantile(0.5),
+			"p95": self.quantile(0.95),
+			"p99": self.quantile(0.99),
+		}
+
+
+class RollingHistogram:
+	"""
+	Histogram of only the values observed in the last window seconds. Values
+	are kept in slices of window / slices seconds which are dropped as they
+	age out.
+
+	Attributes:
+		_window: seconds values are kept for.
+		_width: seconds each slice covers.
+		_buckets: upper bound of each bucket.
+		_slices: (start, Histogram) of each slice, oldest first.
+	"""
+
+	def __init__(self, window: float = 300, slices: int = 10,
+			buckets: tuple = LATENCY_BUCKETS):
+
+		self._window = window
+		self._width = window / slices
+		self._buckets = buckets
+		self._slices = deque()
+
+
+	def _expire(self, now: float) -> None:
+		while self._slices and now - self._slices[0][0] >= self._window:
+			self._slices.popleft()
+
+
+	def observe(self, value: float) -> None:
+		"""
+		Records a value.
+		"""
+		now = time.monotonic()
+		self._expire(now)
+
+		if not self._slices or now - self._slices[-1][0] >= self._width:
+			self._slices.append((now, Histogram(self._buckets)))
+
+		self._slices[-1][1].observe(value)
+
+
+	def snapshot(self) -> Histogram:
+		"""
+		Gets a histogram of the values observed in the window.
+		"""
+		self._expire(time.monotonic())
+
+		merged = Histogram(self._buckets)
+
+		for _, histogram in self._slices:
+			merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+			merged.count += histogram.count
+			merged.sum += histogram.sum
+
+		return merged
+
+
+	def summary(self) -> dict:
+		"""
+		Gets the count, mean and estimated p50/p95/p99 of the values in the
+		window.
+		"""
+		return self.snapshot().summary()
+
+
+class HistogramVec:
+	"""
+	Histograms of the same thing split by label values, ie request latency by
+	exchange and method.
+
+	Attributes:
+		labels: names of the labels
+		histograms: label values mapped to their histogram, a single label's
+			value can be used instead of a tuple of one
+	"""
+
+	def __init__(self, labels: tuple, buckets: tuple = LATENCY_BUCKETS,
+			histograms: dict = None):
+
+		self.labels = tuple(labels)
+		self.histograms = {} if histograms is None else histograms
+
+		self._buckets = buckets
+
+
+	def get(self, *values) -> Histogram:
+		"""
+		Gets the histogram of the label values, creating it the first time.
+		"""
+		histogram = self.histograms.get(values)
+
+		if histogram is None:
+			histogram = self.histograms[values] = Histogram(self._buckets)
+
+		return histogram
+
+
+	def observe(self, value: float, *values) -> None:
+		"""
+		Records a value in the histogram of the label values.
+		"""
+		self.get(*values).observe(value)
+
+
+class Counter:
+	"""
+	Counts of events by label values, or counts read from func whenever
+	they're collected.
+
+	Attributes:
+		labels: names of the labels
+		values: label values mapped to their count
+		func: returns the count, or a dict of label values and counts
+	"""
+
+	def __init__(self, labels: tuple = (), func=None):
+		self.labels = tuple(labels)
+		self.values = {}
+		self.func = func
+
+
+	def inc(self, *values, amount: float = 1) -> None:
+		self.values[values] = self.values.get(values, 0) + amount
+
+
+	def collect(self) -> dict:
+		"""
+		Gets the label values and their current value.
+		"""
+		if self.func is None:
+			return self.values
+
+		value = self.func()
+
+		return value if isinstance(value, dict) else {(): value}
+
+
+class Gauge(Counter):
+	"""
+	Values that go up and down by label values, or values read from func
+	whenever they're collected, ie a queue's depth.
+	"""
+
+	def set(self, value: float, *values) -> None:
+		self.values[values] = value
+
+
+	def dec(self, *values, amount: float = 1) -> None:
+		self.inc(*values, amount=-amount)
+
+
+def _number(value: float) -> str:
+	if value == math.inf:
+		return "+Inf"
+
+	if value == -math.inf:
+		return "-Inf"
+
+	if value != value:
+		return "NaN"
+
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names: tuple, values, extra: str = "") -> str:
+	"""
+	Formats labels as {name="value",...}, escaped like prometheus expects.
+	"""
+	if not isinstance(values, tuple):
+		values = (values,)
+
+	pairs = [
+			'{0}="{1}"'.format(name, str(value).replace("\\", "\\\\")
+				.replace("\"", "\\\"").replace("\n", "\\n"))
+			for name, value in zip(names, values)
+		]
+
+	if extra:
+		pairs.append(extra)
+
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class MetricsRegistry:
+	"""
+	Metrics registered under a name so they can all be exposed together in
+	prometheus' text format. Metrics stay owned by whatever records them, the
+	registry only reads them when they're exposed.
+
+	Attributes:
+		_metrics: names mapped to (description, metric).
+	"""
+
+	def __init__(self):
+		self._metrics = OrderedDict()
+
+
+	def register(self, name: str, description: str, metric):
+		"""
+		Registers a metric, replacing any registered under the same name.
+
+		Args:
+			name: prometheus name of the metric, ie hasami_tick_seconds
+			description: help text of the metric
+			metric: Counter, Gauge, Histogram or HistogramVec
+
+		Returns:
+			the metric
+
+		"""
+		self._metrics[name] = (description, metric)
+
+		return metric
+
+
+	def get(self, name: str):
+		"""
+		Gets the metric registered under name, None if there isn't one.
+		"""
+		entry = self._metrics.get(name)
+
+		return entry[1] if entry else None
+
+
+	def _histogram(self, name: str, names: tuple, values, histogram: Histogram) -> list:
+		lines = []
+		seen = 0
+
+		for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+			seen += count
+
+			lines.append("{0}_bucket{1} {2}".format(name, _labels(
+				names, values, 'le="{0}"'.format(_number(bound))), seen))
+
+		lines.append("{0}_sum{1} {2}".format(
+			name, _labels(names, values), _number(histogram.sum)))
+		lines.append("{0}_count{1} {2}".format(
+			name, _labels(names, values), histogram.count))
+
+		return lines
+
+
+	def expose(self) -> str:
+		"""
+		Gets every metric in prometheus' text format.
+		"""
+		lines = []
+
+		for name, (description, metric) in self._metrics.items():
+			if isinstance(metric, (Histogram, HistogramVec)):
+				kind = "histogram"
+			elif isinstance(metric, Gauge):
+				kind = "gauge"
+			else:
+				kind = "counter"
+
+			lines.append("# HELP {0} {1}".format(name, description))
+			lines.append("# TYPE {0} {1}".format(name, kind))
+
+			if isinstance(metric, Histogram):
+				lines += self._histogram(name, (), (), metric)
+
+			elif isinstance(metric, HistogramVec):
+				for values, histogram in sorted(metric.histograms.items(), key=str):
+					lines += self._histogram(name, metric.labels, values, histogram)
+
+			else:
+				for values, value in sorted(metric.collect().items(), key=str):
+					lines.append("{0}{1} {2}".format(
+						name, _labels(metric.labels, values), _number(value)))
+
+		return "\n".join(lines) + "\n"
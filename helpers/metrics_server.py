@@ -0,0 +1,71 @@
+import asyncio
+
+from aiohttp import web
+
+from metrics import MetricsRegistry
+
+
+class MetricsServer:
+	"""
+	Serves the metrics of a registry over http in prometheus' text format on
+	/metrics.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_registry: registry whose metrics are served.
+		_host: host the server listens on.
+		_port: port the server listens on.
+		_app: web app serving the metrics, None until started.
+		_handler: request handler of the app.
+		_server: server listening for requests.
+	"""
+
+	def __init__(self, logger, registry: MetricsRegistry, host: str = "127.0.0.1",
+			port: int = 9464):
+
+		self._logger = logger
+		self._registry = registry
+		self._host = host
+		self._port = port
+
+		self._app = None
+		self._handler = None
+		self._server = None
+
+
+	async def _metrics(self, request: web.Request) -> web.Response:
+		return web.Response(
+			body=self._registry.expose().encode("utf-8"),
+			headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+			)
+
+
+	async def start(self) -> None:
+		"""
+		Starts serving the metrics.
+		"""
+		loop = asyncio.get_event_loop()
+
+		self._app = web.Application()
+		self._app.router.add_route("GET", "/metrics", self._metrics)
+
+		self._handler = self._app.make_handler()
+		self._server = await loop.create_server(self._handler, self._host, self._port)
+
+		self._logger.info("Serving metrics on http://{0}:{1}/metrics".format(
+			self._host, self._port))
+
+
+	async def close(self) -> None:
+		"""
+		Stops serving the metrics.
+		"""
+		if self._server:
+			self._server.close()
+			await self._server.wait_closed()
+
+			await self._app.shutdown()
+			await self._handler.finish_connections(1.0)
+			await self._app.cleanup()
+
+			self._app = self._handler = self._server = None
@@ -3,7 +3,15 @@ import datetime
 import asyncio
 import discord
 import random
-import locale
+
+
+# discord's limits on a field's value, fields in an embed and a whole embed
+EMBED_FIELD = 1024
+EMBED_FIELDS = 25
+EMBED_TOTAL = 6000
+
+# formats us dollars with thousands separators, ie $1,234.56
+USD = "${0:,.2f}"
 
 
 def get_output(*items: list) -> str:
@@ -38,81 +46,192 @@ def get_color() -> hex:
 	return color
 
 
-def create_rsi_update_embed(data: dict) -> discord.Embed:
+def format_usd(value: float) -> str:
+	"""
+	Formats a value as us dollars, ie $1,234.56. Used instead of
+	locale.currency so the process wide locale never has to be switched.
+	"""
+	if value < 0:
+		return "-" + USD.format(-value)
+
+	return USD.format(value)
+
+
+def embed_size(embed: discord.Embed) -> int:
+	"""
+	Counts the characters of an embed that go towards discord's total limit.
 	"""
-	Creates a discord embed for rsi signals.
+	size = len(embed.title or "")
+
+	for field in embed.fields:
+		size += len(field.name) + len(field.value)
+
+	return size
+
+
+def chunk_lines(lines: list, limit: int) -> list:
+	"""
+	Joins lines into as few chunks as possible without any going over limit.
+	Lines longer than limit are cut short.
 
 	Args:
-		data: information about rsi and their symbols
+		lines: lines to be joined
+		limit: most characters in a chunk
 
 	Returns:
-		embed containing the data passed in
+		list of the chunks
 
 	"""
-	out = ""
+	chunks = []
+	current = []
+	size = 0
+
+	for line in lines:
+		line = line[:limit]
+
+		# + 1 for the newline joining it to the chunk
+		if current and size + len(line) + 1 > limit:
+			chunks.append("\n".join(current))
+			current = []
+			size = 0
 
-	for symbol, rsi in data.items():
-		out += "[{0}] RSI [{1}]\n".format(symbol, rsi)
+		size += len(line) + (1 if current else 0)
+		current.append(line)
 
-	return create_embed(title="RSI", text=out, discord_mark_up="ini")
+	if current:
+		chunks.append("\n".join(current))
 
+	return chunks
 
-def create_price_update_embed(data: dict) -> discord.Embed:
+
+def create_rsi_update_embeds(data: dict) -> list:
 	"""
-	Creates a discord embed for price updates.
+	Creates discord embeds for rsi signals.
 
 	Args:
-		data: information about price updates and their symbols
+		data: information about rsi and their symbols
 
 	Returns:
-		embed containing the data passed in
+		embeds containing the data passed in
 
 	"""
-	out = ""
+	lines = ["[{0}] RSI [{1}]".format(symbol, rsi) for symbol, rsi in data.items()]
 
-	for symbol, change in data.items():
-		prefix = "-"
-		if change > 0:
-			prefix = "+"
+	return create_embeds(title="RSI", lines=lines, discord_mark_up="ini")
 
-		out += "{0} {1} changed by {2}%\n".format(prefix, symbol, change)
 
-	return create_embed(title="Price Updates", text=out, discord_mark_up="diff")
+def create_indicator_update_embeds(title: str, lines: list) -> list:
+	"""
+	Creates discord embeds for indicator signals.
 
+	Args:
+		title: title of the indicator
+		lines: a line describing each significant symbol
 
-def create_embed(title: str, text: str, discord_mark_up: str = None, 
-		color: int = None) -> discord.Embed: 
+	Returns:
+		embeds containing the lines passed in
+
+	"""
+	return create_embeds(title=title, lines=lines, discord_mark_up="ini")
+
+
+def create_price_update_embeds(data: dict) -> list:
 	"""
-	Generates a pretty embed for discord consisting of two groups,
-	the significant price changes / RSI vals.
+	Creates discord embeds for price updates.
 
 	Args:
-		outputs: Tuple of what the data is called and the data.
+		data: information about price updates and their symbols
 
 	Returns:
-		a discord.Embed of items inside the list
+		embeds containing the data passed in
 
 	"""
+	lines = [
+			"{0} {1} changed by {2}%".format("+" if change > 0 else "-", symbol, change)
+			for symbol, change in data.items()
+		]
+
+	return create_embeds(title="Price Updates", lines=lines, discord_mark_up="diff")
+
+
+def create_embeds(title: str, lines: list, discord_mark_up: str = None,
+		color: int = None) -> list:
+	"""
+	Generates pretty embeds for discord out of lines of text. The lines are
+	split across as many fields and embeds as it takes to stay under discord's
+	limits, which rejects anything over them.
+
+	Args:
+		title: title of the embeds, numbered if there's more than one
+		lines: lines of text to be put in the embeds
+		discord_mark_up: mark up the text is highlighted with, ie diff
+		color: color of the embeds, gold by default
+
+	Returns:
+		list of the embeds, empty if there are no lines
+
+	"""
+	if not lines:
+		return []
 
 	if not color:
 		color = discord.Colour.gold()
 
-	if not text:
-		return None
+	fence = "```{0}\n{{0}}\n```".format(discord_mark_up) if discord_mark_up else "{0}"
+	overhead = len(fence) - 3
 
-	embed = discord.Embed(
-		title=title, type="rich", 
-		timestamp=datetime.datetime.now(),
-		colour=color
-		)
+	fields = [fence.format(c) for c in chunk_lines(lines, EMBED_FIELD - overhead)]
 
-	if discord_mark_up:
-		text = "```{0}\n{1}\n```".format(discord_mark_up, text) 
+	# room for the title and its numbering
+	room = EMBED_TOTAL - len(title) - 10
 
-	#\u200b
-	embed.add_field(name="\u200b", value=text, inline=False)
+	groups = [[]]
+	size = 0
 
-	return embed
+	for field in fields:
+		if len(groups[-1]) == EMBED_FIELDS or size + len(field) + 1 > room:
+			groups.append([])
+			size = 0
+
+		groups[-1].append(field)
+		size += len(field) + 1
+
+	now = datetime.datetime.now()
+	embeds = []
+
+	for i, group in enumerate(groups):
+		name = title if len(groups) == 1 else \
+			"{0} ({1}/{2})".format(title, i + 1, len(groups))
+
+		embed = discord.Embed(title=name, type="rich", timestamp=now, colour=color)
+
+		for field in group:
+			embed.add_field(name="\u200b", value=field, inline=False)
+
+		embeds.append(embed)
+
+	return embeds
+
+
+def create_embed(title: str, text: str, discord_mark_up: str = None, 
+		color: int = None) -> discord.Embed: 
+	"""
+	Generates a pretty embed for discord out of text, anything past discord's
+	limits is left out, use create_embeds to get all of it.
+
+	Args:
+		title: title of the embed
+		text: text to be put in the embed
+		discord_mark_up: mark up the text is highlighted with, ie diff
+		color: color of the embed, gold by default
+
+	Returns:
+		a discord.Embed of the text, None if there's no text
+
+	"""
+	embeds = create_embeds(title, text.splitlines() if text else [], discord_mark_up, color)
+
+	return embeds[0] if embeds else None
 
 
 def create_cmc_price_embed(info: dict) -> discord.Embed:
@@ -127,8 +246,6 @@ def create_cmc_price_embed(info: dict) -> discord.Embed:
 		discord embed of information
 
 	"""	
-	locale.setlocale(locale.LC_ALL, "")
-
 	n = info["name"]
 	n2 = info["id"]
 
@@ -142,8 +259,7 @@ def create_cmc_price_embed(info: dict) -> discord.Embed:
 		colour=color
 		)
 
-	text = locale.currency(float(info["price_usd"]), grouping=True)\
-		+ " / " + info["price_btc"] + " BTC"
+	text = " ".join([format_usd(float(info["price_usd"])), "/", info["price_btc"], "BTC"])
 
 	changes = [info["percent_change_1h"], 
 		info["percent_change_24h"], info["percent_change_7d"]]
@@ -160,8 +276,8 @@ def create_cmc_price_embed(info: dict) -> discord.Embed:
 	embed.add_field(name="Price", value=text, inline=True)
 
 	mc = float(info["market_cap_usd"]) if info["market_cap_usd"] else 0
-	embed.add_field(name="Market Cap - Rank " + info["rank"], value=locale.currency(
-		mc, grouping=True), inline=True)
+	embed.add_field(name="Market Cap - Rank " + info["rank"], value=format_usd(mc),
+		inline=True)
 
 	embed.add_field(name="\u200b", 
 		value="```diff\nChange\n\n{}```".format('\n'.join(changes)), inline=False)
@@ -180,8 +296,6 @@ def create_cmc_cap_embed(info: dict) -> discord.Embed:
 		discord embed fo the current market cap
 
 	"""
-	locale.setlocale(locale.LC_ALL, "")
-
 	embed = discord.Embed(
 		title="Crypto Market Cap", url="https://coinmarketcap.com/charts/",
 		colour=0xc43aff
@@ -191,10 +305,10 @@ def create_cmc_cap_embed(info: dict) -> discord.Embed:
 		url="https://files.coinmarketcap.com/static/widget/coins_legacy/32x32/dollar-online.png"
 		)
 
-	mc = locale.currency(float(info["total_market_cap_usd"]), grouping=True)
+	mc = format_usd(float(info["total_market_cap_usd"]))
 	embed.add_field(name="Total USD", value=mc, inline=True)
 
-	mc = locale.currency(float(info["total_24h_volume_usd"]), grouping=True)
+	mc = format_usd(float(info["total_24h_volume_usd"]))
 	embed.add_field(name="24h Volume USD", value=mc+"\n\u200b", inline=True)
 	
 	mc = "{}%".format(info["bitcoin_percentage_of_market_cap"])
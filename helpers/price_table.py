@@ -0,0 +1,162 @@
+import sys
+
+import numpy as np
+
+
+class PriceTable:
+	"""
+	Prices of every market on an exchange kept in contiguous float64 arrays.
+	Each symbol is interned and given a slot, its baseline price (the price
+	changes are measured from) and last price are stored at that slot so the
+	whole exchange can be checked for significant changes in one vectorized
+	comparison.
+
+	Attributes:
+		_slots: symbol mapped to its slot
+		_symbols: symbol held by each slot, None if the slot is free
+		_free: slots freed by evicted symbols
+		_baseline: price each slot's change is measured from, nan if free
+		_last: last price of each slot, nan if free
+	"""
+
+	def __init__(self, capacity: int = 64):
+		self._slots = {}
+		self._symbols = []
+		self._free = []
+
+		self._baseline = np.full(capacity, np.nan)
+		self._last = np.full(capacity, np.nan)
+
+
+	def __len__(self) -> int:
+		return len(self._slots)
+
+
+	def __contains__(self, symbol: str) -> bool:
+		return symbol in self._slots
+
+
+	def _slot(self, symbol: str) -> int:
+		"""
+		Gets the slot of a symbol, giving it one if it doesn't have one.
+		"""
+		slot = self._slots.get(symbol)
+
+		if slot is not None:
+			return slot
+
+		symbol = sys.intern(symbol)
+
+		if self._free:
+			slot = self._free.pop()
+			self._symbols[slot] = symbol
+
+		else:
+			slot = len(self._symbols)
+			self._symbols.append(symbol)
+
+			if slot >= len(self._last):
+				grow = np.full(len(self._last), np.nan)
+				self._baseline = np.concatenate([self._baseline, grow])
+				self._last = np.concatenate([self._last, grow])
+
+		self._slots[symbol] = slot
+
+		return slot
+
+
+	def price(self, symbol: str) -> float:
+		"""
+		Gets the baseline price of a symbol.
+		"""
+		return float(self._baseline[self._slots[symbol]])
+
+
+	def update(self, prices: dict) -> np.ndarray:
+		"""
+		Stores the last prices of symbols. Symbols seen for the first time use
+		their price as their baseline.
+
+		Args:
+			prices: symbols mapped to their last price
+
+		Returns:
+			slots of the symbols that already had a baseline
+
+		"""
+		new = [symbol not in self._slots for symbol in prices]
+		slots = np.fromiter((self._slot(s) for s in prices), dtype=np.intp, count=len(prices))
+		values = np.fromiter(prices.values(), dtype=np.float64, count=len(prices))
+
+		new = np.array(new, dtype=bool)
+
+		self._last[slots] = values
+		self._baseline[slots[new]] = values[new]
+
+		return slots[~new]
+
+
+	def changes(self, slots: np.ndarray, mooning: float, free_fall: float) -> dict:
+		"""
+		Finds the slots whose price changed by at least mooning or free_fall
+		percent from their baseline and moves their baseline up to the last
+		price.
+
+		Args:
+			slots: slots to be checked
+			mooning: high percent change to flag
+			free_fall: low percent change to flag
+
+		Returns:
+			a dict of the flagged symbols and their change rounded to 2 places
+
+		"""
+		baseline = self._baseline[slots]
+
+		with np.errstate(divide="ignore", invalid="ignore"):
+			change = ((self._last[slots] - baseline) / baseline) * 100
+
+		# changes are compared after being rounded, so anything within rounding
+		# of the thresholds is a candidate that gets rounded exactly below
+		candidates = (baseline > 0) & \
+			((change >= mooning - 0.01) | (change <= free_fall + 0.01))
+
+		updates = {}
+		flagged = []
+
+		for slot, value in zip(slots[candidates], change[candidates]):
+			value = round(float(value), 2)
+
+			if value >= mooning or value <= free_fall:
+				updates[self._symbols[slot]] = value
+				flagged.append(slot)
+
+		self._baseline[flagged] = self._last[flagged]
+
+		return updates
+
+
+	def evict(self, symbols) -> list:
+		"""
+		Removes every symbol not in symbols, ie markets that have been delisted,
+		and frees their slots.
+
+		Args:
+			symbols: symbols still listed
+
+		Returns:
+			list of the evicted symbols
+
+		"""
+		symbols = set(symbols)
+		evicted = [s for s in self._slots if s not in symbols]
+
+		for symbol in evicted:
+			slot = self._slots.pop(symbol)
+
+			self._symbols[slot] = None
+			self._baseline[slot] = np.nan
+			self._last[slot] = np.nan
+			self._free.append(slot)
+
+		return evicted
@@ -0,0 +1,186 @@
+import itertools
+import asyncio
+import time
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class TokenBucket:
+	"""
+	Token bucket used to keep requests to an exchange at or below the rate it
+	allows.
+
+	Attributes:
+		_rate: tokens added per second.
+		_capacity: most tokens the bucket can hold, the largest burst allowed.
+		_tokens: tokens currently in the bucket, negative while penalized.
+		_updated: when the tokens were last refilled.
+		_clock: function giving the current time in seconds.
+	"""
+
+	def __init__(self, rate: float, capacity: float = 1, clock=time.monotonic):
+		self._rate = rate
+		self._capacity = capacity
+		self._clock = clock
+		self._tokens = capacity
+		self._updated = clock()
+
+
+	def _refill(self) -> None:
+		"""
+		Adds the tokens gained since the last refill.
+		"""
+		now = self._clock()
+		self._tokens = min(self._capacity,
+			self._tokens + (now - self._updated) * self._rate)
+		self._updated = now
+
+
+	async def acquire(self) -> None:
+		"""
+		Waits until a token is available and takes it.
+		"""
+		while True:
+			self._refill()
+
+			if self._tokens >= 1:
+				self._tokens -= 1
+				return
+
+			await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+	def penalize(self, seconds: float) -> None:
+		"""
+		Empties the bucket so no tokens are handed out for the next seconds.
+		Used when the exchange tells us we've been going too fast.
+
+		Args:
+			seconds: how long to hold off requests for
+
+		"""
+		self._refill()
+		self._tokens = min(self._tokens, -self._rate * seconds)
+
+
+class RequestScheduler:
+	"""
+	Schedules the requests made to one exchange. Requests are queued by priority
+	and run by a bounded pool of workers that take a token from a bucket sized
+	from the exchange's rate limit before each request.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_bucket: token bucket pacing the requests.
+		_workers: how many requests can be in flight at once.
+		_throttle_exceptions: exceptions meaning the exchange is throttling us.
+		_backoff: seconds to hold off requests after being throttled.
+		_queue: priority queue of pending requests.
+		_tasks: worker tasks.
+	"""
+
+	def __init__(self, logger, rate_limit: float, workers: int = 8, burst: float = 1,
+			throttle_exceptions: tuple = (), backoff: float = 5, clock=time.monotonic):
+
+		self._logger = logger
+
+		# rate_limit is the ccxt rateLimit, milliseconds between each request
+		self._bucket = TokenBucket(1000 / max(rate_limit, 1), burst, clock=clock)
+
+		self._workers = workers
+		self._throttle_exceptions = throttle_exceptions
+		self._backoff = backoff
+
+		self._queue = asyncio.PriorityQueue()
+		self._counter = itertools.count()
+		self._tasks = []
+
+
+	def _start(self) -> None:
+		"""
+		Starts the workers if they haven't been started yet.
+		"""
+		if not self._tasks:
+			self._tasks = [
+					asyncio.ensure_future(self._worker())
+					for _ in range(self._workers)
+				]
+
+
+	async def submit(self, priority: int, func, *args):
+		"""
+		Queues func to be called with args and waits for its result.
+
+		Args:
+			priority: priority of the request, lower runs first
+			func: coroutine function making the request
+			*args: arguments to call func with
+
+		Returns:
+			what func returns
+
+		"""
+		self._start()
+
+		future = asyncio.get_event_loop().create_future()
+		self._queue.put_nowait((priority, next(self._counter), future, func, args))
+
+		return await future
+
+
+	async def _worker(self) -> None:
+		"""
+		Takes requests off the queue and runs them once the bucket allows it.
+		"""
+		while True:
+			_, _, future, func, args = await self._queue.get()
+
+			try:
+				if future.cancelled():
+					continue
+
+				await self._bucket.acquire()
+
+				try:
+					result = await func(*args)
+
+				except asyncio.CancelledError:
+					future.cancel()
+					raise
+
+				except self._throttle_exceptions as e:
+					self._logger.warning("Throttled, holding off requests for {0}s: {1}"\
+						.format(self._backoff, e))
+
+					self._bucket.penalize(self._backoff)
+					if not future.cancelled():
+						future.set_exception(e)
+
+				except Exception as e:
+					if not future.cancelled():
+						future.set_exception(e)
+
+				else:
+					if not future.cancelled():
+						future.set_result(result)
+
+			finally:
+				self._queue.task_done()
+
+
+	async def close(self) -> None:
+		"""
+		Stops the workers and cancels any requests still waiting.
+		"""
+		for task in self._tasks:
+			task.cancel()
+
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks = []
+
+		while not self._queue.empty():
+			_, _, future, _, _ = self._queue.get_nowait()
+			future.cancel()
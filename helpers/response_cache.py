@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import asyncio
+import time
+
+
+class ResponseCache:
+	"""
+	Async cache of responses keyed by endpoint and parameters. Responses are
+	fresh for their endpoint's ttl, after that they're stale for another stale
+	seconds, during which they're still served while being refreshed in the
+	background. Concurrent misses for the same key share one request, and the
+	least recently used responses are evicted past maxsize.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_maxsize: most responses kept.
+		_stale: seconds a response can be served past its ttl while refreshing.
+		_entries: key mapped to (response, time it expires), least recently used
+			first.
+		_inflight: key mapped to the task fetching it.
+		hits: lookups served fresh.
+		stale_hits: lookups served stale while refreshing.
+		misses: lookups that had to wait for a request.
+		_clock: function giving the current time in seconds.
+	"""
+
+	def __init__(self, logger, maxsize: int = 256, stale: float = 0, clock=time.monotonic):
+		self._logger = logger
+		self._maxsize = maxsize
+		self._stale = stale
+		self._clock = clock
+
+		self._entries = OrderedDict()
+		self._inflight = {}
+
+		self.hits = 0
+		self.stale_hits = 0
+		self.misses = 0
+
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+
+	def _store(self, key, value, ttl: float) -> None:
+		self._entries[key] = (value, self._clock() + ttl)
+		self._entries.move_to_end(key)
+
+		while len(self._entries) > self._maxsize:
+			self._entries.popitem(last=False)
+
+
+	async def _load(self, key, ttl: float, func, args):
+		try:
+			value = await func(*args)
+			self._store(key, value, ttl)
+
+			return value
+
+		finally:
+			self._inflight.pop(key, None)
+
+
+	def _fetch(self, key, ttl: float, func, args) -> asyncio.Future:
+		"""
+		Gets the request in flight for key, starting one if there isn't.
+		"""
+		task = self._inflight.get(key)
+
+		if task is None:
+			task = self._inflight[key] = asyncio.ensure_future(
+				self._load(key, ttl, func, args))
+
+		return task
+
+
+	def _refreshed(self, key, task: asyncio.Future) -> None:
+		"""
+		Logs background refreshes that failed, the stale response stays cached.
+		"""
+		if not task.cancelled() and task.exception():
+			self._logger.warning("Couldn't refresh {0}: {1}".format(key, task.exception()))
+
+
+	async def get(self, key, ttl: float, func, *args):
+		"""
+		Gets the response for key, requesting it with func if it isn't cached.
+
+		Args:
+			key: endpoint and parameters of the request
+			ttl: seconds the response is fresh for
+			func: coroutine function making the request
+			*args: arguments to call func with
+
+		Returns:
+			the response
+
+		"""
+		entry = self._entries.get(key)
+		now = self._clock()
+
+		if entry is not None:
+			value, expires = entry
+
+			if now < expires:
+				self.hits += 1
+				self._entries.move_to_end(key)
+
+				return value
+
+			if now < expires + self._stale:
+				self.stale_hits += 1
+				self._entries.move_to_end(key)
+
+				if key not in self._inflight:
+					task = self._fetch(key, ttl, func, args)
+					task.add_done_callback(lambda t: self._refreshed(key, t))
+
+				return value
+
+		self.misses += 1
+
+		# shielded so a cancelled caller doesn't cancel everyone sharing the request
+		return await asyncio.shield(self._fetch(key, ttl, func, args))
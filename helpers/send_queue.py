@@ -0,0 +1,280 @@
+import traceback
+import asyncio
+import random
+import time
+
+import discord
+import aiohttp
+
+from output_generator import EMBED_FIELDS, EMBED_TOTAL, embed_size
+from request_scheduler import TokenBucket
+from metrics import Histogram, Counter, Gauge, DURATION_BUCKETS
+
+
+def merge_embeds(embeds: list) -> list:
+	"""
+	Merges embeds into as few as possible while staying under discord's limits.
+	Fields of embeds with different titles are named after the title they came
+	from.
+
+	Args:
+		embeds: embeds to be merged, in order
+
+	Returns:
+		list of the merged embeds
+
+	"""
+	if len(embeds) == 1:
+		return embeds
+
+	merged = []
+	current = None
+
+	for embed in embeds:
+		if current is None:
+			current = embed
+			continue
+
+		# sized after relabeling, field names grow when they're named after titles
+		combined = _combine(current, embed)
+
+		if len(combined.fields) > EMBED_FIELDS or embed_size(combined) > EMBED_TOTAL:
+			merged.append(current)
+			current = embed
+			continue
+
+		current = combined
+
+	merged.append(current)
+
+	return merged
+
+
+def _combine(first: discord.Embed, second: discord.Embed) -> discord.Embed:
+	"""
+	Combines the fields of two embeds into one, relabeling them first if their
+	titles differ.
+	"""
+	if first.title != second.title:
+		first = _relabel(first)
+		second = _relabel(second)
+
+	combined = discord.Embed(
+		title=first.title, type="rich", timestamp=first.timestamp, colour=first.colour)
+
+	for field in first.fields + second.fields:
+		combined.add_field(name=field.name, value=field.value, inline=field.inline)
+
+	return combined
+
+
+def _relabel(embed: discord.Embed) -> discord.Embed:
+	"""
+	Moves an embed's title onto its unnamed fields so it can be merged with
+	embeds of other titles.
+	"""
+	if embed.title == "Signals":
+		return embed
+
+	relabeled = discord.Embed(
+		title="Signals", type="rich", timestamp=embed.timestamp, colour=embed.colour)
+
+	for field in embed.fields:
+		name = embed.title if field.name == "\u200b" else field.name
+		relabeled.add_field(name=name, value=field.value, inline=field.inline)
+
+	return relabeled
+
+
+class SendQueue:
+	"""
+	Delivers embeds to discord channels without making whoever sends them wait.
+	Each channel is sent to by its own task so a slow channel only delays
+	itself, embeds waiting for the same channel are merged into one message,
+	and every send takes a token from its channel's bucket and the global
+	bucket so discord's rate limits aren't hit. Failed sends are retried with
+	a backoff.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_client: client used to communicate with discord.
+		_global: token bucket shared by every send.
+		_channel_rate: messages per second each channel is sent.
+		_channel_burst: most messages sent to a channel back to back.
+		_retries: how many times a send is tried before it's dropped.
+		_workers: most sends in flight at once.
+		_pending: channel id mapped to a list of (embed, time queued).
+		_buckets: channel id mapped to its token bucket.
+		_tasks: channel id mapped to the task sending to it.
+		delivery_latency: seconds from queueing an embed to it being sent.
+		retries: failed sends that were retried, by exception.
+		dropped: embeds that were never sent, by reason.
+		_clock: function giving the current time in seconds.
+	"""
+
+	def __init__(self, logger, client, rate: float = 45, channel_rate: float = 1,
+			channel_burst: int = 5, retries: int = 5, workers: int = 20,
+			clock=time.monotonic):
+
+		self._logger = logger
+		self._client = client
+		self._clock = clock
+
+		self._global = TokenBucket(rate, rate, clock=clock)
+		self._channel_rate = channel_rate
+		self._channel_burst = channel_burst
+		self._retries = retries
+		self._workers = asyncio.Semaphore(workers)
+
+		self._pending = {}
+		self._buckets = {}
+		self._tasks = {}
+
+		self.delivery_latency = Histogram(DURATION_BUCKETS)
+		self.retries = Counter(("exception",))
+		self.dropped = Counter(("reason",))
+
+
+	@property
+	def depth(self) -> int:
+		"""
+		Number of embeds waiting to be sent.
+		"""
+		return sum(len(p) for p in self._pending.values())
+
+
+	def register_metrics(self, metrics) -> None:
+		"""
+		Registers the queue's depth, delivery latency, retries and drops.
+
+		Args:
+			metrics: MetricsRegistry the metrics are registered in
+
+		"""
+		metrics.register("hasami_send_queue_depth",
+			"Embeds waiting to be sent to discord.", Gauge(func=lambda: self.depth))
+		metrics.register("hasami_send_delivery_seconds",
+			"Seconds from queueing an embed to it being sent.", self.delivery_latency)
+		metrics.register("hasami_send_retries_total",
+			"Sends to discord that failed and were retried.", self.retries)
+		metrics.register("hasami_send_dropped_total",
+			"Embeds that were never sent to discord.", self.dropped)
+
+
+	def send(self, channel_id: str, embed: discord.Embed) -> None:
+		"""
+		Queues an embed to be sent to a channel.
+
+		Args:
+			channel_id: id of the channel
+			embed: embed to be sent
+
+		"""
+		if embed is None:
+			return
+
+		self._pending.setdefault(channel_id, []).append((embed, self._clock()))
+
+		if channel_id not in self._tasks:
+			self._tasks[channel_id] = asyncio.ensure_future(self._drain(channel_id))
+
+
+	async def _drain(self, channel_id: str) -> None:
+		"""
+		Sends everything queued for a channel until nothing's left.
+		"""
+		bucket = self._buckets.get(channel_id)
+
+		if bucket is None:
+			bucket = self._buckets[channel_id] = TokenBucket(
+				self._channel_rate, self._channel_burst, clock=self._clock)
+
+		try:
+			while self._pending.get(channel_id):
+				batch = self._pending.pop(channel_id)
+				queued = [t for _, t in batch]
+
+				for embed in merge_embeds([e for e, _ in batch]):
+					await self._deliver(channel_id, bucket, embed)
+
+				now = self._clock()
+				for t in queued:
+					self.delivery_latency.observe(now - t)
+
+		finally:
+			self._tasks.pop(channel_id, None)
+
+
+	async def _deliver(self, channel_id: str, bucket: TokenBucket,
+			embed: discord.Embed) -> None:
+
+		"""
+		Sends an embed, retrying with a backoff. Gives up on channels that are
+		gone or that the bot can't send to, and on embeds discord rejects.
+		"""
+		channel = discord.Object(channel_id)
+
+		for attempt in range(self._retries):
+			await bucket.acquire()
+			await self._global.acquire()
+
+			try:
+				await self._client.wait_until_ready()
+
+				async with self._workers:
+					await self._client.send_message(channel, embed=embed)
+
+				return
+
+			except (discord.Forbidden, discord.NotFound) as e:
+				self._logger.warning("Can't send to {0}: {1}".format(channel_id, e))
+				self.dropped.inc(type(e).__name__)
+				return
+
+			except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+				status = getattr(getattr(e, "response", None), "status", None)
+
+				# discord won't take it no matter how many times it's sent
+				if status is not None and 400 <= status < 500 and status != 429:
+					self._logger.warning("Discord rejected message to {0}: {1}".format(
+						channel_id, e))
+					self.dropped.inc("rejected")
+					return
+
+				delay = min(2 ** attempt, 60) + random.uniform(0, 1)
+				self.retries.inc(type(e).__name__)
+
+				# slow the channel down if discord says we're going too fast
+				if status == 429:
+					bucket.penalize(delay)
+
+				self._logger.debug(traceback.format_exc())
+				self._logger.warning("Sending to {0} failed, retrying in {1:.1f}s: {2}"
+					.format(channel_id, delay, e))
+
+				await asyncio.sleep(delay)
+
+		self._logger.warning("Dropping message to {0} after {1} tries".format(
+			channel_id, self._retries))
+		self.dropped.inc("retries")
+
+
+	async def join(self) -> None:
+		"""
+		Waits until everything queued has been sent.
+		"""
+		while self._tasks:
+			await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+	async def close(self) -> None:
+		"""
+		Stops sending, anything still queued is dropped.
+		"""
+		for task in self._tasks.values():
+			task.cancel()
+
+		await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+		self._tasks.clear()
+		self._pending.clear()
@@ -0,0 +1,158 @@
+from collections import namedtuple
+import traceback
+import asyncio
+import json
+
+
+CHANNEL = "subscriptions_changed"
+
+# channel of a server wanting signals from an exchange
+Subscriber = namedtuple("Subscriber", ["id", "channel", "signals"])
+
+
+class SubscriptionRegistry:
+	"""
+	Subscriptions kept in memory so the hub can read them every tick without
+	touching the database. Loaded once, then kept fresh by the notifications the
+	subscriptions table's trigger sends on every change, and reloaded every
+	reconcile seconds in case a notification was missed.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_db: database the subscriptions are stored in.
+		_reconcile: seconds between each full reload.
+		_subscriptions: set of every (guild, channel, exchange, signal_type).
+		_subscribers: subscriptions grouped by exchange, None once they've
+			changed until they're grouped again.
+		_task: task reloading the subscriptions.
+	"""
+
+	def __init__(self, logger, db, reconcile: float = 300):
+		self._logger = logger
+		self._db = db
+		self._reconcile = reconcile
+
+		self._subscriptions = set()
+		self._subscribers = None
+		self._task = None
+
+
+	def __len__(self) -> int:
+		return len(self._subscriptions)
+
+
+	def subscribers(self) -> dict:
+		"""
+		Gets the channels subscribed to each exchange.
+
+		Returns:
+			dict of exchange ids and a tuple of their Subscribers
+
+		"""
+		if self._subscribers is None:
+			channels = {}
+
+			for guild, channel, exchange, signal_type in self._subscriptions:
+				channels.setdefault(exchange, {}) \
+					.setdefault((guild, channel), []).append(signal_type)
+
+			self._subscribers = {
+					exchange: tuple(
+						Subscriber(guild, channel, tuple(sorted(signals)))
+						for (guild, channel), signals in sorted(subscribed.items())
+						)
+					for exchange, subscribed in channels.items()
+				}
+
+		return self._subscribers
+
+
+	def wanting(self, exchange: str, signal_type: str) -> list:
+		"""
+		Gets the subscribers wanting a signal type from an exchange.
+		"""
+		return [
+				s for s in self.subscribers().get(exchange, ())
+				if signal_type in s.signals
+			]
+
+
+	@staticmethod
+	def _key(row: dict) -> tuple:
+		return (row["guild"], row["channel"], row["exchange"], row["signal_type"])
+
+
+	def _on_notify(self, connection, pid, channel, payload) -> None:
+		"""
+		Applies a change the subscriptions table's trigger sent.
+		"""
+		try:
+			change = json.loads(payload)
+
+			if change["old"]:
+				self._subscriptions.discard(self._key(change["old"]))
+
+			if change["new"]:
+				self._subscriptions.add(self._key(change["new"]))
+
+			self._subscribers = None
+
+		except Exception as e:
+			self._logger.debug(traceback.format_exc())
+			self._logger.warning("Bad subscription notification {0}: {1}".format(
+				payload, e))
+
+
+	async def reload(self, rows: list = None) -> None:
+		"""
+		Replaces every subscription with what's in the database and makes sure
+		notifications are still being listened for.
+
+		Args:
+			rows: every subscription if they've already been fetched
+
+		"""
+		await self._db.listen(CHANNEL, self._on_notify)
+
+		if rows is None:
+			rows = await self._db.get_subscriptions()
+
+		self._subscriptions = {self._key(row) for row in rows}
+		self._subscribers = None
+
+		self._logger.debug("Reconciled {0} subscriptions".format(len(rows)))
+
+
+	async def _run(self) -> None:
+		while True:
+			await asyncio.sleep(self._reconcile)
+
+			try:
+				await self.reload()
+
+			except Exception as e:
+				self._logger.warning("Couldn't reconcile subscriptions: {0}".format(e))
+
+
+	async def start(self, rows: list = None) -> None:
+		"""
+		Loads the subscriptions and starts reconciling them.
+
+		Args:
+			rows: every subscription if they've already been fetched
+
+		"""
+		await self.reload(rows)
+
+		if self._task is None:
+			self._task = asyncio.ensure_future(self._run())
+
+
+	async def close(self) -> None:
+		"""
+		Stops reconciling the subscriptions.
+		"""
+		if self._task:
+			self._task.cancel()
+			await asyncio.gather(self._task, return_exceptions=True)
+			self._task = None
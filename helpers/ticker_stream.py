@@ -0,0 +1,167 @@
+import traceback
+import asyncio
+import json
+
+import aiohttp
+
+
+class BinanceAdapter:
+	"""
+	Reads binance's all market ticker stream, which sends the tickers of every
+	market that changed about once a second.
+	"""
+	url = "wss://stream.binance.com:9443/ws/!ticker@arr"
+
+	def parse(self, exchange, message: str) -> list:
+		"""
+		Parses a frame of the stream.
+
+		Args:
+			exchange: ccxt exchange the stream is for, used to map market ids
+			message: text of the frame
+
+		Returns:
+			list of (symbol, last price, event time in milliseconds)
+
+		"""
+		tickers = []
+
+		for ticker in json.loads(message):
+			market = exchange.markets_by_id.get(ticker["s"])
+
+			if not market:
+				continue
+
+			# newer ccxt versions map ids to a list of markets
+			if isinstance(market, list):
+				market = market[0]
+
+			tickers.append((market["symbol"], float(ticker["c"]), ticker["E"]))
+
+		return tickers
+
+
+ADAPTERS = {
+	"binance": BinanceAdapter,
+}
+
+
+class TickerStream:
+	"""
+	Keeps a WebSocket ticker subscription to an exchange open and hands the
+	prices to on_prices as they arrive. Whenever the stream may have missed
+	tickers, after (re)connecting, when it goes quiet for longer than timeout or
+	when the event times jump, resync is called so prices can be caught up over
+	REST.
+
+	Attributes:
+		_logger: logger to be used when logging.
+		_exchange: ccxt exchange the stream is for.
+		_adapter: adapter parsing the exchange's frames.
+		_on_prices: called with a dict of symbols and their last price.
+		_resync: coroutine function called to catch up over REST.
+		_url: url of the stream, lets a local server stand in for the exchange.
+		_timeout: seconds without a frame before the stream counts as broken.
+		_task: task running the stream.
+	"""
+
+	def __init__(self, logger, exchange, adapter, on_prices, resync,
+			url: str = None, timeout: float = 30):
+
+		self._logger = logger
+		self._exchange = exchange
+		self._adapter = adapter
+		self._on_prices = on_prices
+		self._resync = resync
+
+		self._url = url or adapter.url
+		self._timeout = timeout
+
+		self._task = None
+
+
+	def start(self) -> None:
+		"""
+		Starts streaming if it isn't already.
+		"""
+		if self._task is None:
+			self._task = asyncio.ensure_future(self._run())
+
+
+	async def stop(self) -> None:
+		"""
+		Stops streaming.
+		"""
+		if self._task:
+			self._task.cancel()
+			await asyncio.gather(self._task, return_exceptions=True)
+			self._task = None
+
+
+	async def _run(self) -> None:
+		"""
+		Connects to the stream and reconnects with a backoff whenever it breaks.
+		"""
+		backoff = 1
+
+		async with aiohttp.ClientSession() as session:
+			while True:
+				try:
+					async with session.ws_connect(self._url) as ws:
+						self._logger.info("Streaming {0} tickers from {1}".format(
+							self._exchange.id, self._url))
+
+						backoff = 1
+
+						# anything could have changed while disconnected
+						await self._resync(self._exchange)
+						await self._consume(ws)
+
+				except asyncio.CancelledError:
+					raise
+
+				except Exception as e:
+					self._logger.debug(traceback.format_exc())
+					self._logger.warning("{0} ticker stream broke: {1}".format(
+						self._exchange.id, e))
+
+				await asyncio.sleep(backoff)
+				backoff = min(backoff * 2, 60)
+
+
+	async def _consume(self, ws) -> None:
+		"""
+		Reads frames until the stream closes or goes quiet.
+		"""
+		last_event = None
+
+		while True:
+			try:
+				msg = await asyncio.wait_for(ws.receive(), self._timeout)
+
+			except asyncio.TimeoutError:
+				self._logger.warning("No {0} tickers for {1}s, reconnecting".format(
+					self._exchange.id, self._timeout))
+				return
+
+			if msg.type != aiohttp.WSMsgType.TEXT:
+				if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+					return
+
+				continue
+
+			tickers = self._adapter.parse(self._exchange, msg.data)
+
+			if not tickers:
+				continue
+
+			event = max(t[2] for t in tickers)
+
+			if last_event is not None and event - last_event > self._timeout * 1000:
+				self._logger.warning("Gap in {0} tickers, resyncing".format(
+					self._exchange.id))
+				await self._resync(self._exchange)
+
+			last_event = event
+
+			self._on_prices(self._exchange.id, {t[0]: t[1] for t in tickers})
@@ -12,6 +12,10 @@ from bot import Hasami
 sys.path.append("helpers/")
 
 from message_processor import MessageProcessor
+from exchange_processor import DEFAULT_SIGNALS
+from metrics_server import MetricsServer
+from loop_monitor import LoopMonitor
+from metrics import MetricsRegistry
 import database
 
 
@@ -56,15 +60,34 @@ if __name__ == '__main__':
 	logger = logging.getLogger()
 
 	db = database.ServerDatabase(config["dbuser"], config["dbname"], 
-		config["dbhost"], logger, config["dbpass"])
+		config["dbhost"], logger, config["dbpass"],
+		pool_min=config.get("db_pool_min", 2),
+		pool_max=config.get("db_pool_max", 10),
+		statement_cache=config.get("db_statement_cache", 100),
+		statement_lifetime=config.get("db_statement_lifetime", 300),
+		default_signals=DEFAULT_SIGNALS)
 
 	bot = Hasami(client, logger, config, db)
 	message_processor = MessageProcessor(client, bot, config["prefix"], logger, db)
 
+	loop_monitor = LoopMonitor(logger, client.loop,
+		interval=config.get("loop_lag_interval", 0.1),
+		threshold=config.get("loop_slow_threshold", 0.25))
+
+	metrics = MetricsRegistry()
+	bot.register_metrics(metrics)
+	db.register_metrics(metrics)
+	loop_monitor.register_metrics(metrics)
+
+	metrics_server = MetricsServer(logger, metrics,
+		host=config.get("metrics_host", "127.0.0.1"),
+		port=config.get("metrics_port", 9464))
+
 	# client events
 	@client.event
 	async def on_ready():
 		logger.info("logged in as {0}".format(client.user.name))
+		await message_processor.load_prefixes()
 		await bot.start()
 
 
@@ -80,4 +103,36 @@ if __name__ == '__main__':
 
 
 	token = config["token"]
-	client.run(token)
+	loop = client.loop
+
+	async def run():
+		# the monitor only starts once the loop is running, pings before then
+		# would count as the loop being blocked
+		loop_monitor.start()
+
+		# metrics are optional, the bot runs without them
+		if config.get("metrics_port", 9464):
+			try:
+				await metrics_server.start()
+
+			except Exception as e:
+				logger.warning("Couldn't serve metrics: {0}".format(e))
+
+		await client.start(token)
+
+
+	try:
+		loop.run_until_complete(run())
+
+	except KeyboardInterrupt:
+		loop_monitor.close()
+		loop.run_until_complete(client.logout())
+
+	finally:
+		# the loop only runs in steps from here on
+		loop_monitor.close()
+
+		loop.run_until_complete(bot.close())
+		loop.run_until_complete(metrics_server.close())
+		loop.run_until_complete(db.close())
+		loop.close()
@@ -0,0 +1,188 @@
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+	"helpers"))
+
+from candle_store import CandleStore, CLOSE
+
+TIMEFRAME = 60000
+NOW = 10 ** 9 * TIMEFRAME
+
+
+def candles(indexes: list) -> list:
+	"""
+	Makes a candle for each index, closing at the index.
+	"""
+	return [
+			[i * TIMEFRAME, i - 0.5, i + 1.0, i - 1.0, float(i), 10.0]
+			for i in indexes
+		]
+
+
+def closes(series, since: int) -> list:
+	return [v for view in series.column(CLOSE, since) for v in view]
+
+
+class CandleStoreTest(unittest.TestCase):
+
+	def setUp(self):
+		self.path = tempfile.mkdtemp(prefix="hasami-candles-")
+		self.store = CandleStore(self.path, retention=5)
+
+
+	def tearDown(self):
+		self.store.close()
+		shutil.rmtree(self.path, ignore_errors=True)
+
+
+	def series(self, symbol: str = "ETH/BTC"):
+		return self.store.series("binance", symbol, "1m", TIMEFRAME)
+
+
+	def reopen(self) -> None:
+		self.store.close()
+		self.store = CandleStore(self.path, retention=5)
+
+
+	def test_column_wraps_around_the_ring(self):
+		series = self.series()
+		series.extend(candles(range(100, 108)), NOW)
+
+		self.assertEqual(series.first, 103 * TIMEFRAME)
+		self.assertEqual(series.last, 107 * TIMEFRAME)
+		self.assertEqual(len(series.column(CLOSE, 0)), 2)
+		self.assertEqual(closes(series, 0), [103.0, 104.0, 105.0, 106.0, 107.0])
+		self.assertEqual(closes(series, 105 * TIMEFRAME), [105.0, 106.0, 107.0])
+
+
+	def test_open_candle_is_ignored(self):
+		series = self.series()
+		series.extend(candles([100, 101]), 102 * TIMEFRAME - 1)
+
+		self.assertEqual(series.last, 100 * TIMEFRAME)
+
+
+	def test_gaps_are_settled_with_the_previous_close(self):
+		series = self.series()
+		series.extend(candles([100, 101]), NOW)
+		series.extend(candles([104]), NOW)
+
+		self.assertEqual(series.gaps, [(102 * TIMEFRAME, 103 * TIMEFRAME)])
+
+		series.settle()
+
+		self.assertEqual(series.gaps, [])
+		self.assertEqual(closes(series, 0), [100.0, 101.0, 101.0, 101.0, 104.0])
+
+
+	def test_backfilled_candles_fill_gaps(self):
+		series = self.series()
+		series.extend(candles([100, 103]), NOW)
+		series.extend(candles([101, 102]), NOW)
+		series.settle()
+
+		self.assertEqual(closes(series, 0), [100.0, 101.0, 102.0, 103.0])
+
+
+	def test_jump_past_capacity_drops_everything_stored(self):
+		series = self.series()
+		series.extend(candles([100, 101, 102]), NOW)
+		series.extend(candles([110]), NOW)
+
+		self.assertEqual(series.gaps, [])
+		self.assertEqual(series.first, 110 * TIMEFRAME)
+		self.assertEqual(closes(series, 0), [110.0])
+		self.assertEqual(series.since(111 * TIMEFRAME, 5), 111 * TIMEFRAME)
+
+
+	def test_since(self):
+		series = self.series()
+		now = 200 * TIMEFRAME + 10
+
+		self.assertEqual(series.since(now, 3), 197 * TIMEFRAME)
+
+		series.extend(candles([198]), now)
+		self.assertEqual(series.since(now, 3), 199 * TIMEFRAME)
+
+		# too old to be kept
+		self.assertEqual(series.since(now + 10 * TIMEFRAME, 3), 207 * TIMEFRAME)
+
+
+	def test_reopen_keeps_candles_and_finds_gaps(self):
+		series = self.series()
+		series.extend(candles([100, 101, 103]), NOW)
+		self.series("LTC/BTC").extend(candles([50]), NOW)
+
+		self.reopen()
+		series = self.series()
+
+		self.assertEqual(series.last, 103 * TIMEFRAME)
+		self.assertEqual(series.gaps, [(102 * TIMEFRAME, 102 * TIMEFRAME)])
+		self.assertEqual(closes(self.series("LTC/BTC"), 0), [50.0])
+
+
+	def test_reopen_with_other_retention_starts_over(self):
+		self.series().extend(candles([100, 101]), NOW)
+
+		self.store.close()
+		self.store = CandleStore(self.path, retention=8)
+
+		self.assertIsNone(self.series().last)
+
+
+	def test_removed_slot_is_reused_empty(self):
+		series = self.series()
+		series.extend(candles([100, 101]), NOW)
+		offset = series._offset
+
+		self.store.remove("binance", ["ETH/BTC"])
+		reused = self.series("XRP/BTC")
+
+		self.assertEqual(reused._offset, offset)
+		self.assertIsNone(reused.last)
+		self.assertEqual(reused.column(CLOSE, 0), [])
+
+		self.reopen()
+
+		self.assertIsNone(self.series().last)
+		self.assertIsNone(self.series("XRP/BTC").last)
+
+
+	def test_growing_keeps_every_series(self):
+		for i in range(100):
+			self.series("S{0}/BTC".format(i)).extend(candles([100 + i]), NOW)
+
+		for i in range(100):
+			self.assertEqual(closes(self.series("S{0}/BTC".format(i)), 0), [100.0 + i])
+
+
+	def test_long_symbol_does_not_take_a_slot(self):
+		symbol = "X" * 60 + "/BTC"
+
+		for _ in range(2):
+			with self.assertRaises(ValueError):
+				self.series(symbol)
+
+		self.series().extend(candles([100]), NOW)
+		self.reopen()
+
+		self.assertEqual(closes(self.series(), 0), [100.0])
+
+
+	def test_close_with_live_views(self):
+		series = self.series()
+		series.extend(candles([100, 101]), NOW)
+		views = series.column(CLOSE, 0)
+
+		self.store.close()
+		self.store = CandleStore(self.path, retention=5)
+
+		self.assertEqual(len(views), 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import random
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.append(os.path.join(ROOT, "helpers"))
+sys.path.append(os.path.join(ROOT, "helpers", "indicators"))
+
+from price_table import PriceTable
+
+try:
+	from exchange_processor import ExchangeProcessor
+
+# ccxt.async can't be imported from python 3.7 on, async became a keyword
+except (ImportError, SyntaxError):
+	ExchangeProcessor = None
+
+MOONING = 5
+FREE_FALL = -5
+
+
+def percent_change(new_price: float, old_price: float) -> float:
+	return round(((new_price - old_price) / old_price) * 100, 2)
+
+
+def dict_changes(old_prices: dict, prices: dict) -> dict:
+	"""
+	The dict loop check_exchange_price_updates used before the PriceTable.
+	"""
+	price_updates = {}
+
+	for symbol, new_price in prices.items():
+		if symbol not in old_prices:
+			old_prices[symbol] = new_price
+			continue
+
+		change = percent_change(new_price, old_prices[symbol])
+
+		if change >= MOONING or change <= FREE_FALL:
+			price_updates[symbol] = change
+			old_prices[symbol] = new_price
+
+	return price_updates
+
+
+def table_changes(table: PriceTable, prices: dict) -> dict:
+	return table.changes(table.update(prices), MOONING, FREE_FALL)
+
+
+def snapshots(rng: random.Random, count: int, symbols: int) -> list:
+	"""
+	Random price snapshots of a changing set of symbols. Steps are often right
+	at the thresholds so the rounding is exercised.
+	"""
+	prices = {"S{0}/BTC".format(i): rng.uniform(1e-6, 100) for i in range(symbols)}
+	steps = [0.0, 0.01, -0.01, 0.04999, 0.05, 0.050049, -0.04999, -0.05, -0.050049, 0.2]
+	result = []
+
+	for _ in range(count):
+		for symbol in prices:
+			step = rng.choice(steps) if rng.random() < 0.5 else rng.gauss(0, 0.03)
+			prices[symbol] *= 1 + step
+
+		# markets come and go
+		listed = {s: p for s, p in prices.items() if rng.random() < 0.95}
+		listed["N{0}/BTC".format(rng.randint(0, 3 * symbols))] = rng.uniform(1e-6, 100)
+
+		result.append(listed)
+
+	return result
+
+
+class PriceTableTest(unittest.TestCase):
+
+	def test_matches_dict_loop(self):
+		rng = random.Random(0)
+
+		for _ in range(50):
+			table = PriceTable(rng.randint(1, 16))
+			old_prices = {}
+
+			for prices in snapshots(rng, 20, rng.randint(1, 60)):
+				self.assertEqual(table_changes(table, prices), dict_changes(old_prices, prices))
+
+				for symbol in table.evict(prices):
+					del old_prices[symbol]
+
+				self.assertEqual(len(table), len(old_prices))
+
+
+	def test_new_symbols_set_their_baseline(self):
+		table = PriceTable()
+
+		self.assertEqual(table_changes(table, {"A/BTC": 1.0}), {})
+		self.assertEqual(table.price("A/BTC"), 1.0)
+
+		self.assertEqual(table_changes(table, {"A/BTC": 1.04}), {})
+		self.assertEqual(table.price("A/BTC"), 1.0)
+
+		self.assertEqual(table_changes(table, {"A/BTC": 1.05}), {"A/BTC": 5.0})
+		self.assertEqual(table.price("A/BTC"), 1.05)
+
+
+	def test_evicted_slot_is_reset(self):
+		table = PriceTable(2)
+		table_changes(table, {"A/BTC": 1.0, "B/BTC": 2.0})
+
+		self.assertEqual(table.evict(["B/BTC"]), ["A/BTC"])
+		self.assertNotIn("A/BTC", table)
+		self.assertEqual(len(table), 1)
+
+		# C takes A's slot and starts from its own price
+		self.assertEqual(table_changes(table, {"C/BTC": 10.0}), {})
+		self.assertEqual(table.price("C/BTC"), 10.0)
+		self.assertEqual(table_changes(table, {"C/BTC": 10.2}), {})
+
+		# A is relisted at a price far from its old one, which is forgotten
+		self.assertEqual(table_changes(table, {"A/BTC": 3.0}), {})
+		self.assertEqual(table.price("A/BTC"), 3.0)
+		self.assertEqual(table_changes(table, {"A/BTC": 3.0, "B/BTC": 2.0}), {})
+
+
+@unittest.skipIf(ExchangeProcessor is None, "ccxt isn't installed")
+class ApplyPricesTest(unittest.TestCase):
+
+	def test_matches_dict_loop(self):
+		rng = random.Random(1)
+		processor = ExchangeProcessor()
+		processor._mooning = MOONING
+		processor._free_fall = FREE_FALL
+		old_prices = {}
+
+		for prices in snapshots(rng, 30, 40):
+			self.assertEqual(processor.apply_prices("test", prices),
+				dict_changes(old_prices, prices))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+	"helpers", "indicators"))
+
+from rsi import calc_rsi, calc_rsi_batch, wilder_averages_batch
+
+
+def right_align(rows: list) -> tuple:
+	"""
+	Lines rows of closes up into a right aligned matrix and their lengths.
+	"""
+	cols = max([len(row) for row in rows] + [1])
+	closes = np.zeros((len(rows), cols))
+
+	for i, row in enumerate(rows):
+		if row:
+			closes[i, cols - len(row):] = row
+
+	return closes, np.array([len(row) for row in rows])
+
+
+class CalcRSIBatchTest(unittest.TestCase):
+
+	def check(self, rows: list, period: int) -> None:
+		closes, lengths = right_align(rows)
+
+		batched = calc_rsi_batch(closes, lengths, period)
+		single = [calc_rsi([[0, 0, 0, 0, c] for c in row], period) for row in rows]
+
+		self.assertEqual(batched.tolist(), single)
+
+
+	def test_random_walks(self):
+		rng = np.random.RandomState(0)
+
+		for _ in range(200):
+			period = rng.randint(2, 30)
+			rows = [
+					(rng.uniform(0.001, 100) * np.exp(np.cumsum(
+						rng.normal(0, 0.02, rng.randint(0, 120))))).tolist()
+					for _ in range(rng.randint(1, 40))
+				]
+
+			self.check(rows, period)
+
+
+	def test_edge_cases(self):
+		period = 14
+
+		self.check([[]], period)
+		self.check([[5.0]], period)
+		self.check([[1.0] * 50], period)
+		self.check([list(range(1, 40))], period)
+		self.check([list(range(40, 1, -1))], period)
+		self.check([[1.0, 2.0, 1.5], list(range(1, 14)), list(range(1, 15)),
+			list(range(1, 16))], period)
+
+
+	def test_averages_match_smoothing(self):
+		rng = np.random.RandomState(1)
+		row = (10 * np.exp(np.cumsum(rng.normal(0, 0.02, 100)))).tolist()
+		period = 14
+
+		gains = [max(b - a, 0) for a, b in zip(row, row[1:])]
+		avg = sum(gains[:period - 1]) / period
+
+		for gain in gains[period - 1:]:
+			avg = (avg * (period - 1) + gain) / period
+
+		closes, lengths = right_align([row])
+		_, _, avg_gain, _ = wilder_averages_batch(closes, lengths, period)
+
+		self.assertEqual(avg_gain[0], avg)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,791 @@
+"""
+Runs the whole bot, from Hasami.start through the ExchangeProcessor to
+send_message, against stand ins for everything it talks to, and reports how
+it holds up as the number of subscribed guilds grows.
+
+- exchanges are FakeExchanges with as many symbols, as much latency and as
+  many rate limit errors as asked for
+- coinmarketcap is a FakeCMCServer served over http on localhost
+- discord is a RecordingClient that records every message sent to it
+- postgres is a MemoryDatabase keeping the servers and subscriptions in memory
+- time is a VirtualClock, whenever everything is waiting the clock skips ahead
+  to the next timer so the interval and backoff sleeps take no real time
+
+Simulate 5 ticks at 10, 1,000 and 10,000 guilds
+	python tools/load_simulator.py --guilds 10 1000 10000 --ticks 5
+
+Two exchanges of 500 symbols, 200ms latency and 2% of requests rate limited
+	python tools/load_simulator.py --exchanges binance bittrex --symbols 500 \\
+		--latency 0.2 --error-rate 0.02 --output report.json
+"""
+import collections
+import selectors
+import tempfile
+import argparse
+import logging
+import asyncio
+import shutil
+import random
+import json
+import time
+import sys
+import os
+
+import ccxt.async as ccxt
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "helpers"))
+sys.path.append(os.path.join(ROOT, "helpers", "indicators"))
+
+from bot import Hasami
+from exchange_processor import DEFAULT_SIGNALS
+from subscription_registry import CHANNEL
+from metrics import MetricsRegistry
+
+class VirtualClock:
+	"""
+	Clock that runs at real speed but can be skipped ahead. The loop the bot
+	runs on reads it, and the bot times everything with the loop's clock, so
+	the bot sees the skipped time too.
+
+	Attributes:
+		skipped: seconds the clock has been skipped ahead.
+	"""
+
+	def __init__(self):
+		self.skipped = 0.0
+
+
+	def monotonic(self) -> float:
+		return time.monotonic() + self.skipped
+
+
+	def time(self) -> float:
+		return time.time() + self.skipped
+
+
+	def skip(self, seconds: float) -> None:
+		self.skipped += seconds
+
+
+class SkippingSelector(selectors.BaseSelector):
+	"""
+	Selector that instead of sleeping until the loop's next timer waits grace
+	seconds for io, and if nothing arrives skips the clock ahead to the timer.
+	"""
+
+	def __init__(self, clock: VirtualClock, grace: float):
+		self._selector = selectors.DefaultSelector()
+		self._clock = clock
+		self._grace = grace
+
+
+	def register(self, fileobj, events, data=None) -> selectors.SelectorKey:
+		return self._selector.register(fileobj, events, data)
+
+
+	def unregister(self, fileobj) -> selectors.SelectorKey:
+		return self._selector.unregister(fileobj)
+
+
+	def modify(self, fileobj, events, data=None) -> selectors.SelectorKey:
+		return self._selector.modify(fileobj, events, data)
+
+
+	def select(self, timeout: float = None) -> list:
+		# nothing is scheduled, only io can wake the loop up
+		if timeout is None or timeout <= self._grace:
+			return self._selector.select(timeout)
+
+		events = self._selector.select(self._grace)
+
+		if not events:
+			self._clock.skip(timeout - self._grace)
+
+		return events
+
+
+	def get_map(self):
+		return self._selector.get_map()
+
+
+	def close(self) -> None:
+		self._selector.close()
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+	"""
+	Event loop reading the virtual clock, which it skips ahead whenever every
+	task is sleeping.
+	"""
+
+	def __init__(self, clock: VirtualClock, grace: float = 0.002):
+		super().__init__(SkippingSelector(clock, grace))
+
+		self._clock = clock
+
+
+	def time(self) -> float:
+		return self._clock.monotonic()
+
+
+class FakeExchange:
+	"""
+	Stand in for a ccxt exchange with made up markets. Ticker prices take a
+	random step every time they're fetched and candles follow a random walk
+	that's the same every time it's fetched.
+
+	Attributes:
+		id: ccxt id the exchange is registered under.
+		rateLimit: milliseconds between each request, like ccxt's.
+		has: methods the exchange supports, like ccxt's.
+		markets: symbols mapped to their market, once loaded.
+		symbols: symbols of the markets, once loaded.
+		requests: exchange methods mapped to how many times they were called.
+		errors: exchange methods mapped to how many times they were rate limited.
+		_count: number of markets.
+		_latency: seconds each request takes on average.
+		_error_rate: chance of a request being rate limited.
+		_volatility: standard deviation of each ticker price step.
+		_timeframe: milliseconds per candle.
+		_rng: random source of the latencies, errors and ticker prices.
+		_prices: current ticker price of each symbol.
+		_walks: symbol mapped to the closes of its candles so far.
+		_start: timestamp of the first candle.
+		_clock: function giving the unix time in seconds.
+	"""
+
+	def __init__(self, exchange_id: str, symbols: int = 300, latency: float = 0.1,
+			error_rate: float = 0, volatility: float = 0.02, rate_limit: int = 100,
+			timeframe_ms: int = 1800000, seed: int = 0, clock=time.time):
+
+		self.id = exchange_id
+		self.rateLimit = rate_limit
+		self.has = {"fetchTickers": True, "fetchOHLCV": True}
+		self.markets = None
+		self.symbols = None
+
+		self.requests = collections.Counter()
+		self.errors = collections.Counter()
+
+		self._count = symbols
+		self._latency = latency
+		self._error_rate = error_rate
+		self._volatility = volatility
+		self._timeframe = timeframe_ms
+
+		self._rng = random.Random("{0}-{1}".format(exchange_id, seed))
+		self._prices = {}
+		self._walks = {}
+		self._start = None
+		self._clock = clock
+
+
+	def milliseconds(self) -> int:
+		return int(self._clock() * 1000)
+
+
+	async def _request(self, method: str) -> None:
+		"""
+		Waits out the request's latency and rate limits it as often as asked.
+		"""
+		self.requests[method] += 1
+
+		await asyncio.sleep(self._rng.expovariate(1 / self._latency) if self._latency else 0)
+
+		if self._rng.random() < self._error_rate:
+			self.errors[method] += 1
+			raise ccxt.DDoSProtection("{0} {1} rate limited".format(self.id, method))
+
+
+	async def load_markets(self, reload: bool = False) -> dict:
+		if self.markets and not reload:
+			return self.markets
+
+		await self._request("load_markets")
+
+		symbols = ["S{0:05d}/BTC".format(i) for i in range(self._count)]
+
+		self.markets = {
+				s: {"symbol": s, "base": s.split("/")[0], "quote": "BTC"}
+				for s in symbols
+			}
+		self.symbols = symbols
+
+		for symbol in symbols:
+			self._prices.setdefault(symbol, self._rng.uniform(0.00001, 0.1))
+
+		return self.markets
+
+
+	def _ticker(self, symbol: str) -> dict:
+		price = self._prices[symbol] * (1 + self._rng.gauss(0, self._volatility))
+		self._prices[symbol] = max(price, 1e-9)
+
+		return {"symbol": symbol, "last": self._prices[symbol]}
+
+
+	async def fetch_tickers(self, symbols: list = None) -> dict:
+		await self._request("fetch_tickers")
+
+		return {s: self._ticker(s) for s in (symbols or self.symbols)}
+
+
+	async def fetch_ticker(self, symbol: str) -> dict:
+		await self._request("fetch_ticker")
+
+		return self._ticker(symbol)
+
+
+	def _walk(self, symbol: str, candles: int) -> list:
+		"""
+		Gets the first candles closes of symbol's random walk.
+		"""
+		walk = self._walks.get(symbol)
+
+		if walk is None:
+			walk = self._walks[symbol] = [self._prices.get(symbol, 0.01)]
+
+		if len(walk) < candles:
+			rng = random.Random("{0}-{1}-{2}".format(self.id, symbol, len(walk)))
+
+			while len(walk) < candles:
+				walk.append(walk[-1] * (1 + rng.gauss(0, 0.01)))
+
+		return walk
+
+
+	async def fetch_ohlcv(self, symbol: str, timeframe: str = "30m", since: int = None,
+			limit: int = None) -> list:
+
+		await self._request("fetch_ohlcv")
+
+		now = self.milliseconds()
+
+		if self._start is None:
+			# enough history for the bot to warm its indicators up
+			self._start = now - now % self._timeframe - 1000 * self._timeframe
+
+		last = (now - self._start) // self._timeframe
+		first = 0 if since is None else max(0, -(-(since - self._start) // self._timeframe))
+		limit = min(limit or 500, 500)
+
+		if since is None:
+			first = max(0, last - limit + 1)
+
+		walk = self._walk(symbol, last + 2)
+		candles = []
+
+		for i in range(first, min(last + 1, first + limit)):
+			close = walk[i + 1]
+			spread = abs(close - walk[i])
+
+			candles.append([self._start + i * self._timeframe, walk[i],
+				max(walk[i], close) + spread, min(walk[i], close) - spread, close, 100.0])
+
+		return candles
+
+
+	async def close(self) -> None:
+		pass
+
+
+class FakeCMCServer:
+	"""
+	Stand in for the coinmarketcap v1 api served on localhost.
+
+	Attributes:
+		requests: routes mapped to how many times they were requested.
+		url: base url of the api once it's started.
+		_tickers: made up coin tickers, highest ranked first.
+		_latency: seconds each response takes.
+		_app: web app serving the api.
+		_handler: request handler of the app.
+		_server: server listening for requests.
+	"""
+
+	def __init__(self, coins: int = 1500, latency: float = 0.05):
+		self.requests = collections.Counter()
+		self.url = None
+
+		self._tickers = [{
+				"id": "coin-{0}".format(rank),
+				"name": "Coin {0}".format(rank),
+				"symbol": "C{0}".format(rank),
+				"rank": str(rank),
+				"price_usd": "{0:.4f}".format(10000 / rank),
+				"price_btc": "{0:.8f}".format(1 / rank),
+				"market_cap_usd": "{0:.1f}".format(1e11 / rank),
+				"percent_change_1h": "0.5",
+				"percent_change_24h": "-2.3",
+				"percent_change_7d": "10.1",
+			} for rank in range(1, coins + 1)]
+
+		self._latency = latency
+		self._app = None
+		self._handler = None
+		self._server = None
+
+
+	async def _tickers_route(self, request: web.Request) -> web.Response:
+		self.requests["ticker"] += 1
+		await asyncio.sleep(self._latency)
+
+		# request.query only exists from aiohttp 1.1 on
+		limit = int(request.GET.get("limit", 100))
+
+		return web.json_response(self._tickers[:limit] if limit else self._tickers)
+
+
+	async def _ticker_route(self, request: web.Request) -> web.Response:
+		self.requests["ticker/{id}"] += 1
+		await asyncio.sleep(self._latency)
+
+		coin = request.match_info["id"]
+
+		for ticker in self._tickers:
+			if ticker["id"] == coin:
+				return web.json_response([ticker])
+
+		return web.json_response({"error": "id not found"}, status=404)
+
+
+	async def _global_route(self, request: web.Request) -> web.Response:
+		self.requests["global"] += 1
+		await asyncio.sleep(self._latency)
+
+		return web.json_response({
+			"total_market_cap_usd": 412345678901.0,
+			"total_24h_volume_usd": 12345678901.0,
+			"bitcoin_percentage_of_market_cap": 38.5,
+			"active_currencies": len(self._tickers),
+		})
+
+
+	async def start(self) -> None:
+		self._app = web.Application()
+		self._app.router.add_route("GET", "/v1/ticker/", self._tickers_route)
+		self._app.router.add_route("GET", "/v1/ticker/{id}/", self._ticker_route)
+		self._app.router.add_route("GET", "/v1/global/", self._global_route)
+
+		self._handler = self._app.make_handler()
+		self._server = await asyncio.get_event_loop().create_server(
+			self._handler, "127.0.0.1", 0)
+
+		host, port = self._server.sockets[0].getsockname()[:2]
+		self.url = "http://{0}:{1}/v1/".format(host, port)
+
+
+	async def close(self) -> None:
+		if self._server:
+			self._server.close()
+			await self._server.wait_closed()
+
+			await self._handler.finish_connections(1.0)
+			await self._app.cleanup()
+
+
+FakeServer = collections.namedtuple("FakeServer", ["id", "name"])
+FakeChannel = collections.namedtuple("FakeChannel", ["id", "name"])
+FakeUser = collections.namedtuple("FakeUser", ["mention"])
+FakeMessage = collections.namedtuple("FakeMessage", ["server", "channel", "author"])
+
+
+class RecordingClient:
+	"""
+	Stand in for the discord client that records every message sent instead
+	of sending it.
+
+	Attributes:
+		loop: event loop the bot runs on.
+		servers: servers the bot is in.
+		sent: (time sent, channel id, content, embed) of every message.
+		_latency: seconds each send takes.
+	"""
+
+	def __init__(self, loop, servers: list, latency: float = 0.05):
+		self.loop = loop
+		self.servers = servers
+		self.sent = []
+
+		self._latency = latency
+
+
+	async def wait_until_ready(self) -> None:
+		pass
+
+
+	async def change_presence(self, game=None) -> None:
+		pass
+
+
+	async def send_message(self, destination, content: str = None, embed=None):
+		await asyncio.sleep(self._latency)
+
+		self.sent.append((self.loop.time(), destination.id, content, embed))
+
+
+class MemoryDatabase:
+	"""
+	Stand in for ServerDatabase keeping everything in memory. Changes to the
+	subscriptions notify listeners the same way the subscriptions table's
+	trigger does.
+
+	Attributes:
+		calls: methods mapped to how many times they were called.
+		_servers: server id mapped to its name, prefix and signals.
+		_subscriptions: set of every (guild, channel, exchange, signal_type).
+		_listeners: channels mapped to the callbacks listening to them.
+		query_latency: query names mapped to their latency, empty since
+			nothing is queried.
+	"""
+
+	def __init__(self, default_signals: list = DEFAULT_SIGNALS):
+		self.calls = collections.Counter()
+		self.query_latency = {}
+
+		self._default_signals = list(default_signals)
+		self._servers = {}
+		self._subscriptions = set()
+		self._listeners = {}
+
+
+	def _notify(self, old: tuple = None, new: tuple = None) -> None:
+		def row(key):
+			if key:
+				return dict(zip(("guild", "channel", "exchange", "signal_type"), key))
+
+		payload = json.dumps({
+			"op": "DELETE" if old else "INSERT", "old": row(old), "new": row(new)})
+
+		for callback in self._listeners.get(CHANNEL, []):
+			callback(None, 0, CHANNEL, payload)
+
+
+	def _add(self, key: tuple) -> None:
+		if key not in self._subscriptions:
+			self._subscriptions.add(key)
+			self._notify(new=key)
+
+
+	def _remove(self, key: tuple) -> None:
+		if key in self._subscriptions:
+			self._subscriptions.discard(key)
+			self._notify(old=key)
+
+
+	async def listen(self, channel: str, callback) -> None:
+		self.calls["listen"] += 1
+
+		listeners = self._listeners.setdefault(channel, [])
+		if callback not in listeners:
+			listeners.append(callback)
+
+
+	async def server_exists(self, server_id: str) -> bool:
+		self.calls["server_exists"] += 1
+		return server_id in self._servers
+
+
+	async def add_server(self, server_id: str, name: str, prefix: str) -> None:
+		self.calls["add_server"] += 1
+		self._servers.setdefault(server_id, {"name": name, "prefix": prefix, "signals": None})
+
+
+	async def reconcile_servers(self, servers: list, prefix: str) -> list:
+		self.calls["reconcile_servers"] += 1
+
+		for server_id, name in servers:
+			self._servers.setdefault(server_id, {"name": name, "prefix": prefix, "signals": None})
+
+		return [
+				dict(zip(("guild", "channel", "exchange", "signal_type"), key))
+				for key in self._subscriptions
+			]
+
+
+	async def get_prefix(self, server_id: str) -> str:
+		self.calls["get_prefix"] += 1
+		return self._servers[server_id]["prefix"]
+
+
+	async def get_prefixes(self) -> dict:
+		self.calls["get_prefixes"] += 1
+		return {i: s["prefix"] for i, s in self._servers.items()}
+
+
+	async def update_prefix(self, server_id: str, prefix: str) -> None:
+		self.calls["update_prefix"] += 1
+		self._servers[server_id]["prefix"] = prefix
+
+
+	async def get_signals(self, server_id: str) -> list:
+		self.calls["get_signals"] += 1
+		return self._servers[server_id]["signals"]
+
+
+	async def get_exchanges(self, server_id: str) -> list:
+		self.calls["get_exchanges"] += 1
+		return sorted({s[2] for s in self._subscriptions if s[0] == server_id})
+
+
+	async def subscribe(self, server_id: str, channel: str, exchanges: list,
+			signal_types: list) -> None:
+
+		self.calls["subscribe"] += 1
+
+		for exchange in exchanges:
+			for signal_type in signal_types:
+				self._add((server_id, channel, exchange, signal_type))
+
+
+	async def unsubscribe(self, server_id: str, channel: str, exchanges: list = None) -> None:
+		self.calls["unsubscribe"] += 1
+
+		for key in list(self._subscriptions):
+			if key[:2] == (server_id, channel) and (exchanges is None or key[2] in exchanges):
+				self._remove(key)
+
+
+	async def update_signals(self, server_id: str, signals: list,
+			signal_types: list) -> None:
+
+		self.calls["update_signals"] += 1
+		self._servers[server_id]["signals"] = signals
+
+		channels = {(s[0], s[1], s[2]) for s in self._subscriptions if s[0] == server_id}
+
+		for key in list(self._subscriptions):
+			if key[0] == server_id and key[3] not in signal_types:
+				self._remove(key)
+
+		for guild, channel, exchange in channels:
+			for signal_type in signal_types:
+				self._add((guild, channel, exchange, signal_type))
+
+
+	async def get_subscriptions(self) -> list:
+		self.calls["get_subscriptions"] += 1
+
+		return [
+				dict(zip(("guild", "channel", "exchange", "signal_type"), key))
+				for key in self._subscriptions
+			]
+
+
+	async def close(self) -> None:
+		pass
+
+
+def load_config(args) -> dict:
+	"""
+	Gets the repo's config with the simulation's settings on top.
+	"""
+	with open(os.path.join(ROOT, "config.json"), "r") as f:
+		config = json.load(f)
+
+	config.update({
+		"update_interval": args.interval,
+		"price_stream": False,
+		"indicators": args.indicators,
+		"rsi_history": args.history,
+		"debug": False,
+	})
+
+	return config
+
+
+async def simulate(loop, clock: VirtualClock, guilds: int, args) -> dict:
+	"""
+	Runs the bot with guilds subscribed to every exchange until it has ticked
+	args.ticks times and everything it queued has been sent. Ticks and
+	deliveries are timed by the bot's own metrics.
+
+	Returns:
+		the simulation's report
+
+	"""
+	logger = logging.getLogger("simulator")
+
+	cmc = FakeCMCServer(latency=args.cmc_latency)
+	await cmc.start()
+
+	candles = tempfile.mkdtemp(prefix="hasami-sim-")
+
+	config = load_config(args)
+	config["cmc_url"] = cmc.url
+	config["candle_store_path"] = candles
+
+	servers = [FakeServer(str(i), "guild {0}".format(i)) for i in range(guilds)]
+	client = RecordingClient(loop, servers, latency=args.discord_latency)
+	db = MemoryDatabase()
+
+	for server in servers:
+		await db.add_server(server.id, server.name, config["prefix"])
+		await db.subscribe(server.id, "c" + server.id, args.exchanges, DEFAULT_SIGNALS)
+
+	bot = Hasami(client, logger, config, db)
+
+	metrics = MetricsRegistry()
+	bot.register_metrics(metrics)
+
+	tick_duration = metrics.get("hasami_tick_seconds")
+	delivery_latency = metrics.get("hasami_send_delivery_seconds")
+
+	exchanges = [
+			bot.exchange_processor.add_exchange(FakeExchange(
+				exchange_id, symbols=args.symbols, latency=args.latency,
+				error_rate=args.error_rate, volatility=args.volatility, seed=args.seed,
+				clock=clock.time))
+			for exchange_id in args.exchanges
+		]
+
+	done = asyncio.Event()
+
+	async def commands():
+		# users asking for prices while the bot ticks
+		message = FakeMessage(servers[0], FakeChannel("commands", "commands"),
+			FakeUser("@user"))
+
+		while not done.is_set():
+			await bot.price(message, random.sample(["c1", "c2", "c3", "coin-10", "c50"], 2))
+			await asyncio.sleep(60 / max(args.commands, 1e-9))
+
+	started = loop.time()
+	real_started = time.monotonic()
+
+	await bot.start()
+
+	if args.commands:
+		loop.create_task(commands())
+
+	# sleeping costs no real time, the clock skips ahead
+	while tick_duration.count < args.ticks:
+		await asyncio.sleep(1)
+
+	done.set()
+	await bot.join()
+
+	elapsed = loop.time() - started
+	real_elapsed = time.monotonic() - real_started
+
+	alerts = sum(
+			1 for _, channel, _, embed in client.sent
+			if embed is not None and channel != "commands"
+		)
+
+	report = {
+		"guilds": guilds,
+		"ticks": tick_duration.count,
+		"virtual_seconds": elapsed,
+		"real_seconds": real_elapsed,
+		"tick_latency": tick_duration.summary(),
+		"alert_latency": delivery_latency.summary(),
+		"alerts_sent": alerts,
+		"messages_sent": len(client.sent),
+		"requests": {
+			"exchanges": {e.id: dict(e.requests) for e in exchanges},
+			"rate_limited": {e.id: dict(e.errors) for e in exchanges},
+			"cmc": dict(cmc.requests),
+			"database": dict(db.calls),
+		},
+	}
+
+	await bot.close()
+	await cmc.close()
+
+	shutil.rmtree(candles, ignore_errors=True)
+
+	return report
+
+
+def run(guilds: int, args) -> dict:
+	"""
+	Simulates guilds on a fresh virtual clock loop.
+	"""
+	clock = VirtualClock()
+	loop = VirtualClockLoop(clock)
+	asyncio.set_event_loop(loop)
+
+	# asyncio.all_tasks only exists from python 3.7 on
+	all_tasks = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+
+	try:
+		return loop.run_until_complete(simulate(loop, clock, guilds, args))
+
+	finally:
+		for task in all_tasks(loop):
+			task.cancel()
+
+		loop.run_until_complete(asyncio.sleep(0))
+		loop.close()
+
+
+def print_report(report: dict) -> None:
+	tick = report["tick_latency"]
+	alert = report["alert_latency"]
+
+	print("\n{0} guilds, {1} ticks in {2:.0f}s simulated / {3:.1f}s real".format(
+		report["guilds"], report["ticks"], report["virtual_seconds"],
+		report["real_seconds"]))
+
+	print("  tick latency   mean {0:.2f}s p50 {1}s p95 {2}s p99 {3}s".format(
+		tick["mean"], tick["p50"], tick["p95"], tick["p99"]))
+
+	print("  alert latency  mean {0:.2f}s p50 {1}s p95 {2}s p99 {3}s over {4} alerts".format(
+		alert["mean"], alert["p50"], alert["p95"], alert["p99"],
+		report["alerts_sent"]))
+
+	for exchange, requests in report["requests"]["exchanges"].items():
+		print("  {0:<14} {1} rate limited {2}".format(
+			exchange, requests, report["requests"]["rate_limited"][exchange]))
+
+	print("  {0:<14} {1}".format("coinmarketcap", report["requests"]["cmc"]))
+	print("  {0:<14} {1}".format("database", report["requests"]["database"]))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__,
+		formatter_class=argparse.RawDescriptionHelpFormatter)
+
+	parser.add_argument("--guilds", type=int, nargs="+", default=[10, 1000, 10000],
+		help="guild counts to simulate")
+	parser.add_argument("--ticks", type=int, default=5, help="ticks simulated per run")
+	parser.add_argument("--exchanges", nargs="+", default=["binance", "bittrex"])
+	parser.add_argument("--symbols", type=int, default=300, help="markets per exchange")
+	parser.add_argument("--latency", type=float, default=0.1,
+		help="mean seconds an exchange request takes")
+	parser.add_argument("--error-rate", type=float, default=0.01,
+		help="chance of an exchange request being rate limited")
+	parser.add_argument("--volatility", type=float, default=0.02,
+		help="standard deviation of each ticker price step")
+	parser.add_argument("--cmc-latency", type=float, default=0.05)
+	parser.add_argument("--discord-latency", type=float, default=0.05)
+	parser.add_argument("--commands", type=float, default=2,
+		help="$price commands per minute")
+	parser.add_argument("--interval", type=float, default=1, help="minutes between ticks")
+	parser.add_argument("--indicators", nargs="+", default=["rsi"])
+	parser.add_argument("--history", type=int, default=100,
+		help="candles used to warm up each market's indicators")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", help="file the reports are saved to as json")
+
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.ERROR)
+	random.seed(args.seed)
+
+	reports = []
+
+	for guilds in args.guilds:
+		report = run(guilds, args)
+		reports.append(report)
+
+		print_report(report)
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(reports, f, indent="\t")
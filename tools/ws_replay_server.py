@@ -0,0 +1,117 @@
+"""
+Local stand-in for an exchange's WebSocket ticker stream. Records frames from a
+live stream and replays them to any client that connects, so the streaming
+ingestion mode can be run without touching the exchange.
+
+Record binance's ticker stream for 10 minutes
+	python tools/ws_replay_server.py record frames.jsonl --seconds 600
+
+Replay it on ws://localhost:8765/
+	python tools/ws_replay_server.py replay frames.jsonl --port 8765
+
+Then point the bot at it in config.json
+	"price_stream": true,
+	"stream_urls": {"binance": "ws://localhost:8765/"}
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+from aiohttp import web
+
+BINANCE_URL = "wss://stream.binance.com:9443/ws/!ticker@arr"
+
+
+def load_frames(path: str) -> list:
+	"""
+	Loads recorded frames, each line is {"t": seconds since the first frame,
+	"frame": text of the frame}.
+	"""
+	with open(path, "r") as f:
+		return [json.loads(line) for line in f if line.strip()]
+
+
+async def record(url: str, path: str, seconds: float) -> None:
+	"""
+	Records the frames of a live stream into path.
+	"""
+	start = time.monotonic()
+
+	async with aiohttp.ClientSession() as session:
+		async with session.ws_connect(url) as ws:
+			with open(path, "w") as f:
+				while time.monotonic() - start < seconds:
+					msg = await ws.receive()
+
+					if msg.type != aiohttp.WSMsgType.TEXT:
+						break
+
+					line = {"t": time.monotonic() - start, "frame": msg.data}
+					f.write(json.dumps(line) + "\n")
+
+
+def create_app(frames: list, speed: float = 1, gap: float = 0, loop_frames: bool = True):
+	"""
+	Creates a web app replaying frames to every WebSocket client.
+
+	Args:
+		frames: recorded frames
+		speed: how many times faster than recorded to replay
+		gap: seconds to go silent for after each pass through the frames, used
+			to make the bot detect a gap and resync
+		loop_frames: whether to start over once every frame's been sent
+
+	"""
+
+	async def replay(request):
+		ws = web.WebSocketResponse()
+		await ws.prepare(request)
+
+		while True:
+			previous = 0
+
+			for frame in frames:
+				await asyncio.sleep(max(frame["t"] - previous, 0) / speed)
+				previous = frame["t"]
+
+				# send_str only returns a coroutine from aiohttp 3 on
+				ws.send_str(frame["frame"])
+
+			if not loop_frames:
+				break
+
+			await asyncio.sleep(gap)
+
+		await ws.close()
+		return ws
+
+	app = web.Application()
+	app.router.add_route("GET", "/", replay)
+
+	return app
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__,
+		formatter_class=argparse.RawDescriptionHelpFormatter)
+
+	parser.add_argument("mode", choices=["record", "replay"])
+	parser.add_argument("path", help="file the frames are recorded to / replayed from")
+	parser.add_argument("--url", default=BINANCE_URL, help="stream to record")
+	parser.add_argument("--seconds", type=float, default=60, help="how long to record")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--speed", type=float, default=1)
+	parser.add_argument("--gap", type=float, default=0)
+	parser.add_argument("--once", action="store_true", help="don't loop the frames")
+
+	args = parser.parse_args()
+
+	if args.mode == "record":
+		asyncio.get_event_loop().run_until_complete(
+			record(args.url, args.path, args.seconds))
+
+	else:
+		app = create_app(load_frames(args.path), args.speed, args.gap, not args.once)
+		web.run_app(app, port=args.port)